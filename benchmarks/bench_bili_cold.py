@@ -0,0 +1,134 @@
+"""
+B 站冷请求基准：对比启动时预热会话（``resolver_bili_prewarm``）与按需获取 buvid / WBI 密钥的旧行为。
+
+    python -m benchmarks.bench_bili_cold --rounds 5 --api-delay 0.05 --output bili_cold.json
+
+每一轮在全新的子进程中运行（bilibili_api 把 buvid、WBI 密钥缓存在模块全局变量里），
+记录第一次解析（冷）与紧接着的第二次解析（热）的首条消息耗时与总耗时，以及预热本身花的时间。
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import os
+import time
+from pathlib import Path
+
+from .harness import FakeBot, bootstrap, install_rewrite, make_event, run_handler
+from .standin import REWRITE_HOSTS, MediaStore, StandinServer, media_cache_dir
+
+MODES = ("lazy", "prewarm")
+URL = "https://www.bilibili.com/video/{}"
+
+
+async def child(mode: str, api_delay: float, media_mbps: float) -> dict:
+    media = MediaStore(media_cache_dir())
+    media.build()
+    server = StandinServer(media, api_delay=api_delay, media_mbps=media_mbps)
+    server.serve_in_thread()
+    install_rewrite(server.base_url, REWRITE_HOSTS)
+    os.chdir(tempfile.mkdtemp(prefix="resolver-bili-cold-"))
+    bootstrap(
+        log_level="ERROR",
+        r_global_nickname="bench",
+        video_duration_maximum=3600,
+        download_video=True,
+        resolver_rate_limits={"bilibili": (0, 1)},
+        resolver_bili_prewarm=mode == "prewarm",
+    )
+    from nonebot_plugin_resolver.platforms import import_handler
+
+    handler = import_handler("bilibili")
+    result = {"prewarm_ms": 0.0}
+    if mode == "prewarm":
+        from nonebot_plugin_resolver.platforms.bilibili import BILI_SESSION
+
+        start = time.perf_counter()
+        await BILI_SESSION.start()
+        while not BILI_SESSION.stats["refreshed"]:
+            await asyncio.sleep(0.001)
+        result["prewarm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    bot = FakeBot()
+    for label, n in (("cold", "BV1Cm4dRjyvK"), ("warm", "BV1Wa9mRqxhT")):
+        run = await run_handler(handler, bot, make_event(URL.format(n)))
+        result[label] = {
+            "first_ms": round((run.first_send or 0) * 1000, 1),
+            "total_ms": round(run.latency * 1000, 1),
+            "error": run.error,
+        }
+    server.shutdown()
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument(
+        "--api-delay", type=float, default=0.05, help="替身接口的模拟 RTT（秒）"
+    )
+    parser.add_argument(
+        "--media-mbps", type=float, default=0, help="替身媒体下载限速，0 为不限"
+    )
+    parser.add_argument("--output", default="")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(
+            json.dumps(asyncio.run(child(args.child, args.api_delay, args.media_mbps)))
+        )
+        return 0
+
+    results = {mode: [] for mode in MODES}
+    for _ in range(args.rounds):
+        for mode in MODES:
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_bili_cold",
+                    "--child",
+                    mode,
+                    "--api-delay",
+                    str(args.api_delay),
+                    "--media-mbps",
+                    str(args.media_mbps),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=Path(__file__).parent.parent,
+            )
+            results[mode].append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    def median(mode: str, *keys: str) -> float:
+        values = []
+        for r in results[mode]:
+            for key in keys[:-1]:
+                r = r[key]
+            values.append(r[keys[-1]])
+        return round(statistics.median(values), 1)
+
+    print(
+        f"{'mode':<10}{'prewarm':>9}{'cold 1st':>10}{'cold all':>10}{'warm 1st':>10}{'warm all':>10}{'err':>5}"
+    )
+    for mode in MODES:
+        errors = sum(
+            bool(r[k]["error"]) for r in results[mode] for k in ("cold", "warm")
+        )
+        print(
+            f"{mode:<10}{median(mode, 'prewarm_ms'):>9}"
+            f"{median(mode, 'cold', 'first_ms'):>10}{median(mode, 'cold', 'total_ms'):>10}"
+            f"{median(mode, 'warm', 'first_ms'):>10}{median(mode, 'warm', 'total_ms'):>10}{errors:>5}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
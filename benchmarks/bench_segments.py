@@ -0,0 +1,135 @@
+"""
+acfun / HLS 分片下载基准：对比固定并发与按吞吐自适应（AIMD）的分片并发。
+
+    python -m benchmarks.bench_segments --rounds 3 --seconds 240 --conn-mbps 16 --total-mbps 160 --max-connections 24
+
+替身服务器按单个连接限速（--conn-mbps），所有连接平分总带宽（--total-mbps），
+同时进行的连接超过 --max-connections 时返回 503，模拟 CDN 的单连接限速与限流。
+"all" 模式一次发出全部分片请求，相当于不加限制地 gather。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from .harness import bootstrap, install_rewrite
+from .standin import REWRITE_HOSTS, MediaStore, StandinServer, media_cache_dir
+
+M3U8_URL = "https://ali-safety-video.acfun.cn/mediacloud/acfun/acfun_video/hls/720p.m3u8?pkey=bench"
+
+
+def make_limiter(mode: str, segments: int):
+    from nonebot_plugin_resolver.core.adaptive import AdaptiveLimiter
+    from nonebot_plugin_resolver.core.acfun import SEGMENT_CONCURRENCY
+
+    if mode == "adaptive":
+        initial, maximum = SEGMENT_CONCURRENCY
+        return AdaptiveLimiter(initial, maximum=maximum)
+    n = segments if mode == "all" else int(mode.removeprefix("fixed"))
+    return AdaptiveLimiter(n, minimum=n, maximum=n)
+
+
+async def run_once(
+    server: StandinServer, mode: str, segments: int, workdir: str
+) -> dict:
+    from nonebot_plugin_resolver.core.acfun import download_m3u8_video
+
+    limiter = make_limiter(mode, segments)
+    served, rejected = server.bytes_served, server.media_rejected
+    start = time.perf_counter()
+    error = ""
+    try:
+        output = await download_m3u8_video(M3U8_URL, workdir, limiter=limiter)
+        os.remove(output)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "seconds": round(time.perf_counter() - start, 2),
+        "mbytes": round((server.bytes_served - served) / 1e6, 1),
+        "rejected": server.media_rejected - rejected,
+        "peak": limiter.stats["peak"],
+        "final": limiter.concurrency,
+        "error": error,
+    }
+
+
+async def bench(args) -> dict:
+    media = MediaStore(
+        media_cache_dir() / "segments",
+        video_seconds=args.seconds,
+        video_bitrate=args.bitrate,
+    )
+    media.build()
+    server = StandinServer(
+        media,
+        media_mbps=args.conn_mbps,
+        media_total_mbps=args.total_mbps,
+        media_connections=args.max_connections,
+    )
+    server.serve_in_thread()
+    install_rewrite(server.base_url, REWRITE_HOSTS)
+    bootstrap(log_level="ERROR")
+    workdir = tempfile.mkdtemp(prefix="resolver-bench-segments-")
+    segments = len(media.segments)
+    results = {mode: [] for mode in args.modes}
+    for _ in range(args.rounds):
+        for mode in args.modes:
+            results[mode].append(await run_once(server, mode, segments, workdir))
+    server.shutdown()
+    return {"segments": segments, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--seconds", type=int, default=240, help="测试视频时长，每 2 秒一个分片"
+    )
+    parser.add_argument("--bitrate", default="2M")
+    parser.add_argument("--conn-mbps", type=float, default=16, help="单个连接的带宽")
+    parser.add_argument(
+        "--total-mbps", type=float, default=160, help="所有连接共享的总带宽，0 为不限"
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=24,
+        help="同时连接上限，超出返回 503，0 为不限",
+    )
+    parser.add_argument(
+        "--modes", default="all,fixed4,fixed16,adaptive", type=lambda s: s.split(",")
+    )
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+    report = asyncio.run(bench(args))
+
+    print(f"{report['segments']} segments")
+    print(
+        f"{'mode':<10}{'p50 s':>8}{'max s':>8}{'MB':>8}{'503':>6}{'peak':>6}{'final':>6}{'err':>5}"
+    )
+    for mode, runs in report["results"].items():
+        seconds = [r["seconds"] for r in runs]
+        print(
+            f"{mode:<10}{statistics.median(seconds):>8}{max(seconds):>8}"
+            f"{statistics.median(r['mbytes'] for r in runs):>8}"
+            f"{int(statistics.median(r['rejected'] for r in runs)):>6}"
+            f"{max(r['peak'] for r in runs):>6}{runs[-1]['final']:>6}"
+            f"{sum(bool(r['error']) for r in runs):>5}"
+        )
+    for mode, runs in report["results"].items():
+        for r in runs:
+            if r["error"]:
+                print(f"{mode}: {r['error']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+小红书 __INITIAL_STATE__ 解析的微基准：旧实现（正则 + 全文 replace + 全量 json.loads）对比 ``core.xhs.extract_note``。
+
+    python -m benchmarks.bench_xhs --sizes 100,400,1600 --output xhs.json
+"""
+
+import argparse
+import json
+import re
+import sys
+import timeit
+import tracemalloc
+
+from .harness import bootstrap
+from .standin import StandinServer
+
+NOTE_ID = "664f1b2c000000001e03bench"
+
+
+def legacy(html: str, note_id: str) -> dict:
+    response_json = re.findall("window.__INITIAL_STATE__=(.*?)</script>", html)[0]
+    response_json = response_json.replace("undefined", "null")
+    response_json = json.loads(response_json)
+    return response_json["note"]["noteDetailMap"][note_id]["note"]
+
+
+def measure(fn, html: str, repeat: int) -> dict:
+    number = max(1, repeat)
+    best = min(timeit.repeat(lambda: fn(html, NOTE_ID), number=number, repeat=5))
+    tracemalloc.start()
+    fn(html, NOTE_ID)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ms": round(best / number * 1000, 3),
+        "peak_alloc_kb": round(peak / 1024, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", default="100,400,1600", help="页面大小（KB），逗号分隔"
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+    bootstrap()
+    from nonebot_plugin_resolver.core.xhs import extract_note
+
+    results = {}
+    print(
+        f"{'page KB':>8}{'legacy ms':>12}{'new ms':>10}{'legacy KB':>12}{'new KB':>10}"
+    )
+    for size in (int(s) for s in args.sizes.split(",")):
+        html = StandinServer(None, xhs_page_kb=size).xhs_html(NOTE_ID)
+        assert extract_note(html, NOTE_ID)["title"] == legacy(html, NOTE_ID)["title"]
+        old = measure(legacy, html, args.repeat)
+        new = measure(extract_note, html, args.repeat)
+        results[size] = {
+            "page_kb": round(len(html.encode()) / 1024, 1),
+            "legacy": old,
+            "extractor": new,
+        }
+        print(
+            f"{results[size]['page_kb']:>8}{old['ms']:>12}{new['ms']:>10}"
+            f"{old['peak_alloc_kb']:>12}{new['peak_alloc_kb']:>10}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""
+基准测试运行时：加载插件、把外部请求改写到替身服务器、提供假的 OneBot ``Bot``。
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from itertools import count
+from pathlib import Path
+from typing import Any, Callable
+
+import aiohttp
+import httpx
+import yarl
+
+_original: dict[str, Any] = {}
+
+
+def _should_rewrite(host: str, hosts: tuple[str, ...]) -> bool:
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def install_rewrite(base_url: str, hosts: tuple[str, ...]) -> None:
+    """
+    在传输层把 httpx / aiohttp 发往 ``hosts`` 的请求改写到替身服务器，
+    被改写的请求绕过代理直连本地。插件与 bilibili_api 的代码无需任何改动。
+    """
+    if _original:
+        return
+    base = httpx.URL(base_url)
+
+    def rewrite(url: httpx.URL) -> httpx.URL | None:
+        if not _should_rewrite(url.host, hosts):
+            return None
+        return url.copy_with(
+            scheme=base.scheme,
+            host=base.host,
+            port=base.port,
+            raw_path=f"/_/{url.host}".encode() + url.raw_path,
+        )
+
+    direct_async = httpx.AsyncHTTPTransport()
+    direct_sync = httpx.HTTPTransport()
+    _original["async"] = httpx.AsyncHTTPTransport.handle_async_request
+    _original["sync"] = httpx.HTTPTransport.handle_request
+    _original["aiohttp"] = aiohttp.ClientSession._request
+
+    async def handle_async_request(self, request: httpx.Request):
+        url = rewrite(request.url)
+        if url is None:
+            return await _original["async"](self, request)
+        request.url = url
+        return await _original["async"](direct_async, request)
+
+    def handle_request(self, request: httpx.Request):
+        url = rewrite(request.url)
+        if url is None:
+            return _original["sync"](self, request)
+        request.url = url
+        return _original["sync"](direct_sync, request)
+
+    async def _request(self, method, str_or_url, **kwargs):
+        url = yarl.URL(str(str_or_url))
+        if url.host and _should_rewrite(url.host, hosts):
+            url = (
+                yarl.URL(base_url)
+                .with_path(f"/_/{url.host}{url.raw_path}", encoded=True)
+                .with_query(url.raw_query_string)
+            )
+            kwargs.pop("proxy", None)
+        return await _original["aiohttp"](self, method, url, **kwargs)
+
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    httpx.HTTPTransport.handle_request = handle_request
+    aiohttp.ClientSession._request = _request
+
+
+def bootstrap(log_level: str = "WARNING", **config):
+    """初始化 NoneBot 并加载插件，返回插件模块"""
+    import nonebot
+    from nonebot.adapters.onebot.v11 import Adapter
+
+    nonebot.init(log_level=log_level, **config)
+    nonebot.get_driver().register_adapter(Adapter)
+    return nonebot.load_plugin("nonebot_plugin_resolver").module
+
+
+def _segment_bytes(segment) -> int:
+    """估算一个消息段交给 OneBot 实现后需要读取/上传的字节数"""
+    if segment.type == "node":
+        return sum(_segment_bytes(s) for s in segment.data.get("content") or [])
+    file = segment.data.get("file")
+    if isinstance(file, bytes):
+        return len(file)
+    if isinstance(file, str):
+        if file.startswith("file://"):
+            path = file[len("file://") :]
+            return os.path.getsize(path) if os.path.exists(path) else 0
+        if file.startswith("base64://"):
+            return (len(file) - len("base64://")) * 3 // 4
+    return 0
+
+
+class FakeBot:
+    """
+    假的 OneBot V11 ``Bot``：记录调用，统计需要上传的字节数，不做任何网络请求。
+    """
+
+    def __init__(self, self_id: str = "10000", api_latency: float = 0.0):
+        self.self_id = self_id
+        self.api_latency = api_latency
+        self.calls: list[tuple[str, dict]] = []
+        self.bytes_sent = 0
+        self._message_id = count(1)
+        self.on_call: Callable[[str], None] | None = None
+
+    def _account(self, message) -> None:
+        from nonebot.adapters.onebot.v11 import Message, MessageSegment
+
+        if isinstance(message, MessageSegment):
+            message = Message(message)
+        elif isinstance(message, str):
+            return
+        for segment in message:
+            self.bytes_sent += _segment_bytes(segment)
+
+    async def call_api(self, api: str, **data):
+        if self.on_call:
+            self.on_call(api)
+        self.calls.append((api, data))
+        if "message" in data:
+            self._account(data["message"])
+        if "messages" in data:
+            messages = data["messages"]
+            for message in messages if isinstance(messages, list) else [messages]:
+                self._account(message)
+        if api.startswith("upload_") and isinstance(data.get("file"), str):
+            if os.path.exists(data["file"]):
+                self.bytes_sent += os.path.getsize(data["file"])
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        if api.startswith("send_") or api == "send":
+            return {"message_id": next(self._message_id)}
+        return {}
+
+    async def send(self, event, message, **kwargs):
+        return await self.call_api("send", message=message, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def _call(**data):
+            return await self.call_api(name, **data)
+
+        return _call
+
+
+_ids = count(1)
+
+
+def make_event(text: str, group_id: int = 100000, user_id: int = 20000):
+    from nonebot.adapters.onebot.v11 import Message
+    from nonebot.adapters.onebot.v11.event import GroupMessageEvent, Sender
+
+    message = Message(text)
+    return GroupMessageEvent(
+        time=int(time.time()),
+        self_id=10000,
+        post_type="message",
+        sub_type="normal",
+        user_id=user_id,
+        message_type="group",
+        message_id=next(_ids),
+        message=message,
+        original_message=message,
+        raw_message=text,
+        font=0,
+        sender=Sender(user_id=user_id, nickname="bench"),
+        to_me=False,
+        group_id=group_id,
+    )
+
+
+class HandlerRun:
+    __slots__ = ("latency", "first_send", "error")
+
+    def __init__(self):
+        self.latency = 0.0
+        self.first_send: float | None = None
+        self.error: str | None = None
+
+
+async def run_handler(handler: Callable, bot: FakeBot, event) -> HandlerRun:
+    """在 matcher 上下文中执行一次处理函数，统计耗时与首条消息发出的时间"""
+    from nonebot.exception import FinishedException, PausedException
+    from nonebot.internal.matcher import current_bot, current_event
+    from nonebot.matcher import Matcher
+
+    result = HandlerRun()
+    start = time.perf_counter()
+
+    def mark(api: str) -> None:
+        if result.first_send is None and "send" in api:
+            result.first_send = time.perf_counter() - start
+
+    # 每条消息使用独立的 Bot，避免并发时互相覆盖首发时间
+    run_bot = FakeBot(bot.self_id, bot.api_latency)
+    run_bot.on_call = mark
+    current_bot.set(run_bot)
+    current_event.set(event)
+    kwargs = {}
+    for name in inspect.signature(handler).parameters:
+        if name == "bot":
+            kwargs[name] = run_bot
+        elif name == "event":
+            kwargs[name] = event
+        elif name == "matcher":
+            kwargs[name] = Matcher()
+    try:
+        await handler(**kwargs)
+    except (FinishedException, PausedException):
+        pass
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.latency = time.perf_counter() - start
+    bot.bytes_sent += run_bot.bytes_sent
+    bot.calls.extend(run_bot.calls)
+    return result
+
+
+def _proc_rss(pid: str) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _children(pid: str) -> list[str]:
+    result = []
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return result
+    for tid in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                result.extend(f.read().split())
+        except OSError:
+            pass
+    return result
+
+
+def process_tree_rss() -> int:
+    """当前进程及其子进程（ffmpeg / yt-dlp）的常驻内存之和"""
+    if not os.path.exists("/proc/self/statm"):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    total, stack = 0, [str(os.getpid())]
+    while stack:
+        pid = stack.pop()
+        total += _proc_rss(pid)
+        stack.extend(_children(pid))
+    return total
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += dir_size(Path(entry.path))
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+class ResourceSampler:
+    """后台采样进程树内存与工作目录磁盘占用的峰值"""
+
+    def __init__(self, workdir: Path, interval: float = 0.02):
+        self.workdir = workdir
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_disk = 0
+        self._task: asyncio.Task | None = None
+
+    def sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, process_tree_rss())
+        self.peak_disk = max(self.peak_disk, dir_size(self.workdir))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        if self._task:
+            self._task.cancel()
+        self.sample()
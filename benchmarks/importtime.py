@@ -0,0 +1,134 @@
+"""
+插件启动开销基准：分别测量加载插件本身、以及每个平台第一次使用时的导入耗时与内存增量。
+
+    python -m benchmarks.importtime --output importtime.json
+
+每一项都在全新的子进程中以 ``python -X importtime`` 运行，按 importtime 的 self 时间求和，
+并记录墙钟时间、RSS 增量和新导入的模块中最重的几个顶层包。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from .harness import bootstrap
+
+MARKER = "--resolver-importtime-marker--"
+
+PROBE = """
+import os, sys, time, json
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+import nonebot
+from nonebot.adapters.onebot.v11 import Adapter
+
+nonebot.init(log_level="ERROR")
+nonebot.get_driver().register_adapter(Adapter)
+target = sys.argv[1]
+before_modules, before_rss = set(sys.modules), rss()
+start = time.perf_counter()
+print({marker!r}, file=sys.stderr, flush=True)
+nonebot.load_plugin("nonebot_plugin_resolver")
+if target == "*":
+    from nonebot_plugin_resolver.platforms import PLATFORMS, import_handler
+    for name in PLATFORMS:
+        import_handler(name)
+elif target:
+    from nonebot_plugin_resolver.platforms import import_handler
+    plugin_rss, plugin_modules = rss(), set(sys.modules)
+    print({marker!r}, file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    before_modules, before_rss = plugin_modules, plugin_rss
+    import_handler(target)
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "wall_ms": round(elapsed * 1000, 1),
+    "rss_mb": round((rss() - before_rss) / 2**20, 1),
+    "modules": len(set(sys.modules) - before_modules),
+}}))
+""".format(marker=MARKER)
+
+
+def parse_importtime(stderr: str) -> tuple[float, list[tuple[str, float]]]:
+    """
+    解析最后一个标记之后的 -X importtime 输出
+    :return: (self 时间总和 ms, [(直接导入的模块, 累计 ms)] 按耗时降序取前 5)
+    """
+    section = stderr.rsplit(MARKER, 1)[-1]
+    total_us = 0
+    entries: list[tuple[int, str, int]] = []
+    for line in section.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2]
+        total_us += self_us
+        # importtime 用缩进表示嵌套，缩进最少的是这一段里直接触发的导入
+        entries.append((len(name) - len(name.lstrip()), name.strip(), cumulative_us))
+    if not entries:
+        return 0.0, []
+    depth = min(e[0] for e in entries)
+    top = sorted(
+        (e for e in entries if e[0] == depth), key=lambda e: e[2], reverse=True
+    )
+    return total_us / 1000, [(name, round(us / 1000, 1)) for _, name, us in top[:5]]
+
+
+def measure(target: str, repo: Path) -> dict:
+    env = dict(
+        os.environ, PYTHONPATH=f"{repo}{os.pathsep}{os.environ.get('PYTHONPATH', '')}"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, target],
+        capture_output=True,
+        text=True,
+        cwd=repo,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{target or 'plugin'}: {proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["importtime_ms"], result["heaviest"] = parse_importtime(proc.stderr)
+    result["importtime_ms"] = round(result["importtime_ms"], 1)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--platforms", default="", help="逗号分隔，默认全部")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args(argv)
+
+    repo = Path(__file__).resolve().parent.parent
+    bootstrap(log_level="ERROR")
+    from nonebot_plugin_resolver.platforms import PLATFORMS
+
+    names = args.platforms.split(",") if args.platforms else list(PLATFORMS)
+    rows = {"plugin": measure("", repo)}
+    for name in names:
+        rows[name] = measure(name, repo)
+    rows["all (eager)"] = measure("*", repo)
+
+    print(
+        f"{'target':<14}{'wall ms':>9}{'import ms':>11}{'rss MB':>8}{'mods':>6}  heaviest"
+    )
+    for name, r in rows.items():
+        heaviest = ", ".join(f"{k} {v}" for k, v in r["heaviest"][:3])
+        print(
+            f"{name:<14}{r['wall_ms']:>9}{r['importtime_ms']:>11}{r['rss_mb']:>8}"
+            f"{r['modules']:>6}  {heaviest}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+端到端离线基准测试。
+
+启动本地替身服务器回放录制的各平台响应，用假的 OneBot ``Bot`` 逐个运行解析处理函数，
+输出延迟分位数、N 并发下的吞吐、进程树内存峰值与磁盘占用，并写出 JSON 结果用于回归对比::
+
+    python -m benchmarks.run --iterations 10 --concurrency 8 --output bench.json
+    python -m benchmarks.run --baseline bench.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from .harness import (
+    FakeBot,
+    ResourceSampler,
+    bootstrap,
+    dir_size,
+    install_rewrite,
+    make_event,
+    run_handler,
+)
+from .standin import REWRITE_HOSTS, MediaStore, StandinServer, media_cache_dir
+
+BV_ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+
+
+def _bvid(n: int) -> str:
+    rng = random.Random(n)
+    return "BV1" + "".join(rng.choice(BV_ALPHABET) for _ in range(9))
+
+
+CASES: dict[str, tuple[str, Callable[[int], str]]] = {
+    "bilibili_video": ("bilibili", lambda n: f"https://www.bilibili.com/video/{_bvid(n)}"),
+    "bilibili_opus": ("bilibili", lambda n: f"https://t.bilibili.com/{950000000000000000 + n}"),
+    "bilibili_live": ("bilibili", lambda n: f"https://live.bilibili.com/{21000 + n % 4}"),
+    "bilibili_favlist": ("bilibili", lambda n: f"https://space.bilibili.com/1/favlist?fid={1000 + n}"),
+    "douyin_video": ("douyin", lambda n: f"https://v.douyin.com/{7372484719365000000 + 2 * n}/"),
+    "douyin_image": ("douyin", lambda n: f"https://v.douyin.com/{7372484719365000001 + 2 * n}/"),
+    "xhs_image": ("xiaohongshu", lambda n: f"https://www.xiaohongshu.com/explore/{n:024x}?xsec_token=bench"),
+    "xhs_video": ("xiaohongshu", lambda n: f"https://www.xiaohongshu.com/explore/{n:019x}video?xsec_token=bench"),
+    "weibo": ("weibo", lambda n: f"https://m.weibo.cn/detail/{4990000000000000 + n}"),
+    "weibo_long": ("weibo", lambda n: f"https://m.weibo.cn/detail/{4991000000000000 + n}"),
+    "acfun": ("acfun", lambda n: f"https://www.acfun.cn/v/ac{44130000 + n}"),
+    "netease": ("netease", lambda n: f"https://music.163.com/song?id={1901371647 + n}"),
+    "kugou": ("kugou", lambda n: f"https://www.kugou.com/mixsong/bench{n}.html"),
+}  # fmt: skip
+""" 用例名 -> (平台名, 第 n 条消息的内容) """
+
+
+def music_backends(count: int) -> dict[str, list[str]]:
+    """替身服务器按域名后缀路由，镜像地址用子域名区分"""
+    if count <= 1:
+        return {}
+    mirrors = ["", *(f"m{i}." for i in range(1, count))]
+    return {
+        "resolver_netease_apis": [f"https://{m}www.markingchen.ink" for m in mirrors],
+        "resolver_netease_temp_apis": [
+            f"https://{m}api.lolimi.cn/API/wydg/api.php?msg={{}}&n=1" for m in mirrors
+        ],
+        "resolver_kugou_temp_apis": [
+            f"https://{m}www.hhlqilongzhu.cn/api/dg_kgmusic.php?gm={{}}&n=1&type=json"
+            for m in mirrors
+        ],
+    }
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ms = sorted(v * 1000 for v in values)
+    if len(ms) == 1:
+        qs = ms * 99
+    else:
+        qs = statistics.quantiles(ms, n=100, method="inclusive")
+    return {
+        "p50": round(qs[49], 2),
+        "p90": round(qs[89], 2),
+        "p95": round(qs[94], 2),
+        "p99": round(qs[98], 2),
+        "max": round(ms[-1], 2),
+        "mean": round(statistics.fmean(ms), 2),
+    }
+
+
+async def run_case(
+    name: str,
+    handler: Callable,
+    make_message: Callable[[int], str],
+    iterations: int,
+    concurrency: int,
+    workdir: Path,
+    bot_latency: float,
+    stall_ms: float,
+) -> dict:
+    from nonebot_plugin_resolver.core.lag import LagMonitor
+
+    bot = FakeBot(api_latency=bot_latency)
+    # 与插件诊断模式相同的监控，采样更密，超过 stall_ms 的阻塞会记下调用栈
+    monitor = LagMonitor(interval=0.01, threshold=stall_ms / 1000)
+    platform_name = CASES[name][0]
+
+    async def tracked(bot, event, matcher):
+        with monitor.track(platform_name):
+            await handler(bot, event, matcher)
+
+    runs = []
+    errors: dict[str, int] = {}
+    seq = 0
+    monitor.start()
+    with ResourceSampler(workdir) as sampler:
+        # 串行：测延迟
+        for _ in range(iterations):
+            runs.append(await run_handler(tracked, bot, make_event(make_message(seq))))
+            seq += 1
+        # 并发：测吞吐
+        start = time.perf_counter()
+        concurrent_runs = await asyncio.gather(
+            *[
+                run_handler(tracked, bot, make_event(make_message(seq + i)))
+                for i in range(concurrency)
+            ]
+        )
+        wall = time.perf_counter() - start
+    monitor.stop()
+    for run in [*runs, *concurrent_runs]:
+        if run.error:
+            errors[run.error] = errors.get(run.error, 0) + 1
+    leftover = dir_size(workdir)
+    return {
+        "iterations": iterations,
+        "errors": sum(errors.values()),
+        "error_kinds": errors,
+        "latency_ms": percentiles([r.latency for r in runs]),
+        "first_send_ms": percentiles(
+            [r.first_send for r in runs if r.first_send is not None]
+        ),
+        "throughput": {
+            "concurrency": concurrency,
+            "seconds": round(wall, 3),
+            "msg_per_s": round(concurrency / wall, 3) if wall else None,
+            "latency_ms": percentiles([r.latency for r in concurrent_runs]),
+        },
+        "loop_lag_ms": percentiles(list(monitor.lags)),
+        "stalls": monitor.snapshot()["by_handler"],
+        "peak_rss_mb": round(sampler.peak_rss / 2**20, 2),
+        "peak_disk_mb": round(sampler.peak_disk / 2**20, 2),
+        "leftover_disk_mb": round(leftover / 2**20, 2),
+        "bytes_sent_mb": round(bot.bytes_sent / 2**20, 2),
+        "bot_calls": len(bot.calls),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+COMPARED = (
+    ("latency_ms.p50", True),
+    ("latency_ms.p95", True),
+    ("first_send_ms.p50", True),
+    ("throughput.msg_per_s", False),
+    ("loop_lag_ms.p99", True),
+    ("peak_rss_mb", True),
+    ("peak_disk_mb", True),
+)
+""" 回归对比的指标，第二项表示是否越小越好 """
+
+
+def _lookup(data: dict, dotted: str):
+    for key in dotted.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """与基线对比，返回超过阈值的回归项"""
+    regressions = []
+    for case, current in results["cases"].items():
+        base = baseline.get("cases", {}).get(case)
+        if not base:
+            continue
+        for metric, lower_is_better in COMPARED:
+            old, new = _lookup(base, metric), _lookup(current, metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = (
+                change > max_regression if lower_is_better else -change > max_regression
+            )
+            mark = "!!" if worse else "  "
+            print(
+                f"{mark} {case:<16} {metric:<22} {old:>10} -> {new:>10} ({change:+.1%})"
+            )
+            if worse:
+                regressions.append(f"{case} {metric} {change:+.1%}")
+    return regressions
+
+
+def print_table(results: dict) -> None:
+    header = f"{'case':<16}{'p50':>10}{'p95':>10}{'first':>10}{'msg/s':>9}{'lag99':>8}{'lagmax':>8}{'rss MB':>9}{'disk MB':>9}{'left MB':>9}{'err':>5}"
+    print(header)
+    print("-" * len(header))
+    for case, r in results["cases"].items():
+        print(
+            f"{case:<16}"
+            f"{r['latency_ms'].get('p50', '-'):>10}"
+            f"{r['latency_ms'].get('p95', '-'):>10}"
+            f"{r['first_send_ms'].get('p50', '-'):>10}"
+            f"{r['throughput']['msg_per_s'] or '-':>9}"
+            f"{r['loop_lag_ms'].get('p99', '-'):>8}"
+            f"{r['loop_lag_ms'].get('max', '-'):>8}"
+            f"{r['peak_rss_mb']:>9}"
+            f"{r['peak_disk_mb']:>9}"
+            f"{r['leftover_disk_mb']:>9}"
+            f"{r['errors']:>5}"
+        )
+    stalls = [
+        (case, handler, s)
+        for case, r in results["cases"].items()
+        for handler, s in r.get("stalls", {}).items()
+    ]
+    if stalls:
+        print("\n阻塞事件循环的位置（每个处理函数取最长的一次）:")
+        for case, handler, s in stalls:
+            print(
+                f"  {case:<16}{s['count']:>4} 次 {s['max_ms']:>8}ms  {handler}  {s['site']}"
+            )
+    if results["unmatched_routes"]:
+        print("\n未匹配的请求（需要补充 fixture）:")
+        for route, hits in results["unmatched_routes"].items():
+            print(f"  {hits:>4}  {route}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    media = MediaStore(
+        Path(args.media_dir),
+        video_seconds=args.video_seconds,
+        video_bitrate=args.video_bitrate,
+    )
+    media.build()
+    server = StandinServer(
+        media,
+        api_delay=args.api_delay,
+        xhs_page_kb=args.xhs_page_kb,
+        api_tail=args.api_tail,
+        payload_kb=args.payload_kb,
+        media_mbps=args.media_mbps,
+    )
+    server.serve_in_thread()
+    install_rewrite(server.base_url, REWRITE_HOSTS)
+
+    workdir = Path(tempfile.mkdtemp(prefix="resolver-bench-"))
+    os.chdir(workdir)
+    bootstrap(
+        log_level=args.log_level,
+        douyin_ck="bench",
+        xhs_ck="bench",
+        is_oversea=True,
+        r_global_nickname="bench",
+        video_duration_maximum=3600,
+        download_video=True,
+        resolver_cache_mb=args.media_cache_mb,
+        resolver_offload_workers=args.offload_workers,
+        resolver_stream_merge=not args.no_stream_merge,
+        # 默认关闭按平台限速，否则测到的是限速本身
+        resolver_rate_limits=(
+            {} if args.rate_limits else {p: (0, 1) for p, _ in CASES.values()}
+        ),
+        resolver_offload_mode=args.offload_mode,
+        **music_backends(args.music_backends),
+    )
+    from nonebot_plugin_resolver.platforms import import_handler
+
+    selected = args.cases.split(",") if args.cases else list(CASES)
+    results = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "ffmpeg": media.has_ffmpeg,
+            "args": vars(args),
+        },
+        "cases": {},
+    }
+    try:
+        for case in selected:
+            platform_name, make_message = CASES[case]
+            print(f"running {case} ...", file=sys.stderr)
+            results["cases"][case] = await run_case(
+                case,
+                import_handler(platform_name),
+                make_message,
+                args.iterations,
+                args.concurrency,
+                workdir,
+                args.bot_latency,
+                args.stall_ms,
+            )
+            for entry in workdir.iterdir():
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink(missing_ok=True)
+    finally:
+        server.shutdown()
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+    results["route_hits"] = server.hits
+    results["unmatched_routes"] = server.unmatched
+    results["bytes_served_mb"] = round(server.bytes_served / 2**20, 2)
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--cases", default="", help=f"逗号分隔，可选：{','.join(CASES)}"
+    )
+    parser.add_argument("--iterations", type=int, default=10, help="串行测延迟的次数")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="测吞吐时同时到达的消息数"
+    )
+    parser.add_argument(
+        "--api-delay", type=float, default=0.02, help="替身接口的模拟 RTT（秒）"
+    )
+    parser.add_argument(
+        "--api-tail",
+        type=float,
+        default=0.0,
+        help="接口响应慢 20 倍的概率，模拟长尾延迟",
+    )
+    parser.add_argument(
+        "--music-backends",
+        type=int,
+        default=1,
+        help="音乐解析配置的可互换后端数，大于 1 时会对冲请求",
+    )
+    parser.add_argument(
+        "--bot-latency",
+        type=float,
+        default=0.005,
+        help="假 Bot 每次 API 调用的耗时（秒）",
+    )
+    parser.add_argument("--video-seconds", type=int, default=20)
+    parser.add_argument("--video-bitrate", default="4M")
+    parser.add_argument("--xhs-page-kb", type=int, default=400)
+    parser.add_argument(
+        "--payload-kb",
+        type=int,
+        default=300,
+        help="抖音作品详情与 acfun 页面的填充体积",
+    )
+    parser.add_argument(
+        "--offload-workers",
+        type=int,
+        default=2,
+        help="解析进程池大小，为 0 时就地解析（对照组）",
+    )
+    parser.add_argument(
+        "--media-mbps",
+        type=float,
+        default=0,
+        help="媒体文件每个连接的下载带宽，为 0 时不限速",
+    )
+    parser.add_argument(
+        "--no-stream-merge", action="store_true", help="B 站视频先下载再合并（对照组）"
+    )
+    parser.add_argument(
+        "--rate-limits", action="store_true", help="启用插件默认的按平台限速"
+    )
+    parser.add_argument(
+        "--stall-ms",
+        type=float,
+        default=100,
+        help="事件循环延迟超过多少毫秒时记录阻塞处的调用栈",
+    )
+    parser.add_argument(
+        "--offload-mode", default="process", choices=["process", "thread"]
+    )
+    parser.add_argument("--media-dir", default=str(media_cache_dir()))
+    parser.add_argument(
+        "--media-cache-mb",
+        type=int,
+        default=0,
+        help="发送端媒体缓存容量，默认关闭以测量完整流程",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default="", help="写出 JSON 结果的路径")
+    parser.add_argument("--baseline", default="", help="用于回归对比的历史 JSON 结果")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,814 @@
+"""
+本地替身服务器：回放录制好的各平台接口响应与媒体文件。
+
+所有外部请求都会被 ``harness.install_rewrite`` 改写为
+``http://127.0.0.1:{port}/_/{host}{path}``，这里按 host + path 前缀分发到对应的 fixture。
+"""
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+from urllib.parse import quote
+
+from aiohttp import web
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+REWRITE_HOSTS = (
+    "b23.tv",
+    "bilibili.com",
+    "bilivideo.com",
+    "hdslb.com",
+    "douyin.com",
+    "iesdouyin.com",
+    "douyinvod.com",
+    "douyinpic.com",
+    "snssdk.com",
+    "xhslink.com",
+    "xiaohongshu.com",
+    "xhscdn.com",
+    "weibo.cn",
+    "weibo.com",
+    "sinaimg.cn",
+    "weibocdn.com",
+    "acfun.cn",
+    "markingchen.ink",
+    "lolimi.cn",
+    "163.com",
+    "163cn.tv",
+    "126.net",
+    "kugou.com",
+    "hhlqilongzhu.cn",
+)
+""" 需要改写到替身服务器的域名（后缀匹配） """
+
+TAIL_FACTOR = 20
+
+WEIBO_LONG_PREFIX = "4991"
+""" 这个前缀的微博 id 按长微博返回：全文要走 extend 接口，图片超过 9 张要走 PC 版接口 """
+
+WEIBO_LONG_PICS = 12
+
+Handler = Callable[[web.Request, str, str], Awaitable[web.StreamResponse]]
+
+
+def load_fixture(name: str) -> dict:
+    with open(FIXTURES / name, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _json(data, status: int = 200) -> web.Response:
+    return web.Response(
+        text=json.dumps(data, ensure_ascii=False),
+        status=status,
+        content_type="application/json",
+    )
+
+
+class MediaStore:
+    """
+    生成基准测试用的媒体文件。
+    有 ffmpeg 时生成真实可合并的音视频，否则退化为随机字节（依赖 ffmpeg 的步骤会失败并计入错误）。
+    """
+
+    def __init__(self, root: Path, video_seconds: int = 20, video_bitrate: str = "4M"):
+        self.root = root
+        self.video_seconds = video_seconds
+        self.video_bitrate = video_bitrate
+        self.has_ffmpeg = shutil.which("ffmpeg") is not None
+        self.segments: list[tuple[str, float]] = []
+        self.init_segment: str | None = None
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def build(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.has_ffmpeg:
+            self._build_with_ffmpeg()
+        else:
+            self._build_random()
+
+    def _ffmpeg(self, *args: str) -> None:
+        subprocess.run(
+            ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", *args],
+            check=True,
+        )
+
+    def _build_with_ffmpeg(self) -> None:
+        seconds = str(self.video_seconds)
+        video_src = f"testsrc=size=1280x720:rate=25:duration={seconds}"
+        audio_src = f"sine=frequency=440:sample_rate=44100:duration={seconds}"
+        fragmented = "frag_keyframe+empty_moov+default_base_moof"
+        self._ffmpeg(
+            "-f", "lavfi", "-i", video_src,
+            "-c:v", "libx264", "-preset", "ultrafast", "-b:v", self.video_bitrate,
+            "-g", "50", "-movflags", fragmented, "-f", "mp4",
+            str(self.path("video.m4s")),
+        )  # fmt: skip
+        self._ffmpeg(
+            "-f", "lavfi", "-i", audio_src,
+            "-c:a", "aac", "-b:a", "128k", "-movflags", fragmented, "-f", "mp4",
+            str(self.path("audio.m4s")),
+        )  # fmt: skip
+        self._ffmpeg(
+            "-f", "lavfi", "-i", video_src, "-f", "lavfi", "-i", audio_src,
+            "-c:v", "libx264", "-preset", "ultrafast", "-b:v", self.video_bitrate,
+            "-c:a", "aac", "-g", "50", "-movflags", "+faststart",
+            str(self.path("video.mp4")),
+        )  # fmt: skip
+        self._ffmpeg(
+            "-f", "lavfi", "-i", audio_src, "-c:a", "libmp3lame", "-b:a", "128k",
+            str(self.path("song.mp3")),
+        )  # fmt: skip
+        self._ffmpeg(
+            "-f", "lavfi", "-i", "testsrc=size=1080x1440:rate=1", "-frames:v", "1",
+            str(self.path("image.jpg")),
+        )  # fmt: skip
+        hls = self.root / "hls"
+        shutil.rmtree(hls, ignore_errors=True)
+        hls.mkdir()
+        self._ffmpeg(
+            "-i", str(self.path("video.mp4")), "-c", "copy",
+            "-f", "hls", "-hls_time", "2", "-hls_list_size", "0",
+            "-hls_segment_filename", str(hls / "acvideo_720p.%05d.ts"),
+            str(hls / "playlist.m3u8"),
+        )  # fmt: skip
+        if not self._can_demux(hls / "acvideo_720p.00000.ts"):
+            # 部分静态编译的 ffmpeg 在沙箱中读取 MPEG-TS 会崩溃，退化为 fMP4 分片（EXT-X-MAP）
+            shutil.rmtree(hls)
+            hls.mkdir()
+            self.init_segment = "init.mp4"
+            self._ffmpeg(
+                "-i", str(self.path("video.mp4")), "-c", "copy",
+                "-f", "hls", "-hls_time", "2", "-hls_list_size", "0",
+                "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+                "-hls_segment_filename", str(hls / "acvideo_720p.%05d.m4s"),
+                str(hls / "playlist.m3u8"),
+            )  # fmt: skip
+        self.segments = []
+        duration = None
+        for line in (hls / "playlist.m3u8").read_text().splitlines():
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:") :].split(",")[0])
+            elif line and not line.startswith("#"):
+                self.segments.append((line, duration or 2.0))
+
+    def _can_demux(self, path: Path) -> bool:
+        result = subprocess.run(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-i",
+                str(path),
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+        )
+        return result.returncode == 0
+
+    def _build_random(self) -> None:
+        rng = random.Random(0)
+        size = self.video_seconds * 512 * 1024
+        for name, length in (
+            ("video.m4s", size),
+            ("audio.m4s", size // 8),
+            ("video.mp4", size),
+            ("song.mp3", size // 8),
+            ("image.jpg", 200 * 1024),
+        ):
+            self.path(name).write_bytes(rng.randbytes(length))
+        hls = self.root / "hls"
+        hls.mkdir(exist_ok=True)
+        self.segments = []
+        for i in range(max(1, self.video_seconds // 2)):
+            name = f"acvideo_720p.{i:05d}.ts"
+            (hls / name).write_bytes(rng.randbytes(size // 10))
+            self.segments.append((name, 2.0))
+
+    def m3u8(self, query: str = "") -> str:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-TARGETDURATION:3",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        if self.init_segment:
+            lines.append(f'#EXT-X-MAP:URI="{self.init_segment}"')
+        for name, duration in self.segments:
+            lines.append(f"#EXTINF:{duration:.6f},")
+            lines.append(f"{name}?{query}" if query else name)
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+
+PADDING = "@@PADDING@@"
+""" 填充内容的占位符，编码后整段替换 """
+
+
+class StandinServer:
+    """
+    基于 aiohttp 的替身服务器，记录命中的路由与未匹配的请求，方便维护 fixture。
+    """
+
+    def __init__(
+        self,
+        media: MediaStore,
+        api_delay: float = 0.0,
+        xhs_page_kb: int = 400,
+        api_tail: float = 0.0,
+        payload_kb: int = 0,
+        media_mbps: float = 0.0,
+        media_total_mbps: float = 0.0,
+        media_connections: int = 0,
+    ):
+        self.media = media
+        self.api_delay = api_delay
+        self.api_tail = api_tail
+        """ 接口响应慢 TAIL_FACTOR 倍的概率，模拟第三方接口的长尾延迟 """
+        self._rng = random.Random(0)
+        self.xhs_page_kb = xhs_page_kb
+        self.payload_kb = payload_kb
+        self.media_mbps = media_mbps
+        """ 媒体文件每个连接的下载带宽（Mbps），为 0 时不限速 """
+        """ 抖音作品详情与 acfun 页面额外填充的体积，模拟真实响应中与解析无关的大段字段 """
+        self.media_total_mbps = media_total_mbps
+        """ 所有媒体连接共享的总带宽（Mbps），连接之间平分，为 0 时不限 """
+        self.media_connections = media_connections
+        """ 同时进行的媒体连接上限（限速发送时生效），超出时返回 503（模拟 CDN 限流），为 0 时不限 """
+        self.media_active = 0
+        self.media_rejected = 0
+        self._padding: str | None = None
+        self._xhs_feeds: str | None = None
+        self._acfun_padding: str | None = None
+        self.hits: dict[str, int] = {}
+        self.unmatched: dict[str, int] = {}
+        self.bytes_served = 0
+        self._runner: web.AppRunner | None = None
+        self.port = 0
+        self.routes: list[tuple[str, str, Handler]] = [
+            # bilibili
+            ("api.bilibili.com", "/x/web-interface/nav", self.bili_nav),
+            ("api.bilibili.com", "/x/web-interface/wbi/view", self.bili_view),
+            ("api.bilibili.com", "/x/web-interface/view", self.bili_view),
+            ("api.bilibili.com", "/x/player/pagelist", self.bili_pagelist),
+            ("api.bilibili.com", "/x/player/online/total", self.bili_online),
+            ("api.bilibili.com", "/x/player/wbi/playurl", self.bili_playurl),
+            ("api.bilibili.com", "/x/player/playurl", self.bili_playurl),
+            ("api.bilibili.com", "/x/frontend/finger/spi", self.bili_spi),
+            ("api.bilibili.com", "/bapis/bilibili.api.ticket", self.bili_ticket),
+            (
+                "api.bilibili.com",
+                "/x/polymer/web-dynamic/v1/opus/detail",
+                self.bili_opus,
+            ),
+            ("api.bilibili.com", "/x/v3/fav/resource/list", self.bili_favlist),
+            (
+                "api.live.bilibili.com",
+                "/xlive/web-room/v1/index/getInfoByRoom",
+                self.bili_live,
+            ),
+            ("api.bilibili.com", "/", self.bili_default),
+            ("b23.tv", "/", self.b23),
+            ("bilivideo.com", "/", self.bili_media),
+            ("hdslb.com", "/", self.image),
+            # 抖音
+            ("v.douyin.com", "/", self.douyin_short),
+            ("www.douyin.com", "/aweme/v1/web/aweme/detail", self.douyin_detail),
+            ("aweme.snssdk.com", "/aweme/v1/play", self.douyin_play),
+            ("douyinvod.com", "/", self.video),
+            ("douyinpic.com", "/", self.image),
+            # 小红书
+            ("xhslink.com", "/", self.xhs_short),
+            ("www.xiaohongshu.com", "/", self.xhs_page),
+            ("sns-video-bd.xhscdn.com", "/", self.video),
+            ("xhscdn.com", "/", self.image),
+            # 微博
+            ("m.weibo.cn", "/statuses/show", self.weibo_show),
+            ("m.weibo.cn", "/statuses/extend", self.weibo_extend),
+            ("weibo.com", "/ajax/statuses/show", self.weibo_ajax_show),
+            ("sinaimg.cn", "/", self.image),
+            ("weibocdn.com", "/", self.video),
+            # acfun
+            ("www.acfun.cn", "/v/", self.acfun_page),
+            ("acfun.cn", "/mediacloud/", self.acfun_hls),
+            # 网易云
+            ("163cn.tv", "/", self.ncm_short),
+            ("www.markingchen.ink", "/song/detail", self.ncm_detail),
+            ("api.lolimi.cn", "/", self.ncm_temp),
+            ("m701.music.126.net", "/", self.song),
+            ("126.net", "/", self.image),
+            # 酷狗
+            ("www.kugou.com", "/", self.kugou_page),
+            ("www.hhlqilongzhu.cn", "/", self.kugou_temp),
+            ("webfs.kugou.com", "/", self.song),
+            ("kugou.com", "/", self.image),
+        ]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_route("*", "/_/{host}/{tail:.*}", self.dispatch)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    def serve_in_thread(self) -> None:
+        """
+        在独立线程的事件循环中运行服务器。
+        插件里仍有同步阻塞的请求，与被测代码共用事件循环会互相卡死。
+        """
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="standin", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def shutdown(self) -> None:
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def dispatch(self, request: web.Request) -> web.StreamResponse:
+        host = request.match_info["host"]
+        path = "/" + request.match_info["tail"]
+        for pattern, prefix, handler in self.routes:
+            if (host == pattern or host.endswith("." + pattern)) and path.startswith(
+                prefix
+            ):
+                key = f"{pattern}{prefix}"
+                self.hits[key] = self.hits.get(key, 0) + 1
+                return await handler(request, host, path)
+        key = f"{host}{path}"
+        self.unmatched[key] = self.unmatched.get(key, 0) + 1
+        return web.Response(status=404)
+
+    def _delay(self) -> float:
+        if self.api_tail and self._rng.random() < self.api_tail:
+            return self.api_delay * TAIL_FACTOR
+        return self.api_delay
+
+    async def _api(self, data, status: int = 200) -> web.Response:
+        if delay := self._delay():
+            await asyncio.sleep(delay)
+        return _json(data, status)
+
+    def padding(self) -> str:
+        """
+        约 payload_kb KB 的推荐列表（JSON 文本），字段形状接近真实接口。
+        只生成一次，响应里先放 PADDING 占位再整段替换：替身服务器和被测插件在同一个进程里，
+        每次都重新编码几百 KB 会占住 GIL，把替身自己的耗时算进插件的事件循环延迟
+        """
+        if self._padding is None:
+            item = {
+                "id": "0",
+                "title": "推荐内容标题 bench",
+                "cover": {"url_list": ["https://p3-sign.douyinpic.com/bench~tplv.jpeg"], "width": 1080, "height": 1920},
+                "author": {"nickname": "bench", "uid": "0", "avatar": "https://p3.douyinpic.com/aweme/bench.jpeg"},
+                "statistics": {"digg_count": 1, "comment_count": 2, "share_count": 3},
+                "tags": ["bench"] * 8,
+            }  # fmt: skip
+            size = len(json.dumps(item, ensure_ascii=False))
+            self._padding = json.dumps(
+                [item | {"id": str(i)} for i in range(self.payload_kb * 1024 // size)],
+                ensure_ascii=False,
+            )
+        return self._padding
+
+    async def _file(self, request, path: Path) -> web.StreamResponse:
+        if self.media_connections and self.media_active >= self.media_connections:
+            self.media_rejected += 1
+            return web.Response(status=503, headers={"retry-after": "1"})
+        self.bytes_served += path.stat().st_size
+        limited = self.media_mbps or self.media_total_mbps
+        if not limited or "range" in request.headers:
+            return web.FileResponse(path)
+        # 按单个连接的带宽（以及总带宽的平分份额）限速发送，模拟 CDN 下载耗时
+        response = web.StreamResponse(
+            headers={"content-length": str(path.stat().st_size)}
+        )
+        self.media_active += 1
+        try:
+            await response.prepare(request)
+            chunk_size = 64 * 1024
+            with open(path, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    await response.write(chunk)
+                    await asyncio.sleep(len(chunk) * 8 / self._media_bps())
+            await response.write_eof()
+        finally:
+            self.media_active -= 1
+        return response
+
+    def _media_bps(self) -> float:
+        rates = []
+        if self.media_mbps:
+            rates.append(self.media_mbps * 1e6)
+        if self.media_total_mbps:
+            rates.append(self.media_total_mbps * 1e6 / max(1, self.media_active))
+        return min(rates)
+
+    async def image(self, request, host, path):
+        return await self._file(request, self.media.path("image.jpg"))
+
+    async def video(self, request, host, path):
+        return await self._file(request, self.media.path("video.mp4"))
+
+    async def song(self, request, host, path):
+        return await self._file(request, self.media.path("song.mp3"))
+
+    # ---------------- bilibili ----------------
+
+    async def bili_nav(self, request, host, path):
+        return await self._api(
+            {
+                "code": -101,
+                "message": "账号未登录",
+                "data": {
+                    "isLogin": False,
+                    "wbi_img": {
+                        "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                        "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+                    },
+                },
+            }
+        )
+
+    async def bili_view(self, request, host, path):
+        data = load_fixture("bili_view.json")
+        if bvid := request.query.get("bvid"):
+            data["data"]["bvid"] = bvid
+        return await self._api(data)
+
+    async def bili_pagelist(self, request, host, path):
+        return await self._api(
+            {"code": 0, "data": load_fixture("bili_view.json")["data"]["pages"]}
+        )
+
+    async def bili_online(self, request, host, path):
+        return await self._api({"code": 0, "data": {"total": "1000+", "count": "321"}})
+
+    async def bili_playurl(self, request, host, path):
+        return await self._api(load_fixture("bili_playurl.json"))
+
+    async def bili_opus(self, request, host, path):
+        data = load_fixture("bili_opus_detail.json")
+        data["data"]["item"]["id_str"] = request.query.get("id", "0")
+        return await self._api(data)
+
+    async def bili_favlist(self, request, host, path):
+        fid, page = request.query.get("media_id", "0"), int(request.query.get("pn", 1))
+        total = 95
+        start = (page - 1) * 20
+        medias = [
+            {
+                "id": i,
+                "bvid": f"BV1fav{i:06d}",
+                "title": f"收藏夹 {fid} 第 {i + 1} 个视频",
+                "intro": "基准测试用的收藏",
+                "cover": f"https://i0.hdslb.com/bfs/archive/fav{fid}-{i}.jpg",
+                "link": f"bilibili://video/{i}",
+            }
+            for i in range(start, min(start + 20, total))
+        ]
+        return await self._api(
+            {
+                "code": 0,
+                "data": {
+                    "info": {"id": fid, "title": "基准收藏夹", "media_count": total},
+                    "medias": medias,
+                    "has_more": start + 20 < total,
+                },
+            }
+        )
+
+    async def bili_live(self, request, host, path):
+        room_id = request.query.get("room_id", "0")
+        return await self._api(
+            {
+                "code": 0,
+                "data": {
+                    "room_info": {
+                        "room_id": int(room_id),
+                        "title": f"基准直播间 {room_id}",
+                        "cover": f"https://i0.hdslb.com/bfs/live/cover{room_id}.jpg",
+                        "keyframe": f"https://i0.hdslb.com/bfs/live-key-frame/{room_id}.jpg",
+                        "live_status": 1,
+                    },
+                    "anchor_info": {"base_info": {"uname": "bench"}},
+                },
+            }
+        )
+
+    async def bili_spi(self, request, host, path):
+        return await self._api(
+            {
+                "code": 0,
+                "data": {
+                    "b_3": "BENCH-B3-0000-0000-0000-000000000000infoc",
+                    "b_4": "BENCH-B4-0000-0000-0000-000000000000",
+                },
+            }
+        )
+
+    async def bili_ticket(self, request, host, path):
+        return await self._api(
+            {
+                "code": 0,
+                "data": {
+                    "ticket": "bench.ticket",
+                    "created_at": int(time.time()),
+                    "ttl": 259200,
+                    "nav": {"img": "", "sub": ""},
+                },
+            }
+        )
+
+    async def bili_default(self, request, host, path):
+        return await self._api({"code": 0, "message": "0", "ttl": 1, "data": {}})
+
+    async def b23(self, request, host, path):
+        code = path.strip("/") or "BV1GJ411x7h7"
+        raise web.HTTPFound(f"https://www.bilibili.com/video/{code}?share_source=copy")
+
+    async def bili_media(self, request, host, path):
+        name = "audio.m4s" if "30280" in path else "video.m4s"
+        return await self._file(request, self.media.path(name))
+
+    # ---------------- 抖音 ----------------
+
+    async def douyin_short(self, request, host, path):
+        aweme_id = path.strip("/")
+        kind = "video" if int(aweme_id[-1]) % 2 == 0 else "note"
+        raise web.HTTPFound(
+            f"https://www.iesdouyin.com/share/{kind}/{aweme_id}/?region=CN"
+        )
+
+    async def douyin_detail(self, request, host, path):
+        aweme_id = request.query.get("aweme_id", "0")
+        name = (
+            "douyin_aweme_detail_video.json"
+            if int(aweme_id[-1]) % 2 == 0
+            else "douyin_aweme_detail_image.json"
+        )
+        data = load_fixture(name)
+        data["aweme_detail"]["aweme_id"] = aweme_id
+        data["aweme_detail"]["related_list"] = PADDING
+        if delay := self._delay():
+            await asyncio.sleep(delay)
+        return web.Response(
+            text=json.dumps(data, ensure_ascii=False).replace(
+                json.dumps(PADDING), self.padding()
+            ),
+            content_type="application/json",
+        )
+
+    async def douyin_play(self, request, host, path):
+        raise web.HTTPFound("https://v26-web.douyinvod.com/video/bench.mp4")
+
+    # ---------------- 小红书 ----------------
+
+    async def xhs_short(self, request, host, path):
+        note_id = path.strip("/")
+        raise web.HTTPFound(
+            f"https://www.xiaohongshu.com/discovery/item/{note_id}"
+            "?xsec_source=app_share&xsec_token=bench"
+        )
+
+    def xhs_html(self, note_id: str) -> str:
+        name = (
+            "xhs_note_video.json"
+            if note_id.endswith("video")
+            else "xhs_note_normal.json"
+        )
+        note = load_fixture(name)
+        note["noteId"] = note_id
+        state = {
+            "global": {"appSettings": {"notificationInterval": 30}, "serverTime": 0},
+            "user": {"loggedIn": False, "userInfo": "@@UNDEFINED@@"},
+            "feed": {"feeds": PADDING},
+            "note": {
+                "firstNoteId": note_id,
+                "currentNoteId": "@@UNDEFINED@@",
+                "noteDetailMap": {
+                    note_id: {
+                        "comments": {"list": [], "cursor": "", "hasMore": True},
+                        "currentTime": 1716459308000,
+                        "note": note,
+                    }
+                },
+                "serverRequestInfo": {"state": "success", "errorCode": 0},
+            },
+        }
+        body = json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+        body = body.replace('"@@UNDEFINED@@"', "undefined")
+        body = body.replace(json.dumps(PADDING), self.xhs_feeds())
+        return (
+            '<!doctype html><html><head><meta charset="utf-8"><title>小红书</title>'
+            '<script>window.__SSR__=true</script></head><body><div id="app"></div>'
+            f"<script>window.__INITIAL_STATE__={body}</script>"
+            '<script src="https://fe-static.xhscdn.com/formula-static/xhs-pc-web/public/vendor.js"></script>'
+            "</body></html>"
+        )
+
+    def xhs_feeds(self) -> str:
+        """用推荐流条目把页面撑到真实页面的体量（数百 KB），同样只生成一次"""
+        if self._xhs_feeds is None:
+            item = {
+                "id": "",
+                "modelType": "note",
+                "noteCard": {
+                    "type": "normal",
+                    "displayTitle": "推荐笔记 undefined 标题",
+                    "user": {"nickname": "bench", "avatar": "https://sns-avatar-qc.xhscdn.com/avatar/bench"},
+                    "interactInfo": {"liked": False, "likedCount": "1"},
+                    "cover": {"urlDefault": "https://sns-webpic-qc.xhscdn.com/bench/cover", "width": 1080, "height": 1440},
+                    "extra": "@@UNDEFINED@@",
+                },
+            }  # fmt: skip
+            encoded_item = len(json.dumps(item, ensure_ascii=False))
+            feeds = [
+                item | {"id": f"{i:024x}"}
+                for i in range(max(1, self.xhs_page_kb * 1024 // encoded_item))
+            ]
+            self._xhs_feeds = json.dumps(
+                feeds, ensure_ascii=False, separators=(",", ":")
+            ).replace('"@@UNDEFINED@@"', "undefined")
+        return self._xhs_feeds
+
+    async def xhs_page(self, request, host, path):
+        note_id = path.rstrip("/").split("/")[-1]
+        if self.api_delay:
+            await asyncio.sleep(self.api_delay)
+        return web.Response(text=self.xhs_html(note_id), content_type="text/html")
+
+    # ---------------- 微博 ----------------
+
+    async def weibo_show(self, request, host, path):
+        data = load_fixture("weibo_show.json")
+        weibo_id = request.query.get("id", data["data"]["id"])
+        data["data"]["id"] = data["data"]["mid"] = weibo_id
+        if weibo_id.startswith(WEIBO_LONG_PREFIX):
+            # 长微博：手机版接口只给摘要和前 9 张图
+            data["data"]["isLongText"] = True
+            data["data"]["pic_num"] = WEIBO_LONG_PICS
+            data["data"]["pics"] = [
+                {
+                    "pid": f"{weibo_id}-{i}",
+                    "url": f"https://wx1.sinaimg.cn/orj360/{weibo_id}-{i}.jpg",
+                    "large": {
+                        "url": f"https://wx1.sinaimg.cn/large/{weibo_id}-{i}.jpg",
+                        "geo": {"width": "1080", "height": "1440"},
+                    },
+                }
+                for i in range(9)
+            ]
+        return await self._api(data)
+
+    async def weibo_extend(self, request, host, path):
+        text = "bench fixture 全文<br />" + "长微博正文 " * 200
+        return await self._api({"ok": 1, "data": {"longTextContent": text}})
+
+    async def weibo_ajax_show(self, request, host, path):
+        weibo_id = request.query.get("id", "")
+        pic_ids = [f"{weibo_id}-{i}" for i in range(WEIBO_LONG_PICS)]
+        return await self._api(
+            {
+                "ok": 1,
+                "pic_ids": pic_ids,
+                "pic_infos": {
+                    pid: {
+                        "largest": {
+                            "url": f"https://wx1.sinaimg.cn/large/{pid}.jpg",
+                            "width": 1080,
+                            "height": 1440,
+                        }
+                    }
+                    for pid in pic_ids
+                },
+            }
+        )
+
+    # ---------------- acfun ----------------
+
+    def acfun_wrapped_page(self, ac_id: str) -> str:
+        info = load_fixture("acfun_video_info.json")
+        info["dougaId"] = ac_id
+        info["recommendList"] = PADDING
+        representations = []
+        for quality, bitrate, width, height in (
+            ("2160p", 12000, 3840, 2160),
+            ("1080p", 4000, 1920, 1080),
+            ("720p60", 3000, 1280, 720),
+            ("720p", 2000, 1280, 720),
+            ("540p", 1000, 960, 540),
+            ("360p", 500, 640, 360),
+        ):
+            representations.append(
+                {
+                    "id": len(representations),
+                    "url": f"https://ali-safety-video.acfun.cn/mediacloud/acfun/acfun_video/hls/{quality}.m3u8?pkey=bench",
+                    "backupUrl": [],
+                    "m3u8Slice": "",
+                    "avgBitrate": bitrate,
+                    "maxBitrate": bitrate * 2,
+                    "width": width,
+                    "height": height,
+                    "frameRate": 25.0,
+                    "qualityType": quality,
+                    "qualityLabel": quality,
+                    "hdrType": 0,
+                }
+            )
+        info["currentVideoInfo"]["ksPlayJson"] = json.dumps(
+            {
+                "adaptationSet": [
+                    {"id": 1, "duration": 20000, "representation": representations}
+                ]
+            }
+        )
+        html = (
+            '<div id="main"></div><script>window.pageInfo = window.videoInfo = '
+            + json.dumps(info, ensure_ascii=False)
+            + "</script><script>window.videoResource = {}</script>"
+        )
+        # 占位符在 html 字段里被编码了两次
+        placeholder = json.dumps(json.dumps(PADDING))[1:-1]
+        if self._acfun_padding is None:
+            self._acfun_padding = json.dumps(self.padding(), ensure_ascii=False)[1:-1]
+        return "/*<!-- fetch-stream -->*/" + json.dumps(
+            {"html": html, "status": 200, "id": "videoInfo_new"}, ensure_ascii=False
+        ).replace(placeholder, self._acfun_padding)
+
+    async def acfun_page(self, request, host, path):
+        ac_id = path.rstrip("/").split("/")[-1].removeprefix("ac")
+        if self.api_delay:
+            await asyncio.sleep(self.api_delay)
+        return web.Response(
+            text=self.acfun_wrapped_page(ac_id), content_type="text/html"
+        )
+
+    async def acfun_hls(self, request, host, path):
+        if path.endswith(".m3u8"):
+            return web.Response(
+                text=self.media.m3u8(f"pkey={quote('bench')}"),
+                content_type="application/vnd.apple.mpegurl",
+            )
+        return await self._file(
+            request, self.media.root / "hls" / path.rsplit("/", 1)[-1]
+        )
+
+    # ---------------- 网易云 ----------------
+
+    async def ncm_short(self, request, host, path):
+        raise web.HTTPFound("https://music.163.com/song?id=1901371647&uct2=bench")
+
+    async def ncm_detail(self, request, host, path):
+        return await self._api(load_fixture("ncm_song_detail.json"))
+
+    async def ncm_temp(self, request, host, path):
+        return await self._api(load_fixture("ncm_temp_api.json"))
+
+    # ---------------- 酷狗 ----------------
+
+    async def kugou_page(self, request, host, path):
+        if delay := self._delay():
+            await asyncio.sleep(delay)
+        return web.Response(
+            text="<html><head><title>bench fixture - bench_高音质在线试听_bench fixture歌词_歌曲下载_酷狗音乐</title></head><body></body></html>",
+            content_type="text/html",
+        )
+
+    async def kugou_temp(self, request, host, path):
+        return await self._api(load_fixture("kugou_temp_api.json"))
+
+
+def media_cache_dir() -> Path:
+    return Path(os.environ.get("RESOLVER_BENCH_MEDIA", "/tmp/resolver-bench-media"))
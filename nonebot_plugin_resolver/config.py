@@ -1,3 +1,4 @@
+from nonebot import get_plugin_config
 from pydantic import BaseModel
 from pydantic import Field
 
@@ -7,7 +8,68 @@ class Config(BaseModel):
     douyin_ck: str = Field(default="")
     is_oversea: bool = Field(default=False)
     bili_sessdata: str = Field(default="")
+    # 额外的 cookie / SESSDATA，与上面的单个配置一起组成 cookie 池轮流使用
+    xhs_cks: list[str] = Field(default=[])
+    douyin_cks: list[str] = Field(default=[])
+    weibo_cks: list[str] = Field(default=[])
+    bili_sessdatas: list[str] = Field(default=[])
     r_global_nickname: str = Field(default="")
     resolver_proxy: str = Field(default="http://127.0.0.1:7890")
+    # 各平台的下载线路，{平台名: [代理地址或 "direct"]}，有多条时后台测速，每次下载选当前最快的健康线路，
+    # 出错时换下一条；没有配置的境外平台沿用 resolver_proxy（is_oversea 时直连）
+    resolver_proxies: dict[str, list[str]] = Field(default={})
     video_duration_maximum: int = Field(default=480)
     download_video: bool = Field(default=True)
+    # 发送端媒体缓存目录，为空时使用工作目录下的 resolver_cache
+    resolver_cache_dir: str = Field(default="")
+    # 媒体缓存容量（MB），为 0 时关闭缓存
+    resolver_cache_mb: int = Field(default=1024)
+    # 专栏渲染时同时使用的浏览器页面数，其余渲染排队等待
+    resolver_render_concurrency: int = Field(default=2)
+    # 多个实例共享下载 / 合并任务的队列，为空时只在进程内去重；
+    # 可填 "sqlite:///path/to/jobs.db"（同一台机器）或 "redis://host:6379/0"（需要安装 redis），
+    # 共享时各实例的 resolver_cache_dir 应放在同一文件系统的不同目录下
+    resolver_queue: str = Field(default="")
+    # B 站视频边下载边用 ffmpeg 合并（需要命名管道，Windows 上自动改为先下载再合并）
+    resolver_stream_merge: bool = Field(default=True)
+    # 启动时预热 B 站会话：共享连接池，提前取好 buvid / WBI 密钥并定期刷新、检查 SESSDATA
+    resolver_bili_prewarm: bool = Field(default=True)
+    # 下载预计还要超过多少秒时在聊天里提示一次（OneBot 不能编辑消息，所以只发一条），为 0 时不提示
+    resolver_progress_notice_seconds: int = Field(default=0)
+    # 关闭时等待正在进行的解析完成的秒数，超时的取消，并结束它们的 ffmpeg / yt-dlp 子进程、删除未写完的文件
+    resolver_shutdown_timeout: int = Field(default=10)
+    # 单次解析的时间预算（秒），获取信息、下载、合并等阶段各分到剩余预算的一部分；
+    # 用完时跳过剩下的内容（通常是视频），已经发出的信息与封面保留，有直链时改发链接；为 0 时不限时
+    resolver_deadline_seconds: int = Field(default=180)
+    # 收藏夹解析最多列出的视频数
+    resolver_favlist_max: int = Field(default=60)
+    # 音乐解析的后端地址，可以各填多个可互换的地址，按顺序优先使用，为空时使用内置地址；
+    # 请求慢于最近的 p95 耗时会同时请求下一个地址，取先返回的结果
+    resolver_netease_apis: list[str] = Field(default=[])
+    resolver_netease_temp_apis: list[str] = Field(default=[])
+    resolver_kugou_temp_apis: list[str] = Field(default=[])
+    # 解析大页面 / 大接口响应的进程池大小，为 0 时全部在事件循环里就地解析
+    resolver_offload_workers: int = Field(default=2)
+    # 响应体达到多少 KB 才交给进程池解析，小响应就地解析更快
+    resolver_offload_threshold_kb: int = Field(default=64)
+    # "process" 或 "thread"；JSON 解码持有 GIL，线程池只能避免阻塞但不能并行
+    resolver_offload_mode: str = Field(default="process")
+    # 诊断模式：监控事件循环延迟，超过阈值时记录阻塞处的调用栈并写日志，结果见“解析状态”
+    resolver_diagnostics: bool = Field(default=False)
+    resolver_lag_threshold_ms: int = Field(default=200)
+    # cookie 池的选取方式："round_robin"（轮询）或 "lru"（最久未使用）
+    resolver_cookie_strategy: str = Field(default="round_robin")
+    # 出现失效特征的 cookie 隔离多少秒
+    resolver_cookie_quarantine: int = Field(default=1800)
+    # 各平台的限速，{平台名: [每秒解析次数, 突发上限]}，覆盖 constants.RATE_LIMITS，每秒次数为 0 表示不限速
+    resolver_rate_limits: dict[str, tuple[float, int]] = Field(default={})
+    # 启用的平台，为空时启用全部平台，可选值见 platforms.PLATFORMS
+    resolver_platforms: list[str] = Field(default=[])
+    # 禁用的平台，优先级高于 resolver_platforms
+    resolver_disabled_platforms: list[str] = Field(default=[])
+
+
+GLOBAL_CONFIG = get_plugin_config(Config)
+GLOBAL_NICKNAME: str = str(getattr(GLOBAL_CONFIG, "r_global_nickname", ""))
+RESOLVER_PROXY: str = getattr(GLOBAL_CONFIG, "resolver_proxy", "http://127.0.0.1:7890")
+IS_OVERSEA: bool = bool(getattr(GLOBAL_CONFIG, "is_oversea", False))
@@ -1,28 +1,36 @@
 import asyncio
 import os
 import time
+import uuid
 import tempfile
 from typing import List, Dict
 
 import aiofiles
 import httpx
+from nonebot import logger
 
 from .constants import COMMON_HEADER
+from .deadline import DeadlineExceeded, stage
+from .progress import DownloadProgress
+from .supervisor import SUPERVISOR
 
 
-async def download_video(url, proxy: str = None, ext_headers=None) -> str:
+async def download_video(
+    url, proxy: str = None, ext_headers=None, hasher=None
+) -> str | None:
     """
     异步下载（httpx）视频，并支持通过代理下载。
     文件名将使用时间戳生成，以确保唯一性。
     如果提供了代理地址，则会通过该代理下载视频。
 
     :param ext_headers:
+    :param hasher: 可选，hashlib 对象，下载时顺带计算内容哈希，省去之后再读一遍文件
     :param url: 要下载的视频的URL。
     :param proxy: 可选，下载视频时使用的代理服务器的URL。
-    :return: 保存视频的路径。
+    :return: 保存视频的路径，下载失败时为 None。
     """
-    # 使用时间戳生成文件名，确保唯一性
-    path = os.path.join(os.getcwd(), f"{int(time.time())}.mp4")
+    # 使用时间戳加随机后缀生成文件名，同一秒内开始的下载也不会写到同一个文件
+    path = os.path.join(os.getcwd(), f"{int(time.time())}-{uuid.uuid4().hex[:8]}.mp4")
 
     # 判断 ext_headers 是否为 None
     if ext_headers is None:
@@ -39,28 +47,47 @@ async def download_video(url, proxy: str = None, ext_headers=None) -> str:
         "follow_redirects": True,
     }
     if proxy:
-        client_config["proxies"] = {"https": proxy}
+        client_config["proxy"] = proxy
 
     # 下载文件
     try:
-        async with httpx.AsyncClient(**client_config) as client:
-            async with client.stream("GET", url) as resp:
-                async with aiofiles.open(path, "wb") as f:
-                    async for chunk in resp.aiter_bytes():
-                        await f.write(chunk)
+        # 出错或被取消时删掉写了一半的文件；超出解析的时间预算时带上直链抛出，由处理函数降级
+        with SUPERVISOR.partial(path):
+            async with stage("download", url):
+                await _stream_to_file(url, path, client_config, hasher)
         return path
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"下载视频错误原因是: {e}")
+        logger.warning(f"下载视频失败：{url}，{e}")
         return None
 
 
+async def _stream_to_file(url: str, path: str, client_config: dict, hasher) -> None:
+    async with httpx.AsyncClient(**client_config) as client:
+        async with client.stream("GET", url) as resp:
+            total = int(resp.headers.get("content-length", 0))
+            with DownloadProgress(os.path.basename(path), total) as progress:
+                async with aiofiles.open(path, "wb") as f:
+                    async for chunk in resp.aiter_bytes():
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        await f.write(chunk)
+                        progress.update(len(chunk))
+
+
 async def download_file(url) -> bytes:
-    async with httpx.AsyncClient() as client:
+    async with stage("download", url), httpx.AsyncClient() as client:
         response = await client.get(url)
         response.raise_for_status()
         return response.content
 
 
+async def download_as_wav(url) -> bytes:
+    """下载音频并转成 wav，用于发送语音"""
+    return await convert_to_wav(await download_file(url))
+
+
 async def convert_to_wav(file_bytes) -> bytes:
     with tempfile.NamedTemporaryFile(delete=False) as input_temp_file:
         input_temp_file.write(file_bytes)
@@ -71,19 +98,18 @@ async def convert_to_wav(file_bytes) -> bytes:
     output_temp_file.close()
 
     try:
-        process = await asyncio.create_subprocess_exec(
-            "ffmpeg",
-            "-y",
-            "-i",
-            input_temp_file_path,
-            output_temp_file_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-
-        _, stderr = await process.communicate()
-
-        if process.returncode != 0:
+        async with stage("transcode"):
+            returncode, _, stderr = await SUPERVISOR.run(
+                "ffmpeg",
+                "-y",
+                "-i",
+                input_temp_file_path,
+                output_temp_file_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+
+        if returncode != 0:
             raise Exception(f"ffmpeg failed: {stderr.decode()}")
 
         with open(output_temp_file_path, "rb") as mp3_file:
@@ -1,25 +1,104 @@
-import json
-import re
-import subprocess
 import os
+import json
+import math
+import shutil
+import asyncio
+import tempfile
+
 import httpx
+import aiofiles
+from nonebot import logger
 
+from .adaptive import AdaptiveLimiter
 from .constants import COMMON_HEADER
+from .deadline import stage
+from .offload import Offloader
+from .progress import DownloadProgress
+from .supervisor import SUPERVISOR
+from .m3u8 import M3U8Parser, Playlist, Segment, select_variant, stream_m3u8
 
 HEADERS = {"referer": "https://www.acfun.cn/", **COMMON_HEADER}
 
+VIDEO_INFO_MARKER = "window.videoInfo ="
+""" 页面中视频信息的赋值语句（前面还有 window.pageInfo = ） """
 
-def parse_ac_url(url: str) -> tuple[str, str, dict]:
-    """解析acfun链接"""
-    url_suffix = "?quickViewId=videoInfo_new&ajaxpipe=1"
-    url = url + url_suffix
+FETCH_STREAM_SEPARATOR = "/*<!-- fetch-stream -->*/"
+""" ajaxpipe 返回的分块分隔符，每块是一个带 html 字段的 JSON """
+
+SEGMENT_CONCURRENCY = (4, 32)
+""" 分片下载的起始并发与并发上限，之间按吞吐自适应调整 """
+
+SEGMENT_RETRIES = 4
+""" 单个分片出错或被限流后最多重试几次 """
+
+SEGMENT_RETRY_DELAY = 0.5
+""" 分片重试的基础等待（秒），每次翻倍；服务端给了 Retry-After 时以它为准 """
+
+THROTTLED_STATUS = (429, 503)
+""" CDN 限流时返回的状态码 """
+
+
+def extract_video_info(raw: str) -> dict:
+    """
+    从页面中取出 window.videoInfo。
+    ajaxpipe 返回的 html 是 JSON 字符串，先按 JSON 正常解码再定位，不做有损的转义替换。
+    """
+    for part in raw.split(FETCH_STREAM_SEPARATOR):
+        html = part
+        stripped = part.strip()
+        if stripped.startswith("{"):
+            try:
+                html = json.loads(stripped).get("html", "")
+            except ValueError:
+                pass
+        pos = html.find(VIDEO_INFO_MARKER)
+        if pos < 0:
+            continue
+        pos += len(VIDEO_INFO_MARKER)
+        while html[pos].isspace():
+            pos += 1
+        return json.JSONDecoder().raw_decode(html, pos)[0]
+    raise ValueError("acfun: 页面中找不到 window.videoInfo")
+
+
+def _bitrate(representation: dict) -> int:
+    return representation.get("avgBitrate") or representation.get("maxBitrate") or 0
+
+
+def select_representation(
+    representations: list[dict],
+    duration_ms: int = 0,
+    max_bytes: int = 0,
+    max_bitrate: int = 0,
+) -> dict:
+    """
+    按码率/体积预算选择清晰度：取满足预算的最高码率，都不满足时取最低码率
+    :param representations: ksPlayJson 中的 representation 列表
+    :param duration_ms: 视频时长（毫秒），用于估算体积
+    :param max_bytes: 体积上限，0 表示不限制
+    :param max_bitrate: 码率上限（kbps），0 表示不限制
+    :return:
+    """
+    ordered = sorted(representations, key=_bitrate, reverse=True)
+    seconds = duration_ms / 1000
+    for representation in ordered:
+        kbps = _bitrate(representation)
+        if max_bitrate and kbps > max_bitrate:
+            continue
+        if max_bytes and seconds and kbps * 1000 / 8 * seconds > max_bytes:
+            continue
+        return representation
+    return ordered[-1]
 
-    raw = httpx.get(url, headers=HEADERS).text
-    strs_remove_header = raw.split("window.pageInfo = window.videoInfo =")
-    strs_remove_tail = strs_remove_header[1].split("</script>")
-    str_json = strs_remove_tail[0]
-    str_json_escaped = escape_special_chars(str_json)
-    video_info = json.loads(str_json_escaped)
+
+def parse_video_page(
+    raw: str, max_bytes: int = 0, max_bitrate: int = 0
+) -> tuple[str, str, dict]:
+    """
+    从视频页面中取出所选清晰度的 m3u8 地址、文件名与视频信息。
+    可以交给进程池执行：返回的视频信息去掉了体积最大的 ksPlayJson。
+    """
+    video_info = extract_video_info(raw)
 
     """校准文件名"""
     ac_id = "ac" + video_info["dougaId"] if video_info["dougaId"] is not None else ""
@@ -35,58 +114,276 @@ def parse_ac_url(url: str) -> tuple[str, str, dict]:
         " ", "-"
     )
 
-    ks_play_json = video_info["currentVideoInfo"]["ksPlayJson"]
-    ks_play = json.loads(ks_play_json)
-    representations = ks_play["adaptationSet"][0]["representation"]
-    url_m3u8s = [d["url"] for d in representations][3]
-    return url_m3u8s, video_name, video_info
-
-
-def parse_m3u8(m3u8_url: str):
-    """解析m3u8链接"""
-    m3u8_relative_links = re.split(
-        r"\n#EXTINF:.{8},\n", httpx.get(m3u8_url, headers=HEADERS).text
-    )[1:]
-    # 修改尾部 去掉尾部多余的结束符
-    patched_tail = m3u8_relative_links[-1].split("\n")[0]
-    m3u8_relative_links[-1] = patched_tail
-
-    # 完整链接，直接加m3u8Url的通用前缀
-    # aria2c下载的文件名，就是取url最后一段，去掉末尾url参数(?之后是url参数)
-    ts_names = [d.split("?")[0] for d in m3u8_relative_links]
-    return (
-        ["/".join(m3u8_url.split("/")[0:-1]) + "/" + d for d in m3u8_relative_links],
-        ts_names,
-        ts_names[0][:-9],
-        ts_names[0][:-9] + ".mp4",
+    current_video_info = video_info["currentVideoInfo"]
+    ks_play = json.loads(current_video_info.pop("ksPlayJson"))
+    representation = select_representation(
+        ks_play["adaptationSet"][0]["representation"],
+        current_video_info.get("durationMillis") or video_info.get("durationMillis", 0),
+        max_bytes,
+        max_bitrate,
+    )
+    return representation["url"], video_name, video_info
+
+
+async def parse_ac_url(
+    url: str,
+    max_bytes: int = 0,
+    max_bitrate: int = 0,
+    offloader: Offloader | None = None,
+) -> tuple[str, str, dict]:
+    """
+    解析acfun链接
+    :param url:
+    :param max_bytes: 体积上限，0 表示不限制
+    :param max_bitrate: 码率上限（kbps），0 表示不限制
+    :param offloader: 传入 Offloader 时，大页面交给它的池解析
+    :return: (m3u8 地址, 文件名, 视频信息)
+    """
+    url_suffix = "?quickViewId=videoInfo_new&ajaxpipe=1"
+    url = url + url_suffix
+
+    async with (
+        stage("resolve"),
+        httpx.AsyncClient(
+            headers=HEADERS, timeout=httpx.Timeout(15, connect=5.0)
+        ) as client,
+    ):
+        raw = (await client.get(url)).text
+    if offloader is None:
+        return parse_video_page(raw, max_bytes, max_bitrate)
+    return await offloader.run(
+        parse_video_page, raw, max_bytes, max_bitrate, size=len(raw)
     )
 
 
-async def download_m3u8_videos(m3u8_full_url, i):
-    """批量下载m3u8"""
-    async with httpx.AsyncClient() as client:
-        async with client.stream("GET", m3u8_full_url, headers=HEADERS) as resp:
-            with open(f"{i}.ts", "wb") as f:
-                async for chunk in resp.aiter_bytes():
-                    f.write(chunk)
+def _retry_delay(resp: httpx.Response | None, attempt: int) -> float:
+    retry_after = resp.headers.get("retry-after", "") if resp is not None else ""
+    if retry_after.isdigit():
+        return float(retry_after)
+    return SEGMENT_RETRY_DELAY * 2**attempt
 
 
-def escape_special_chars(str_json):
-    return str_json.replace('\\\\"', '\\"').replace('\\"', '"')
+async def download_segment(
+    client: httpx.AsyncClient,
+    segment: Segment,
+    path: str,
+    limiter: AdaptiveLimiter,
+    progress: DownloadProgress | None = None,
+) -> None:
+    """下载单个分片，BYTERANGE 分片使用 Range 请求；总大小随各分片的 content-length 累加"""
+    headers = {}
+    if segment.byterange:
+        length, offset = segment.byterange
+        headers["range"] = f"bytes={offset}-{offset + length - 1}"
+    await download_resource(client, segment.uri, path, limiter, headers, progress)
 
 
-def merge_ac_file_to_mp4(ts_names, full_file_name, should_delete=True):
-    concat_str = "\n".join([f"file {i}.ts" for i, d in enumerate(ts_names)])
-    with open("file.txt", "w") as f:
-        f.write(concat_str)
+async def download_resource(
+    client: httpx.AsyncClient,
+    url: str,
+    path: str,
+    limiter: AdaptiveLimiter,
+    headers: dict | None = None,
+    progress: DownloadProgress | None = None,
+) -> None:
+    """
+    在 limiter 的并发名额内下载分片、密钥或初始化段到 path，
+    出错或被限流时通知 limiter 降低并发，等待后重试
+    """
+    counted = False
+    for attempt in range(SEGMENT_RETRIES + 1):
+        size = 0
+        try:
+            async with limiter.slot() as ticket:
+                async with client.stream("GET", url, headers=headers) as resp:
+                    resp.raise_for_status()
+                    if progress is not None and not counted:
+                        # 重试时不重复累加总大小
+                        counted = True
+                        progress.add_total(int(resp.headers.get("content-length", 0)))
+                    async with aiofiles.open(path, "wb") as f:
+                        async for chunk in resp.aiter_bytes():
+                            await f.write(chunk)
+                            size += len(chunk)
+                            if progress is not None:
+                                progress.update(len(chunk))
+            limiter.done(ticket, size)
+            return
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            throttled = (
+                isinstance(e, httpx.HTTPStatusError)
+                and e.response.status_code in THROTTLED_STATUS
+            )
+            if isinstance(e, httpx.HTTPStatusError) and not throttled:
+                raise
+            limiter.congested(ticket)
+            if progress is not None:
+                progress.discard(size)
+            if attempt == SEGMENT_RETRIES:
+                raise
+            await asyncio.sleep(
+                _retry_delay(e.response if throttled else None, attempt)
+            )
 
-    subprocess.call(
-        f'ffmpeg -y -f concat -safe 0 -i "file.txt" -c copy "{full_file_name}"',
-        shell=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    if should_delete:
-        os.unlink("file.txt")
-        for i in range(len(ts_names)):
-            os.unlink(f"{i}.ts")
+
+def write_local_playlist(
+    playlist: Playlist, names: list[str], keys: dict[str, str], path: str
+) -> None:
+    """
+    用下载到本地的分片重写一份 media 播放列表，交给 ffmpeg 的 hls 解复用器合并（同时处理加密）
+    :param playlist:
+    :param names: 与 playlist.segments 一一对应的本地文件名
+    :param keys: 密钥 URI -> 本地文件名
+    :param path:
+    :return:
+    """
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(playlist.target_duration or max((s.duration for s in playlist.segments), default=1))}",
+        f"#EXT-X-MEDIA-SEQUENCE:{playlist.media_sequence}",
+    ]
+    if playlist.map_uri:
+        lines.append('#EXT-X-MAP:URI="init.mp4"')
+    current_key = None
+    for segment, name in zip(playlist.segments, names):
+        if segment.key != current_key:
+            current_key = segment.key
+            if current_key is None:
+                lines.append("#EXT-X-KEY:METHOD=NONE")
+            else:
+                key_line = f'#EXT-X-KEY:METHOD={current_key.method},URI="{keys[current_key.uri]}"'
+                if current_key.iv:
+                    key_line += f",IV={current_key.iv}"
+                lines.append(key_line)
+        if segment.discontinuity:
+            lines.append("#EXT-X-DISCONTINUITY")
+        lines.append(f"#EXTINF:{segment.duration:.6f},")
+        lines.append(name)
+    lines.append("#EXT-X-ENDLIST")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+async def download_m3u8_video(
+    m3u8_url: str,
+    output_dir: str = "",
+    max_bandwidth: int = 0,
+    limiter: AdaptiveLimiter | None = None,
+) -> str:
+    """
+    边解析 m3u8 边下载分片，下载完成后合并为 mp4
+    :param m3u8_url:
+    :param output_dir: 输出目录，默认为当前工作目录
+    :param max_bandwidth: master 播放列表选择子流时的带宽上限
+    :param limiter: 可选，分片下载的并发控制，默认按 SEGMENT_CONCURRENCY 自适应
+    :return: 合并后的 mp4 路径
+    """
+    if limiter is None:
+        initial, maximum = SEGMENT_CONCURRENCY
+        limiter = AdaptiveLimiter(initial, maximum=maximum)
+    workdir = tempfile.mkdtemp(prefix="acfun-", dir=output_dir or os.getcwd())
+    try:
+        async with (
+            stage("download", m3u8_url),
+            httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=httpx.Timeout(30, connect=5.0),
+                follow_redirects=True,
+            ) as client,
+        ):
+            with DownloadProgress(f"acfun {os.path.basename(workdir)}") as progress:
+                playlist = await _download_media_playlist(
+                    client, m3u8_url, workdir, limiter, max_bandwidth, progress
+                )
+        logger.debug(
+            f"acfun 分片下载结束，并发 {limiter.concurrency}（最高 {limiter.stats['peak']}），"
+            f"限流 / 出错 {limiter.stats['congested']} 次"
+        )
+        if not playlist.segments:
+            raise ValueError(f"acfun: 播放列表中没有分片 {m3u8_url}")
+        output = f"{workdir}.mp4"
+        with SUPERVISOR.partial(output):
+            await merge_ac_file_to_mp4(os.path.join(workdir, "playlist.m3u8"), output)
+        return output
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _download_media_playlist(
+    client: httpx.AsyncClient,
+    m3u8_url: str,
+    workdir: str,
+    limiter: AdaptiveLimiter,
+    max_bandwidth: int,
+    progress: DownloadProgress | None = None,
+) -> Playlist:
+    parser = M3U8Parser(m3u8_url)
+    tasks: list[asyncio.Task] = []
+    names: list[str] = []
+    try:
+        async for segment in stream_m3u8(m3u8_url, client, parser):
+            name = f"{len(names):05d}.ts"
+            names.append(name)
+            tasks.append(
+                SUPERVISOR.spawn(
+                    download_segment(
+                        client,
+                        segment,
+                        os.path.join(workdir, name),
+                        limiter,
+                        progress,
+                    )
+                )
+            )
+        playlist = parser.playlist
+        if playlist.is_master and not playlist.segments:
+            variant = select_variant(playlist.variants, max_bandwidth)
+            return await _download_media_playlist(
+                client, variant.uri, workdir, limiter, max_bandwidth, progress
+            )
+        keys = {}
+        for segment in playlist.segments:
+            if segment.key and segment.key.uri and segment.key.uri not in keys:
+                keys[segment.key.uri] = f"key{len(keys)}.bin"
+                await download_resource(
+                    client,
+                    segment.key.uri,
+                    os.path.join(workdir, keys[segment.key.uri]),
+                    limiter,
+                )
+        if playlist.map_uri:
+            await download_resource(
+                client, playlist.map_uri, os.path.join(workdir, "init.mp4"), limiter
+            )
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    write_local_playlist(playlist, names, keys, os.path.join(workdir, "playlist.m3u8"))
+    return playlist
+
+
+async def merge_ac_file_to_mp4(playlist_path: str, full_file_name: str) -> None:
+    """用 ffmpeg 的 hls 解复用器把本地播放列表合并为 mp4"""
+    async with stage("merge"):
+        returncode, _, stderr = await SUPERVISOR.run(
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-allowed_extensions",
+            "ALL",
+            "-protocol_whitelist",
+            "file,crypto,data",
+            "-i",
+            playlist_path,
+            "-c",
+            "copy",
+            full_file_name,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    if returncode != 0:
+        raise Exception(f"ffmpeg failed: {stderr.decode(errors='ignore')[-500:]}")
@@ -0,0 +1,177 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+INCREASE_STEP = 1
+""" 吞吐还在提升时每个窗口加多少并发 """
+
+DECREASE_FACTOR = 0.7
+""" 出错或被限流（429 / 503）时并发乘以多少 """
+
+THROUGHPUT_GAIN = 0.05
+""" 加了并发后，总吞吐比上一个窗口高出这个比例才算“在提升”，低出这个比例则退回一步 """
+
+SLOW_START_GAIN = 1.5
+""" 起步阶段并发翻倍，直到翻倍后的总吞吐不到原来的这么多倍（或者出错），之后改为逐个增加 """
+
+PROBE_AFTER = 3
+""" 到了学到的上限后，持平多少个窗口再试着越过它加一次并发，带宽变化时能重新找到合适的并发 """
+
+
+class AdaptiveLimiter:
+    """
+    按 AIMD 调整并发上限：每完成“当前并发数”个请求算一个窗口，
+    窗口的总吞吐按“请求的平均速度 × 并发”估计，不受前后窗口的请求交叠影响。
+    起步时每个窗口并发翻倍，吞吐不再随并发近似线性增长后改为每个窗口加一；
+    加了并发吞吐却持平或下降时，把当时的并发记为上限（下降时先退回一步）；
+    请求出错或被服务端限流时乘性减少，并把出错时的并发减一记为上限
+    （在上次减少之前发出的请求再失败不重复减，避免一批同时失败的请求把并发减到底）。
+    到了上限后持平 PROBE_AFTER 个窗口再试着越过它；并发没有用满的窗口（剩下的请求不够多）不参与判断。
+    用法与 asyncio.Semaphore 类似：async with limiter.slot() as ticket: ...，
+    成功后调用 done(ticket, 字节数)，出错或被限流调用 congested(ticket)。
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        """
+        :param initial: 起始并发
+        :param minimum:
+        :param maximum: 并发上限，minimum == maximum 时就是固定并发
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.active = 0
+        self.throughput: float | None = None
+        """ 上一个窗口的总吞吐（字节/秒），减少并发后重新测 """
+        self.stats = {"peak": 0, "increased": 0, "decreased": 0, "congested": 0}
+        self._waiters: deque[asyncio.Future] = deque()
+        self._window_rate = 0.0
+        """ 这个窗口里完成的请求的速度之和（字节/秒） """
+        self._window_done = 0
+        self._window_busy = False
+        """ 这个窗口里并发有没有用满过 """
+        self._window_limit = self.concurrency
+        self._previous_limit = self.concurrency
+        self._flat = 0
+        self._slow_start = True
+        self._ceiling = self.maximum
+        """ 学到的并发上限，增加并发不越过它，除非持平够久 """
+        self._decreased_at = -1.0
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """占用一个并发名额，块内完成一个请求；返回拿到名额的时间，出错时交给 congested"""
+        if self._waiters or self.active >= self.concurrency:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 名额已经分给了这个请求，交还
+                    self.active -= 1
+                    self._wake()
+                raise
+        else:
+            self.active += 1
+        self.stats["peak"] = max(self.stats["peak"], self.active)
+        if self.active >= self.concurrency:
+            self._window_busy = True
+        try:
+            yield time.monotonic()
+        finally:
+            self.active -= 1
+            self._wake()
+
+    def _wake(self) -> None:
+        """按排队顺序把空出来的名额分给等待的请求（名额在这里就记到 active 上）"""
+        while self._waiters and self.active < self.concurrency:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def done(self, ticket: float, size: int) -> None:
+        """
+        一个请求成功完成，凑满一个窗口时按吞吐调整并发
+        :param ticket: slot 返回的时间
+        :param size: 这个请求收到的字节数
+        :return:
+        """
+        self._window_rate += size / max(time.monotonic() - ticket, 1e-3)
+        self._window_done += 1
+        if self._window_done < self.concurrency:
+            return
+        if not self._window_busy:
+            # 请求不够用满并发（比如快下载完了），吞吐下降与并发无关
+            self._reset_window()
+            return
+        throughput = self._window_rate / self._window_done * self._window_limit
+        previous = self.throughput
+        # 只有加了并发的窗口才和上一个窗口比，并发相同或更少时吞吐变化说明不了什么
+        grew = previous is not None and self._window_limit > self._previous_limit
+        if self._slow_start and (
+            previous is None or throughput >= previous * SLOW_START_GAIN
+        ):
+            self._resize(self.limit * 2)
+        else:
+            self._slow_start = False
+            if grew and throughput < previous * (1 - THROUGHPUT_GAIN):
+                # 多开的连接没有带来吞吐，反而在抢带宽
+                self._ceiling = self.concurrency - INCREASE_STEP
+                self._resize(self.limit - INCREASE_STEP)
+            elif grew and throughput <= previous * (1 + THROUGHPUT_GAIN):
+                self._ceiling = self.concurrency
+            if self.concurrency < self._ceiling:
+                self._flat = 0
+                self._resize(self.limit + INCREASE_STEP)
+            else:
+                self._flat += 1
+                if self._flat >= PROBE_AFTER:
+                    self._flat = 0
+                    self._ceiling = self.concurrency + INCREASE_STEP
+                    self._resize(self.limit + INCREASE_STEP)
+        self.throughput = throughput
+        self._previous_limit = self._window_limit
+        self._reset_window()
+
+    def congested(self, ticket: float) -> None:
+        """
+        请求出错或被限流：乘性减少并发
+        :param ticket: slot 返回的时间，上次减少之前发出的请求不再重复减少
+        :return:
+        """
+        self.stats["congested"] += 1
+        if ticket <= self._decreased_at or self.active > self.concurrency:
+            # 上次减少还没生效：当时发出的请求还没走完
+            return
+        self._ceiling = self.concurrency - INCREASE_STEP
+        self._resize(self.limit * DECREASE_FACTOR)
+        # 减少后的吞吐不能和之前的窗口比，重新测
+        self.throughput = None
+        self._slow_start = False
+        self._flat = 0
+        self._previous_limit = self.concurrency
+        self._reset_window()
+        self._decreased_at = time.monotonic()
+
+    def _resize(self, limit: float) -> None:
+        limit = min(max(limit, self.minimum), self.maximum)
+        if int(limit) > self.concurrency:
+            self.stats["increased"] += 1
+        elif int(limit) < self.concurrency:
+            self.stats["decreased"] += 1
+        self.limit = limit
+        self._wake()
+
+    def _reset_window(self) -> None:
+        self._window_rate = 0.0
+        self._window_done = 0
+        self._window_busy = self.active >= self.concurrency
+        self._window_limit = self.concurrency
@@ -0,0 +1,219 @@
+import os
+import shutil
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles
+import nonebot
+from nonebot import logger
+
+from .deadline import stage
+from .gallery import prune_directories
+from .supervisor import SUPERVISOR
+
+PAGE_WEIGHT = 6000
+""" 每页的大致字符数，超过后在段落边界处分页 """
+
+IMAGE_WEIGHT = 800
+""" 一张图片折算的字符数（图片比文字更占高度和渲染时间） """
+
+MARKDOWN_EXTENSIONS = [
+    "pymdownx.tasklist",
+    "tables",
+    "fenced_code",
+    "codehilite",
+    "pymdownx.tilde",
+]
+""" 与 htmlrender 的 md_to_pic 保持一致（不含公式） """
+
+
+def split_markdown(md: str, max_weight: int = PAGE_WEIGHT) -> list[str]:
+    """
+    按段落边界把长文切成若干页，不会切开代码块
+    :param md:
+    :param max_weight: 每页的字符数上限（图片按 IMAGE_WEIGHT 折算）
+    :return:
+    """
+    pages, current, weight, fenced = [], [], 0, False
+    for line in md.splitlines():
+        if line.lstrip().startswith("```"):
+            fenced = not fenced
+        if not line.strip() and not fenced and weight >= max_weight:
+            pages.append("\n".join(current))
+            current, weight = [], 0
+            continue
+        current.append(line)
+        weight += len(line) + IMAGE_WEIGHT * line.count("![")
+    if any(s.strip() for s in current):
+        pages.append("\n".join(current))
+    return pages or [md]
+
+
+RENDERERS: list["ArticleRenderer"] = []
+""" 创建过的渲染服务，驱动关闭时由 close_renderers 关闭它们的页面 """
+
+
+async def close_renderers() -> None:
+    for renderer in RENDERERS:
+        await renderer.close()
+
+
+class ArticleRenderer:
+    """
+    专栏渲染服务：
+    - 渲染结果按 cv 号 + 内容哈希缓存为 PNG，同一篇文章再次分享直接复用；
+    - 长文分页后并行渲染，按页码顺序逐页产出，调用方可以先发第一页；
+    - 复用 htmlrender 的浏览器并保留渲染过的页面，并发渲染数不超过 pool_size，其余请求排队等待。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        pool_size: int = 2,
+        width: int = 500,
+        max_articles: int = 64,
+    ):
+        self.cache_dir = cache_dir
+        self.pool_size = max(1, pool_size)
+        self.width = width
+        self.max_articles = max_articles
+        self._semaphore = asyncio.Semaphore(self.pool_size)
+        self._idle: list = []
+        """ 空闲的浏览器页面，数量不超过 pool_size """
+        self._css: str | None = None
+        self._closed = False
+        RENDERERS.append(self)
+
+    def _cache_path(self, cv_id: str, md: str) -> str:
+        digest = hashlib.sha256(md.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"cv{cv_id}-{digest}")
+
+    async def render(self, cv_id: str, md: str) -> AsyncIterator[Path]:
+        """
+        渲染专栏，按页码顺序逐页产出图片路径
+        :param cv_id: 专栏 cv 号
+        :param md: 专栏的 markdown 内容
+        :return:
+        """
+        path = self._cache_path(cv_id, md)
+        cached = self._cached_pages(path)
+        if cached:
+            for page in cached:
+                yield page
+            return
+        chunks = split_markdown(md)
+        tmp = f"{path}.{os.getpid()}-{id(chunks)}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        tasks = [
+            SUPERVISOR.spawn(
+                self._render_chunk(chunk, os.path.join(tmp, f"{i:03d}.png"))
+            )
+            for i, chunk in enumerate(chunks)
+        ]
+        try:
+            for task in tasks:
+                yield Path(await task)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self._commit(tmp, path)
+
+    def _cached_pages(self, path: str) -> list[Path]:
+        if not os.path.isdir(path):
+            return []
+        os.utime(path)
+        return sorted(Path(path).glob("*.png"))
+
+    def _commit(self, tmp: str, path: str) -> None:
+        """渲染完成后整体改名为缓存目录，中途失败不会留下半成品"""
+        if os.path.isdir(path):
+            # 同一篇文章被并发渲染了两次，保留先完成的那份
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+        prune_directories(self.cache_dir, self.max_articles)
+
+    async def _render_chunk(self, md: str, output: str) -> str:
+        html = await self._to_html(md)
+        async with self._semaphore, stage("render"):
+            png = await self._screenshot(html)
+        async with aiofiles.open(output, "wb") as f:
+            await f.write(png)
+        return output
+
+    async def _screenshot(self, html: str) -> bytes:
+        """取一个空闲页面渲染，页面崩溃或浏览器被重启时丢弃它，换新页面重试一次"""
+        for attempt in range(2):
+            page = self._idle.pop() if self._idle else await self._new_page()
+            try:
+                await page.set_viewport_size({"width": self.width, "height": 10})
+                await page.set_content(html, wait_until="networkidle")
+                png = await page.screenshot(full_page=True, type="png", timeout=30_000)
+            except Exception as e:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+                if attempt:
+                    raise
+                logger.warning(f"专栏渲染失败，换新页面重试：{e}")
+                continue
+            if self._closed:
+                await page.close()
+            else:
+                self._idle.append(page)
+            return png
+        raise RuntimeError("unreachable")
+
+    async def close(self) -> None:
+        """关闭保留的空闲页面，之后用完的页面直接关闭，不再放回"""
+        self._closed = True
+        pages, self._idle = self._idle, []
+        for page in pages:
+            try:
+                await page.close()
+            except Exception as e:
+                logger.debug(f"关闭专栏渲染页面失败：{e}")
+
+    async def _to_html(self, md: str) -> str:
+        nonebot.require("nonebot_plugin_htmlrender")
+        import markdown
+        from nonebot_plugin_htmlrender import template_to_html
+
+        if self._css is None:
+            async with aiofiles.open(
+                os.path.join(self.templates, "github-markdown-light.css")
+            ) as f:
+                css = await f.read()
+            async with aiofiles.open(
+                os.path.join(self.templates, "pygments-default.css")
+            ) as f:
+                css += await f.read()
+            self._css = css
+        body = markdown.markdown(md, extensions=MARKDOWN_EXTENSIONS)
+        return await template_to_html(
+            self.templates, "markdown.html", md=body, css=self._css, extra=""
+        )
+
+    @property
+    def templates(self) -> str:
+        import nonebot_plugin_htmlrender
+
+        return os.path.join(
+            os.path.dirname(nonebot_plugin_htmlrender.__file__), "templates"
+        )
+
+    async def _new_page(self):
+        from nonebot_plugin_htmlrender import get_browser
+
+        browser = await get_browser()
+        page = await browser.new_page(
+            device_scale_factor=2, viewport={"width": self.width, "height": 10}
+        )
+        # 先打开模板目录，之后 set_content 的相对路径资源都相对于这里
+        await page.goto(f"file://{self.templates}")
+        return page
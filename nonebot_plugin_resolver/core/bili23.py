@@ -1,32 +1,56 @@
+import os
+import html
+import errno
+import shutil
+import asyncio
+import tempfile
+from contextlib import nullcontext
+
 import httpx
-import subprocess
 import aiofiles
 
 from nonebot import logger
 from .constants import BILIBILI_HEADER
+from .deadline import stage
+from .progress import DownloadProgress, tracked
+from .supervisor import SUPERVISOR
+
+
+def _client(client: httpx.AsyncClient | None, **kwargs):
+    """沿用调用方的共享客户端（不负责关闭），没有时新建一个"""
+    return nullcontext(client) if client is not None else httpx.AsyncClient(**kwargs)
 
 
-async def download_b_file(url, full_file_name, progress_callback):
+async def download_b_file(
+    url,
+    full_file_name,
+    progress: DownloadProgress | None = None,
+    hasher=None,
+    client: httpx.AsyncClient | None = None,
+):
     """
         下载视频文件和音频文件
     :param url:
     :param full_file_name:
-    :param progress_callback:
+    :param progress: 可选，音视频共用一个进度对象时由调用方传入
+    :param hasher: 可选，hashlib 对象，下载时顺带计算内容哈希
+    :param client: 可选，共享的 httpx 客户端，省去每次新建连接池与 TLS 握手
     :return:
     """
-    async with httpx.AsyncClient() as client:
-        async with client.stream("GET", url, headers=BILIBILI_HEADER) as resp:
-            current_len = 0
-            total_len = int(resp.headers.get("content-length", 0))
-            print(total_len)
-            async with aiofiles.open(full_file_name, "wb") as f:
-                async for chunk in resp.aiter_bytes():
-                    current_len += len(chunk)
-                    await f.write(chunk)
-                    progress_callback(f"下载进度：{round(current_len / total_len, 3)}")
+    with tracked(progress, os.path.basename(full_file_name)) as progress:
+        async with stage("download"), _client(client) as client:
+            async with client.stream("GET", url, headers=BILIBILI_HEADER) as resp:
+                progress.add_total(int(resp.headers.get("content-length", 0)))
+                with SUPERVISOR.partial(full_file_name):
+                    async with aiofiles.open(full_file_name, "wb") as f:
+                        async for chunk in resp.aiter_bytes():
+                            if hasher is not None:
+                                hasher.update(chunk)
+                            await f.write(chunk)
+                            progress.update(len(chunk))
 
 
-def merge_file_to_mp4(
+async def merge_file_to_mp4(
     v_full_file_name: str, a_full_file_name: str, output_file_name: str
 ):
     """
@@ -38,12 +62,165 @@ def merge_file_to_mp4(
     """
     logger.info(f"正在合并：{[output_file_name]}")
     # 调用ffmpeg
-    subprocess.call(
-        f'ffmpeg -y -i "{v_full_file_name}" -i "{a_full_file_name}" -c copy "{output_file_name}"',
-        shell=True,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
+    with SUPERVISOR.partial(output_file_name):
+        async with stage("merge"):
+            returncode, _, stderr = await SUPERVISOR.run(
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-i", v_full_file_name, "-i", a_full_file_name,
+                "-c", "copy", output_file_name,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )  # fmt: skip
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed: {stderr.decode(errors='ignore')[-500:]}"
+            )
+
+
+FRAGMENTED_MP4 = "+frag_keyframe+empty_moov+default_base_moof"
+""" 边读边写的分片 MP4：不需要在结尾回写 moov，输出只写一遍 """
+
+STREAM_TIMEOUT = httpx.Timeout(60, connect=5.0)
+""" ffmpeg 可能在分析视频流时一直读下去，音频慢慢等，读超时放宽 """
+
+
+def stream_merge_supported() -> bool:
+    """边下载边合并需要命名管道（非 Windows）和 ffmpeg"""
+    return hasattr(os, "mkfifo") and shutil.which("ffmpeg") is not None
+
+
+async def _open_fifo_writer(
+    path: str, process: asyncio.subprocess.Process
+) -> asyncio.StreamWriter:
+    """
+    等 ffmpeg 打开命名管道的读端后，返回写端的 StreamWriter（非阻塞，drain 时受 ffmpeg 读取速度反压）
+    :param path:
+    :param process: ffmpeg 进程，它提前退出时不再等待
+    :return:
+    """
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            # 还没有读端：ffmpeg 按输入顺序打开文件，分析完前一个输入才会打开这一个
+            if e.errno != errno.ENXIO:
+                raise
+        if process.returncode is not None:
+            raise RuntimeError(f"ffmpeg 在读取 {os.path.basename(path)} 前退出")
+        await asyncio.sleep(0.02)
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, os.fdopen(fd, "wb", buffering=0)
+    )
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+
+async def _pump_to_fifo(
+    client: httpx.AsyncClient,
+    url: str,
+    path: str,
+    process: asyncio.subprocess.Process,
+    progress: DownloadProgress,
+    hasher=None,
+) -> None:
+    """把一路 m4s 边下载边写进命名管道，写完关闭管道让 ffmpeg 读到 EOF"""
+    writer = await _open_fifo_writer(path, process)
+    try:
+        async with client.stream(
+            "GET", url, headers=BILIBILI_HEADER, timeout=STREAM_TIMEOUT
+        ) as resp:
+            resp.raise_for_status()
+            progress.add_total(int(resp.headers.get("content-length", 0)))
+            async for chunk in resp.aiter_bytes():
+                if hasher is not None:
+                    hasher.update(chunk)
+                writer.write(chunk)
+                await writer.drain()
+                progress.update(len(chunk))
+    finally:
+        writer.close()
+
+
+async def stream_merge_to_mp4(
+    video_url: str,
+    audio_url: str,
+    output_file_name: str,
+    video_hasher=None,
+    audio_hasher=None,
+    progress: DownloadProgress | None = None,
+    client: httpx.AsyncClient | None = None,
+) -> None:
+    """
+    边下载边合并：音视频分别写进两个命名管道，ffmpeg 同时读取并一次写出分片 MP4，
+    耗时约为 max(下载, 合并)，中间的 .m4s 不落盘
+    :param video_url:
+    :param audio_url:
+    :param output_file_name:
+    :param video_hasher: 可选，hashlib 对象，下载时顺带计算内容哈希
+    :param audio_hasher:
+    :param progress: 可选，音视频两路共用的进度对象
+    :param client: 可选，共享的 httpx 客户端
+    :return:
+    """
+    workdir = tempfile.mkdtemp(
+        prefix="bili-mux-", dir=os.path.dirname(output_file_name) or None
     )
+    video_fifo = os.path.join(workdir, "video.m4s")
+    audio_fifo = os.path.join(workdir, "audio.m4s")
+    os.mkfifo(video_fifo)
+    os.mkfifo(audio_fifo)
+    tasks: list[asyncio.Task] = []
+    try:
+        with SUPERVISOR.partial(output_file_name):
+            async with SUPERVISOR.process(
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-i", video_fifo, "-i", audio_fifo,
+                "-c", "copy", "-movflags", FRAGMENTED_MP4, "-f", "mp4",
+                output_file_name,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            ) as process:  # fmt: skip
+                try:
+                    async with stage("download"):
+                        with tracked(progress, os.path.basename(output_file_name)) as p:
+                            async with _client(client, follow_redirects=True) as c:
+                                tasks = [
+                                    SUPERVISOR.spawn(
+                                        _pump_to_fifo(c, url, fifo, process, p, hasher)
+                                    )
+                                    for url, fifo, hasher in (
+                                        (video_url, video_fifo, video_hasher),
+                                        (audio_url, audio_fifo, audio_hasher),
+                                    )
+                                ]
+                                await asyncio.gather(*tasks)
+                        _, stderr = await process.communicate()
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    raise
+            if process.returncode != 0:
+                raise RuntimeError(
+                    f"ffmpeg failed: {stderr.decode(errors='ignore')[-500:]}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bili_thumbnail(url: str, width: int, height: int) -> str:
+    """
+    借助 B 站图床的缩放参数取缩略图，封面原图动辄上百 KB
+    :param url: hdslb.com 上的图片链接
+    :param width:
+    :param height:
+    :return:
+    """
+    if "hdslb.com" not in url or "@" in url:
+        return url
+    return f"{url}@{width}w_{height}h_1c.jpg"
 
 
 def extra_bili_info(video_info):
@@ -88,3 +265,80 @@ def extra_bili_info(video_info):
         video_info_result += f"{key}: {formatted_value} | "
 
     return video_info_result
+
+
+def extra_opus_content(opus_info: dict) -> dict:
+    """
+    从图文详情（Opus.get_info）中取出作者、完整正文和全部图片
+    :param opus_info:
+    :return: {"author", "text", "images", "cv_id"}，cv_id 非空表示这是专栏的发布动态
+    """
+    item = opus_info["item"]
+    author, texts, images = "", [], []
+    for module in item["modules"]:
+        if module.get("module_author"):
+            author = module["module_author"].get("name", "")
+        if module.get("module_title"):
+            texts.append(module["module_title"]["text"])
+        if module.get("module_top"):
+            album = module["module_top"].get("display", {}).get("album", {})
+            images += [pic["url"] for pic in album.get("pics", [])]
+        for para in (module.get("module_content") or {}).get("paragraphs", []):
+            if para["para_type"] == 1:
+                texts.append(
+                    "".join(
+                        (
+                            node["word"]["words"]
+                            if node.get("word")
+                            else node["rich"]["text"]
+                        )
+                        for node in para["text"]["nodes"]
+                        if node.get("word") or node.get("rich")
+                    )
+                )
+            elif para["para_type"] == 2:
+                images += [pic["url"] for pic in para["pic"]["pics"]]
+            elif para["para_type"] == 7:
+                texts.append(html.unescape(para["code"]["content"]))
+    basic = item.get("basic", {})
+    return {
+        "author": author,
+        "text": "\n".join(t for t in texts if t),
+        "images": list(dict.fromkeys(images)),
+        "cv_id": basic.get("rid_str", "") if basic.get("comment_type") == 12 else "",
+    }
+
+
+def extra_dynamic_content(dynamic_info: dict) -> dict:
+    """
+    从动态详情（Dynamic.get_info）中取出正文、图片以及附带的视频，转发动态会带上原动态的内容
+    :param dynamic_info:
+    :return: {"author", "text", "images", "bvid", "cv_id"}
+    """
+    item = dynamic_info["item"]
+    modules = item["modules"]
+    dynamic = modules.get("module_dynamic") or {}
+    major = dynamic.get("major") or {}
+    texts = [(dynamic.get("desc") or {}).get("text", "")]
+    images = []
+    if major.get("opus"):
+        texts.append(major["opus"].get("title") or "")
+        texts.append((major["opus"].get("summary") or {}).get("text", ""))
+        images += [pic["url"] for pic in major["opus"].get("pics") or []]
+    if major.get("draw"):
+        images += [pic["src"] for pic in major["draw"].get("items") or []]
+    content = {
+        "author": (modules.get("module_author") or {}).get("name", ""),
+        "text": "",
+        "images": images,
+        "bvid": (major.get("archive") or {}).get("bvid", ""),
+        "cv_id": str((major.get("article") or {}).get("id", "")),
+    }
+    if item.get("orig"):
+        orig = extra_dynamic_content({"item": item["orig"]})
+        texts.append(f"// 转发自 @{orig['author']}：{orig['text']}")
+        content["images"] += orig["images"]
+        content["bvid"] = content["bvid"] or orig["bvid"]
+        content["cv_id"] = content["cv_id"] or orig["cv_id"]
+    content["text"] = "\n".join(t for t in texts if t)
+    return content
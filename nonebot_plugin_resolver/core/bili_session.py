@@ -0,0 +1,138 @@
+import time
+import asyncio
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Callable
+
+import httpx
+from bilibili_api import Credential
+from nonebot import logger
+
+from .governor import CookiePool
+
+REFRESH_INTERVAL = 6 * 3600
+""" 后台刷新 WBI 密钥、bili_ticket 与检查凭据的间隔（秒），WBI 密钥每天轮换 """
+
+RETRY_INTERVAL = 60
+""" 预热 / 刷新失败后多久重试（秒） """
+
+
+class _NoStorePolicy(DefaultCookiePolicy):
+    """
+    共享客户端不保存响应里的 cookie：bilibili_api 每次请求都显式带上凭据，
+    存下来反而会让池里不同 SESSDATA 的请求互相串 cookie
+    """
+
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+
+class BiliSession:
+    """
+    B 站会话管理：插件启动时创建一个连接池化的 httpx 客户端交给 bilibili_api 与视频下载共用，
+    预先取好 buvid、WBI 密钥（以及启用时的 bili_ticket），之后定期在后台刷新，
+    并检查池里的 SESSDATA 是否仍然有效，失效的提前隔离。
+    冷请求因此不用再串行补这几次握手与请求。
+    """
+
+    def __init__(
+        self,
+        pool: CookiePool | None,
+        credential: Callable[[str], Credential],
+        interval: float = REFRESH_INTERVAL,
+    ):
+        """
+        :param pool: B 站的 SESSDATA 池，没有配置时为 None
+        :param credential: SESSDATA -> Credential
+        :param interval: 后台刷新间隔（秒）
+        """
+        self.pool = pool
+        self.credential = credential
+        self.interval = interval
+        self.client: httpx.AsyncClient | None = None
+        """ 启动后的共享客户端，未启动（或 bilibili_api 版本不支持）时为 None """
+        self.stats = {"refreshed": 0, "failed": 0, "last_refresh": 0.0}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """在事件循环中启动：接管 bilibili_api 的会话并预热"""
+        if self.running:
+            return
+        try:
+            from bilibili_api import get_client, select_client, set_session
+        except ImportError:
+            # bilibili_api 17 之前没有可替换的请求客户端
+            logger.warning("当前 bilibili_api 版本不支持共享会话，跳过 B 站预热")
+            return
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60),
+            cookies=CookieJar(policy=_NoStorePolicy()),
+            follow_redirects=True,
+        )
+        select_client("httpx")
+        # set_session 只能替换当前事件循环里已有的会话，先让 bilibili_api 建一个默认的
+        get_client()
+        set_session(self.client)
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        取得 buvid、WBI 密钥与 bili_ticket，并检查凭据
+        :param force: 丢掉已有的 WBI 密钥与 bili_ticket 重新获取（buvid 激活后长期有效，不重取）
+        :return:
+        """
+        from bilibili_api import (
+            get_buvid,
+            get_bili_ticket,
+            recalculate_wbi,
+            refresh_bili_ticket,
+            request_settings,
+        )
+        from bilibili_api.utils.network import get_wbi_mixin_key
+
+        if force:
+            recalculate_wbi()
+            refresh_bili_ticket()
+        await get_buvid()
+        await get_wbi_mixin_key()
+        if request_settings.get_enable_bili_ticket():
+            await get_bili_ticket()
+        await self.check_credentials()
+        self.stats["refreshed"] += 1
+        self.stats["last_refresh"] = time.time()
+
+    async def check_credentials(self) -> None:
+        """逐个检查没有被隔离的 SESSDATA，已失效的隔离，避免之后的解析撞上"""
+        if self.pool is None:
+            return
+        now = time.monotonic()
+        for entry in self.pool.entries:
+            if entry.quarantined_until > now:
+                continue
+            if not await self.credential(entry.value).check_valid():
+                self.pool.quarantine(entry.value, "后台检查时已未登录")
+
+    async def _loop(self) -> None:
+        force = False
+        while True:
+            try:
+                await self.refresh(force)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"B 站会话刷新失败，{RETRY_INTERVAL} 秒后重试：{e}")
+                await asyncio.sleep(RETRY_INTERVAL)
+                continue
+            force = True
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,167 @@
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from nonebot import logger
+
+from .deadline import DeadlineExceeded
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求没有发出去"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} 暂时不可用，{math.ceil(retry_after)} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    单个第三方接口的熔断器：
+    - closed：记录最近 window 秒内的调用，样本数不少于 min_calls 且失败率（超过 slow_call 秒的慢调用也算失败）
+      达到 error_rate 时打开；
+    - open：直接抛出 CircuitOpenError，不再等超时，cooldown 秒后进入 half_open；
+    - half_open：同一时间只放行一个探测请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 60,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call: float = 10,
+        cooldown: float = 30,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._calls: deque[tuple[float, bool, float]] = deque()
+        """ (结束时间, 是否成功, 耗时) """
+        self.totals = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+        return self._state
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+
+    def _transition(self, state: str) -> None:
+        if state != self._state:
+            logger.warning(f"熔断器 {self.name}：{self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.totals["opened"] += 1
+        elif state == CLOSED:
+            self._calls.clear()
+
+    def before_call(self) -> bool:
+        """
+        请求前调用，熔断时抛出 CircuitOpenError
+        :return: 这次请求是否是 half_open 状态下的探测请求
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.totals["rejected"] += 1
+        retry_after = max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record(self, success: bool, latency: float, probe: bool = False) -> None:
+        """
+        请求结束后记录结果
+        :param success: 是否成功
+        :param latency: 耗时（秒），超过 slow_call 的按失败计
+        :param probe: before_call 的返回值
+        :return:
+        """
+        ok = success and latency <= self.slow_call
+        now = time.monotonic()
+        self.totals["calls"] += 1
+        self.totals["failures"] += not ok
+        if probe:
+            self._probing = False
+            self._transition(CLOSED if ok else OPEN)
+            return
+        self._calls.append((now, ok, latency))
+        self._trim(now)
+        failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+        if (
+            self._state == CLOSED
+            and len(self._calls) >= self.min_calls
+            and failures / len(self._calls) >= self.error_rate
+        ):
+            self._transition(OPEN)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        包住一次请求：熔断时直接抛出 CircuitOpenError；块内抛出的异常计为失败并继续向外抛，
+        被取消或这次解析的时间预算用完不计入
+        """
+        probe = self.before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and not isinstance(e, DeadlineExceeded):
+                self.record(False, time.monotonic() - start, probe)
+            elif probe:
+                # 被取消或预算用完不说明接口有问题，只归还探测名额
+                self._probing = False
+            raise
+        self.record(True, time.monotonic() - start, probe)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        self._trim(now)
+        latencies = sorted(latency for _, _, latency in self._calls)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        return {
+            "state": self.state,
+            "window_calls": len(latencies),
+            "error_rate": round(failures / len(latencies), 3) if latencies else 0.0,
+            "p50_ms": (
+                round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0
+            ),
+            **self.totals,
+        }
+
+
+BREAKERS: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """
+    按名字取熔断器，第一次取时创建
+    :param name: 接口名，如 "twitter"、"netease_api"
+    :param kwargs: 创建时传给 CircuitBreaker 的参数
+    :return:
+    """
+    if name not in BREAKERS:
+        BREAKERS[name] = CircuitBreaker(name, **kwargs)
+    return BREAKERS[name]
+
+
+def breaker_states() -> dict[str, dict]:
+    """各熔断器的当前状态，供监控使用"""
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
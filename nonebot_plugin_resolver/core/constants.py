@@ -20,6 +20,25 @@ BILIBILI_HEADER = {
 WEIBO_SINGLE_INFO = "https://m.weibo.cn/statuses/show?id={}"
 """ 微博单条信息 """
 
+WEIBO_EXTEND_INFO = "https://m.weibo.cn/statuses/extend?id={}"
+""" 微博长文的全文 """
+
+WEIBO_AJAX_INFO = "https://weibo.com/ajax/statuses/show?id={}"
+""" 网页版的微博单条信息，超过 9 张图的微博从这里取全部图片 """
+
+WEIBO_VISITOR_COOKIE = (
+    "_T_WM=40835919903; WEIBOCN_FROM=1110006030; MLOGIN=0; XSRF-TOKEN=4399c8"
+)
+""" 未配置微博 cookie 时使用的游客 cookie """
+
+RATE_LIMITS = {
+    "bilibili": (2, 10),
+    "douyin": (1, 5),
+    "xiaohongshu": (0.5, 3),
+    "weibo": (1, 5),
+}
+""" 各平台默认的限速：(每秒解析次数, 突发上限)，未列出的平台不限速 """
+
 XHS_REQ_LINK = "https://www.xiaohongshu.com/explore/"
 """ 小红书下载链接 """
 
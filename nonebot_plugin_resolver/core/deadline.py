@@ -0,0 +1,139 @@
+import time
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+STAGE_SHARES = {
+    "resolve": 0.5,
+    "download": 0.8,
+    "merge": 0.9,
+    "transcode": 0.8,
+    "gallery": 0.6,
+    "render": 0.8,
+}
+""" 各阶段最多能用掉剩余时间的多少，剩下的留给后面的阶段与发送 """
+
+STAGE_LABELS = {
+    "total": "解析",
+    "resolve": "获取信息",
+    "download": "下载",
+    "merge": "合并",
+    "transcode": "转码",
+    "gallery": "下载图片",
+    "render": "渲染",
+}
+
+STAGE_STATS: dict[str, dict[str, int]] = {}
+""" 阶段名 -> {"calls": 进入次数, "timeouts": 超时次数} """
+
+
+class DeadlineExceeded(Exception):
+    """
+    这次解析的时间预算在某个阶段用完了。
+    不继承 TimeoutError：下载失败时的重试 / 回退逻辑会捕获 OSError，预算用完后不应该再重试
+    """
+
+    def __init__(self, stage: str, link: str | None = None):
+        super().__init__(f"{STAGE_LABELS.get(stage, stage)}超时")
+        self.stage = stage
+        self.link = link
+        """ 可选，跳过的媒体的直链，降级时发给用户 """
+
+
+class Deadline:
+    """一次解析的截止时间"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+
+DEADLINE: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "resolver_deadline", default=None
+)
+""" 当前解析的截止时间，由处理函数设置，下载等后台任务继承 """
+
+
+def record(name: str, timed_out: bool = False) -> None:
+    """
+    记一次阶段的执行，timed_out 为 True 时改为记这次执行超时；
+    不用 stage 包裹、超时后只取部分结果的阶段（如一组图片）自己调用
+    :param name:
+    :param timed_out:
+    :return:
+    """
+    stats = STAGE_STATS.setdefault(name, {"calls": 0, "timeouts": 0})
+    stats["timeouts" if timed_out else "calls"] += 1
+
+
+def budget(name: str) -> float | None:
+    """
+    某个阶段现在能用的秒数，没有截止时间时为 None；用于把预算传给子进程或第三方库自己的超时参数
+    :param name: 阶段名，见 STAGE_SHARES
+    :return:
+    """
+    deadline = DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline.remaining() * STAGE_SHARES.get(name, 1.0)
+
+
+@asynccontextmanager
+async def stage(name: str, link: str | None = None) -> AsyncIterator[None]:
+    """
+    在剩余预算的一部分内执行一个阶段，超时时取消块内的操作并抛出 DeadlineExceeded；
+    没有截止时间（不在解析中，或者没有开启）时不限时
+    :param name: 阶段名，见 STAGE_SHARES
+    :param link: 可选，超时时随异常带出的直链
+    :return:
+    """
+    record(name)
+    seconds = budget(name)
+    if seconds is None:
+        yield
+        return
+    if seconds <= 0:
+        record(name, timed_out=True)
+        raise DeadlineExceeded(name, link)
+    try:
+        async with asyncio.timeout(seconds) as timeout:
+            yield
+    except TimeoutError:
+        if not timeout.expired():
+            raise
+        record(name, timed_out=True)
+        raise DeadlineExceeded(name, link) from None
+
+
+@asynccontextmanager
+async def deadline_scope(seconds: float) -> AsyncIterator[Deadline | None]:
+    """
+    为一次解析设置截止时间，整个块超过 seconds 秒时抛出 DeadlineExceeded("total")
+    :param seconds: 为 0 时不限时
+    :return:
+    """
+    if seconds <= 0:
+        yield None
+        return
+    deadline = Deadline(seconds)
+    token = DEADLINE.set(deadline)
+    record("total")
+    try:
+        async with asyncio.timeout(seconds) as timeout:
+            yield deadline
+    except TimeoutError:
+        if not timeout.expired():
+            raise
+        record("total", timed_out=True)
+        raise DeadlineExceeded("total") from None
+    finally:
+        DEADLINE.reset(token)
+
+
+def stage_states() -> dict[str, dict[str, int]]:
+    """各阶段的进入与超时次数，供监控使用"""
+    return {name: dict(stats) for name, stats in STAGE_STATS.items()}
@@ -0,0 +1,23 @@
+import json
+
+
+def extract_aweme(payload: bytes) -> dict | None:
+    """
+    从作品详情接口的响应中只取出解析需要的字段。
+    完整响应有数百 KB，在进程池里解码后只把这几个字段传回事件循环。
+    :param payload: 接口响应体
+    :return: {desc, aweme_type, play_uri, images}，响应为空（通常是 ck 失效）时返回 None
+    """
+    if not payload:
+        return None
+    data = json.loads(payload)
+    detail = (data or {}).get("aweme_detail")
+    if not detail:
+        return None
+    video = detail.get("video") or {}
+    return {
+        "desc": detail.get("desc"),
+        "aweme_type": detail.get("aweme_type"),
+        "play_uri": (video.get("play_addr") or {}).get("uri"),
+        "images": [i["url_list"][0] for i in detail.get("images") or []],
+    }
@@ -0,0 +1,92 @@
+import os
+import shutil
+import asyncio
+import hashlib
+from urllib.parse import urlparse
+
+import aiohttp
+from nonebot import logger
+
+from .deadline import budget, record
+from .image import download_img
+from .supervisor import SUPERVISOR
+
+GALLERY_CONCURRENCY = 6
+""" 一组图片同时下载的数量上限 """
+
+
+def gallery_path(directory: str, url: str) -> str:
+    """图片按链接的哈希命名，同一个链接只下载一次"""
+    digest = hashlib.sha1(url.encode()).hexdigest()[:20]
+    return os.path.join(
+        directory, digest + (os.path.splitext(urlparse(url).path)[1] or ".jpg")
+    )
+
+
+async def download_gallery(
+    urls: list[str],
+    directory: str,
+    concurrency: int = GALLERY_CONCURRENCY,
+    headers: dict | None = None,
+    proxy: str | None = None,
+) -> list[str | None]:
+    """
+    并发下载一组图片，同时进行的下载不超过 concurrency 个
+    :param urls: 图片链接
+    :param directory: 保存目录，已经下载过的图片不会重复下载
+    :param concurrency:
+    :param headers:
+    :param proxy:
+    :return: 与 urls 一一对应的本地路径，下载失败或超出解析时间预算的为 None
+    """
+    os.makedirs(directory, exist_ok=True)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(session, url: str) -> str | None:
+        path = gallery_path(directory, url)
+        if not os.path.exists(path):
+            async with semaphore:
+                try:
+                    await download_img(url, path, proxy, session, headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"图片下载失败：{url}，{e}")
+        return path if os.path.exists(path) else None
+
+    async with aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=60)
+    ) as session:
+        tasks = [SUPERVISOR.spawn(fetch(session, url)) for url in urls]
+        if not tasks:
+            return []
+        record("gallery")
+        try:
+            # 预算用完时不再等剩下的图片，先发已经下载好的
+            _, pending = await asyncio.wait(tasks, timeout=budget("gallery"))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        if pending:
+            record("gallery", timed_out=True)
+            logger.warning(f"图片下载超时，跳过 {len(pending)}/{len(tasks)} 张")
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+        return [None if task.cancelled() else task.result() for task in tasks]
+
+
+def prune_directories(root: str, keep: int) -> None:
+    """
+    只保留 root 下最近修改的 keep 个子目录（跳过还在写入的 .tmp 目录）
+    :param root:
+    :param keep:
+    :return:
+    """
+    if not os.path.isdir(root):
+        return
+    entries = sorted(
+        (e for e in os.scandir(root) if e.is_dir() and not e.name.endswith(".tmp")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in entries[: max(0, len(entries) - keep)]:
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,191 @@
+import math
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Any
+
+from nonebot import logger
+
+ROUND_ROBIN, LRU = "round_robin", "lru"
+
+
+class PoolExhaustedError(Exception):
+    """池中所有 cookie 都处于隔离期"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"{name} 的 cookie 均已失效，请联系管理员更新（{math.ceil(retry_after)} 秒后重试）"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """令牌桶：平均每秒放行 rate 次，最多攒下 burst 个令牌应对突发，令牌不够时排队等待"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # 持锁等待，保证先到先得
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+            self.stats["acquired"] += 1
+
+
+@dataclass
+class PooledCookie:
+    value: Any
+    """ cookie 字符串或 bilibili_api 的 Credential """
+    label: str
+    """ 日志与状态里显示的脱敏标识 """
+    uses: int = 0
+    failures: int = 0
+    last_used: float = 0.0
+    quarantined_until: float = 0.0
+    reason: str = ""
+
+
+def mask(value: Any) -> str:
+    text = str(getattr(value, "sessdata", None) or value)
+    return f"{text[:4]}…{text[-4:]}" if len(text) > 12 else "****"
+
+
+class CookiePool:
+    """
+    同一平台的一组 cookie / 凭据，按轮询或最久未使用选取；
+    出现失效特征的 cookie 被隔离 quarantine 秒，期间不再选用。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        values: list,
+        strategy: str = ROUND_ROBIN,
+        quarantine: float = 1800,
+    ):
+        self.name = name
+        self.strategy = strategy
+        self.quarantine_seconds = quarantine
+        self.entries = [PooledCookie(value, mask(value)) for value in values]
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def pick(self) -> Any:
+        """
+        选取一个可用的 cookie
+        :return: 池为空（未配置）时返回 None
+        """
+        if not self.entries:
+            return None
+        now = time.monotonic()
+        healthy = [e for e in self.entries if e.quarantined_until <= now]
+        if not healthy:
+            retry_after = min(e.quarantined_until for e in self.entries) - now
+            raise PoolExhaustedError(self.name, retry_after)
+        if self.strategy == LRU:
+            entry = min(healthy, key=lambda e: e.last_used)
+        else:
+            # 轮询：从游标位置往后找第一个没被隔离的
+            for offset in range(len(self.entries)):
+                entry = self.entries[(self._cursor + offset) % len(self.entries)]
+                if entry in healthy:
+                    self._cursor = (self._cursor + offset + 1) % len(self.entries)
+                    break
+        entry.uses += 1
+        entry.last_used = now
+        return entry.value
+
+    def quarantine(self, value: Any, reason: str = "") -> None:
+        """
+        标记 cookie 失效并隔离
+        :param value: pick 返回的值
+        :param reason: 失效特征，写入日志与状态
+        :return:
+        """
+        for entry in self.entries:
+            if entry.value == value:
+                entry.failures += 1
+                entry.quarantined_until = time.monotonic() + self.quarantine_seconds
+                entry.reason = reason
+                logger.warning(
+                    f"{self.name} 的 cookie {entry.label} 已隔离 "
+                    f"{self.quarantine_seconds:.0f} 秒：{reason}"
+                )
+                return
+
+    def health(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "label": e.label,
+                "healthy": e.quarantined_until <= now,
+                "retry_after": max(0, round(e.quarantined_until - now)),
+                "uses": e.uses,
+                "failures": e.failures,
+                "reason": e.reason,
+            }
+            for e in self.entries
+        ]
+
+
+class RequestGovernor:
+    """
+    按平台限速并分配 cookie：每次解析先从该平台的令牌桶取一个令牌，再从 cookie 池选一个 cookie
+    """
+
+    def __init__(self, buckets: dict[str, TokenBucket], pools: dict[str, CookiePool]):
+        self.buckets = buckets
+        self.pools = pools
+
+    async def cookie(self, platform: str) -> Any:
+        """
+        等待限速后取一个 cookie
+        :param platform: 平台名
+        :return: 该平台没有配置 cookie 时返回 None
+        """
+        if bucket := self.buckets.get(platform):
+            await bucket.acquire()
+        pool = self.pools.get(platform)
+        return pool.pick() if pool else None
+
+    def quarantine(self, platform: str, value: Any, reason: str = "") -> None:
+        if pool := self.pools.get(platform):
+            pool.quarantine(value, reason)
+
+    def attempts(self, platform: str) -> int:
+        """遇到失效的 cookie 时最多尝试几次（每个 cookie 一次）"""
+        return max(1, len(self.pools.get(platform) or ()))
+
+    def health(self) -> dict[str, dict]:
+        """各平台的限速与 cookie 池状态，供监控使用"""
+        return {
+            name: {
+                **(
+                    {"rate": bucket.rate, "burst": bucket.burst, **bucket.stats}
+                    if (bucket := self.buckets.get(name))
+                    else {}
+                ),
+                "cookies": pool.health() if (pool := self.pools.get(name)) else [],
+            }
+            for name in {*self.buckets, *self.pools}
+        }
@@ -0,0 +1,98 @@
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+from urllib.parse import urlparse
+
+from .breaker import get_breaker
+from .deadline import stage
+from .supervisor import SUPERVISOR
+
+T = TypeVar("T")
+
+HEDGE_MIN_DELAY = 0.2
+""" 对冲等待时间的下限（秒），避免后端很快时几乎每次都发两份请求 """
+
+HEDGE_DEFAULT_DELAY = 1.0
+""" 样本不足时的对冲等待时间（秒） """
+
+
+class LatencyTracker:
+    """最近若干次成功请求的耗时，用来估计对冲的等待时间"""
+
+    def __init__(self, size: int = 100, min_samples: int = 10):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def add(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def p95(self, default: float) -> float:
+        if len(self._samples) < self.min_samples:
+            return default
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+TRACKERS: dict[str, LatencyTracker] = {}
+
+
+async def hedged_request(
+    name: str,
+    endpoints: list[str],
+    request: Callable[[str], Awaitable[T]],
+    min_attempts: int = 2,
+) -> T:
+    """
+    向一组可互换的后端发同一个请求：先请求第一个，超过这组请求最近的 p95 耗时还没返回就再请求下一个，
+    某个请求失败时立即换下一个；取最先成功的结果并取消其余请求。
+    每个后端各有一个熔断器，已熔断的后端会被直接跳过。
+    :param name: 请求组名，如 "netease_temp"，也用作熔断器名的前缀
+    :param endpoints: 后端地址（或链接模板），按优先级排列
+    :param request: 接收一个后端地址并返回结果的协程函数，结果不可用时应抛出异常
+    :param min_attempts: 后端不够时轮流复用，保证至少能发出这么多份请求（只有一个后端时也能对冲一次）
+    :return:
+    """
+    tracker = TRACKERS.setdefault(name, LatencyTracker())
+    delay = max(HEDGE_MIN_DELAY, tracker.p95(HEDGE_DEFAULT_DELAY))
+    remaining = [
+        endpoints[i % len(endpoints)] for i in range(max(len(endpoints), min_attempts))
+    ]
+    pending: set[asyncio.Task] = set()
+    last_error: BaseException = LookupError(f"{name} 没有可用的后端")
+
+    async def attempt(endpoint: str) -> T:
+        breaker = get_breaker(f"{name}@{urlparse(endpoint).netloc or endpoint}")
+        start = time.monotonic()
+        async with breaker.guard():
+            result = await request(endpoint)
+        tracker.add(time.monotonic() - start)
+        return result
+
+    def launch() -> None:
+        if remaining:
+            pending.add(SUPERVISOR.spawn(attempt(remaining.pop(0))))
+
+    launch()
+    try:
+        async with stage("resolve"):
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # 对冲：已经发出的请求都比平时慢，再向下一个后端发一份
+                    launch()
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                    launch()
+            raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,16 +1,6 @@
 import os
 import aiohttp
 
-import nonebot
-
-nonebot.require("nonebot_plugin_htmlrender")
-
-from nonebot_plugin_htmlrender import (  # noqa: E402
-    md_to_pic,
-)
-
-markdown_to_image = md_to_pic
-
 
 async def download_img(
     url: str, path: str = "", proxy: str = None, session=None, headers=None
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+from contextlib import closing
+from typing import Awaitable, Callable
+
+from nonebot import logger
+
+CLAIMED, RUNNING, DONE = "claimed", "running", "done"
+
+
+class JobQueue:
+    """
+    按内容 id 去重的任务队列：同一个 key 只由一个执行者运行 work，其余调用方等待并拿到同一份结果。
+    子类实现跨进程的抢占、续租与发布，本类负责进程内的合并与轮询。
+    结果必须可以 JSON 序列化。
+    """
+
+    def __init__(self, lease: float = 120, result_ttl: float = 3600):
+        self.lease = lease
+        """ 执行者的租约（秒），执行期间定期续租，进程挂掉后其他实例会在租约到期后接手 """
+        self.result_ttl = result_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"executed": 0, "shared": 0}
+        """ executed：本实例执行的任务数；shared：直接拿到其他执行者结果的次数 """
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def try_claim(self, key: str) -> tuple[str, dict | None]:
+        """返回 (CLAIMED, None) / (RUNNING, None) / (DONE, 结果)"""
+        return CLAIMED, None
+
+    async def renew(self, key: str) -> None:
+        pass
+
+    async def publish(self, key: str, result: dict) -> None:
+        pass
+
+    async def release(self, key: str) -> None:
+        """执行失败时放弃租约，让等待者自己重试"""
+
+    async def run(
+        self,
+        key: str,
+        work: Callable[[], Awaitable[dict]],
+        poll: float = 0.5,
+        max_poll: float = 3.0,
+    ) -> dict:
+        """
+        执行或等待 key 对应的任务
+        :param key: 内容 id，如 "bilibili:BV...:p0"
+        :param work: 实际执行的协程函数，返回可 JSON 序列化的结果
+        :param poll: 等待其他执行者时的初始轮询间隔（秒）
+        :param max_poll:
+        :return:
+        """
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 执行者被取消（它自己的时间预算用完或正在关闭）而不是自己被取消时，重新抢这个任务
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self.stats["shared"] += 1
+            return result
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._run(key, work, poll, max_poll)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run(self, key, work, poll: float, max_poll: float) -> dict:
+        delay = poll
+        while True:
+            state, result = await self.try_claim(key)
+            if state == DONE:
+                self.stats["shared"] += 1
+                return result
+            if state == CLAIMED:
+                break
+            await asyncio.sleep(delay)
+            delay = min(max_poll, delay * 1.5)
+
+        heartbeat = asyncio.create_task(self._heartbeat(key))
+        try:
+            result = await work()
+        except BaseException:
+            heartbeat.cancel()
+            await asyncio.shield(self.release(key))
+            raise
+        heartbeat.cancel()
+        self.stats["executed"] += 1
+        await self.publish(key, result)
+        return result
+
+    async def _heartbeat(self, key: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.renew(key)
+            except Exception as e:
+                logger.warning(f"任务续租失败：{key}，{e}")
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    同一台机器上的多个实例通过同一个 SQLite 文件共享任务，依赖 SQLite 的文件锁，不需要额外服务
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "key TEXT PRIMARY KEY, owner TEXT, lease_until REAL, "
+                "result TEXT, done_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _try_claim(self, key: str) -> tuple[str, dict | None]:
+        now = time.time()
+        with closing(self._connect()) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT lease_until, result, done_at FROM jobs WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    lease_until, result, done_at = row
+                    if result is not None and now - done_at < self.result_ttl:
+                        return DONE, json.loads(result)
+                    if result is None and lease_until > now:
+                        return RUNNING, None
+                db.execute(
+                    "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, NULL, 0)",
+                    (key, self.owner, now + self.lease),
+                )
+                # 顺带清理过期的结果
+                db.execute(
+                    "DELETE FROM jobs WHERE result IS NOT NULL AND done_at < ?",
+                    (now - self.result_ttl,),
+                )
+                return CLAIMED, None
+            finally:
+                db.execute("COMMIT")
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        with closing(self._connect()) as db:
+            db.execute(sql, params)
+
+    async def try_claim(self, key: str) -> tuple[str, dict | None]:
+        return await asyncio.to_thread(self._try_claim, key)
+
+    async def renew(self, key: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET lease_until = ? "
+            "WHERE key = ? AND owner = ? AND result IS NULL",
+            (time.time() + self.lease, key, self.owner),
+        )
+
+    async def publish(self, key: str, result: dict) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET result = ?, done_at = ? WHERE key = ? AND owner = ?",
+            (json.dumps(result), time.time(), key, self.owner),
+        )
+
+    async def release(self, key: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "DELETE FROM jobs WHERE key = ? AND owner = ? AND result IS NULL",
+            (key, self.owner),
+        )
+
+
+class RedisJobQueue(JobQueue):
+    """
+    通过 Redis（或兼容协议的服务）共享任务，适合多台机器上的实例，需要另外安装 redis
+    """
+
+    def __init__(self, url: str, prefix: str = "resolver:job:", **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis.asyncio as aioredis
+        except ImportError as e:
+            raise ImportError(
+                "使用 redis 任务队列需要先安装 redis：pip install redis"
+            ) from e
+        self._redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key: str, kind: str) -> str:
+        return f"{self.prefix}{key}:{kind}"
+
+    async def try_claim(self, key: str) -> tuple[str, dict | None]:
+        result = await self._redis.get(self._key(key, "result"))
+        if result is not None:
+            return DONE, json.loads(result)
+        if await self._redis.set(
+            self._key(key, "lease"), self.owner, nx=True, px=int(self.lease * 1000)
+        ):
+            return CLAIMED, None
+        return RUNNING, None
+
+    async def _owns(self, key: str) -> bool:
+        owner = await self._redis.get(self._key(key, "lease"))
+        return owner is not None and owner.decode() == self.owner
+
+    async def renew(self, key: str) -> None:
+        if await self._owns(key):
+            await self._redis.pexpire(self._key(key, "lease"), int(self.lease * 1000))
+
+    async def publish(self, key: str, result: dict) -> None:
+        await self._redis.set(
+            self._key(key, "result"), json.dumps(result), ex=int(self.result_ttl)
+        )
+        await self._redis.delete(self._key(key, "lease"))
+
+    async def release(self, key: str) -> None:
+        if await self._owns(key):
+            await self._redis.delete(self._key(key, "lease"))
+
+
+def create_job_queue(url: str) -> JobQueue:
+    """
+    按配置创建任务队列
+    :param url: 为空时只在进程内去重；"sqlite:///path/to/jobs.db" 或 "redis://host:6379/0"
+    :return:
+    """
+    if not url:
+        return JobQueue()
+    if url.startswith("sqlite://"):
+        return SQLiteJobQueue(url.removeprefix("sqlite://"))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url)
+    raise ValueError(f"不支持的任务队列地址：{url}")
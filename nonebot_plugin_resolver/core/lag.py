@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from nonebot import logger
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLATFORMS_DIR = os.path.join(PACKAGE_DIR, "platforms")
+
+STACK_LIMIT = 12
+""" 记录的阻塞调用栈最多保留的帧数（取最内层） """
+
+
+def attribute_stack(
+    stack: traceback.StackSummary, active: list[str]
+) -> tuple[str, str]:
+    """
+    从事件循环线程被卡住时的调用栈中找出责任方
+    :param stack: 由外到内的调用栈
+    :param active: 正在运行的解析处理函数（平台名），栈里找不到平台模块时用来兜底
+    :return: (平台名, 插件内最内层的调用位置)
+    """
+    handler = ""
+    site = ""
+    for frame in stack:
+        filename = os.path.abspath(frame.filename)
+        if not filename.startswith(PACKAGE_DIR):
+            continue
+        site = f"{os.path.relpath(filename, PACKAGE_DIR)}:{frame.lineno} {frame.name}"
+        if not handler and os.path.dirname(filename) == PLATFORMS_DIR:
+            # 平台模块与平台同名
+            handler = os.path.splitext(os.path.basename(filename))[0]
+    if not handler:
+        # 子任务的栈里没有平台模块，只有一个处理函数在运行时可以确定是它
+        handler = active[0] if len(set(active)) == 1 else "unknown"
+    return handler, site
+
+
+class LagMonitor:
+    """
+    事件循环延迟监控（诊断模式）：
+    - 采样任务每 interval 秒醒来一次，实际醒来时间比预期晚的部分即事件循环延迟；
+    - 看门狗线程发现采样任务超过 threshold 秒没有醒来时，抓取事件循环线程当前的调用栈，
+      归到正在运行的解析处理函数名下，并写日志。
+    """
+
+    def __init__(
+        self, interval: float = 0.05, threshold: float = 0.2, history: int = 1200
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: deque[float] = deque(maxlen=history)
+        self.max_lag = 0.0
+        self.stalls: deque[dict] = deque(maxlen=20)
+        """ 最近的阻塞记录 """
+        self.by_handler: dict[str, dict] = {}
+        """ 平台名 -> {count, max_ms, site} """
+        self._active: dict[int, str] = {}
+        self._heartbeat = 0.0
+        self._captured: dict | None = None
+        self._loop_thread = 0
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        """在事件循环中启动监控"""
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        threading.Thread(
+            target=self._watchdog, name="resolver-lag-watchdog", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        """标记一个正在运行的解析处理函数，用于归属阻塞"""
+        key = id(asyncio.current_task())
+        self._active[key] = name
+        try:
+            yield
+        finally:
+            self._active.pop(key, None)
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._heartbeat = time.monotonic()
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._record(lag)
+            self._captured = None
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            if self._captured is not None:
+                continue
+            if time.monotonic() - self._heartbeat < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            handler, site = attribute_stack(stack, list(self._active.values()))
+            self._captured = {
+                "handler": handler,
+                "site": site,
+                "stack": traceback.format_list(stack[-STACK_LIMIT:]),
+            }
+
+    def _record(self, lag: float) -> None:
+        # 看门狗没来得及抓栈（如阻塞在持有 GIL 的 C 扩展里）时只按正在运行的处理函数归属
+        captured = self._captured or {
+            "handler": attribute_stack([], list(self._active.values()))[0],
+            "site": "",
+            "stack": [],
+        }
+        stall = {"at": time.time(), "lag_ms": round(lag * 1000, 1), **captured}
+        self.stalls.append(stall)
+        stats = self.by_handler.setdefault(
+            stall["handler"], {"count": 0, "max_ms": 0.0, "site": ""}
+        )
+        stats["count"] += 1
+        if stall["lag_ms"] >= stats["max_ms"]:
+            stats["max_ms"] = stall["lag_ms"]
+            stats["site"] = stall["site"]
+        logger.warning(
+            f"事件循环被阻塞 {stall['lag_ms']}ms，处理函数：{stall['handler']}，"
+            f"位置：{stall['site'] or '未知'}\n" + "".join(stall["stack"])
+        )
+
+    def snapshot(self) -> dict:
+        ms = sorted(lag * 1000 for lag in self.lags)
+
+        def quantile(q: float) -> float:
+            return round(ms[min(len(ms) - 1, int(len(ms) * q))], 1) if ms else 0.0
+
+        return {
+            "samples": len(ms),
+            "p50_ms": quantile(0.5),
+            "p99_ms": quantile(0.99),
+            "max_ms": round(self.max_lag * 1000, 1),
+            "stalls": sum(s["count"] for s in self.by_handler.values()),
+            "by_handler": self.by_handler,
+        }
+
+
+LAG_MONITOR = LagMonitor()
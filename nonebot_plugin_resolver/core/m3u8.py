@@ -0,0 +1,209 @@
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from urllib.parse import urljoin
+
+import httpx
+
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(text: str) -> dict[str, str]:
+    """解析 `KEY=VALUE,KEY="VALUE"` 形式的属性列表"""
+    return {k: v.strip('"') for k, v in _ATTRIBUTE.findall(text)}
+
+
+@dataclass
+class Key:
+    method: str
+    uri: str | None = None
+    iv: str | None = None
+
+
+@dataclass
+class Segment:
+    uri: str
+    duration: float
+    sequence: int
+    title: str = ""
+    byterange: tuple[int, int] | None = None
+    """ (长度, 偏移) """
+    key: Key | None = None
+    discontinuity: bool = False
+
+
+@dataclass
+class Variant:
+    uri: str
+    bandwidth: int = 0
+    resolution: str = ""
+    codecs: str = ""
+
+
+@dataclass
+class Playlist:
+    is_master: bool = False
+    version: int = 0
+    target_duration: float = 0
+    media_sequence: int = 0
+    ended: bool = False
+    map_uri: str | None = None
+    variants: list[Variant] = field(default_factory=list)
+    segments: list[Segment] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return sum(s.duration for s in self.segments)
+
+
+class M3U8Parser:
+    """
+    增量的 m3u8 解析器，可以一块一块地喂入文本，每完成一个分片就立即返回。
+    支持 EXTINF（任意时长格式）、BYTERANGE、KEY、MAP 以及 master / media 两种播放列表。
+    """
+
+    def __init__(self, base_url: str = ""):
+        self.base_url = base_url
+        self.playlist = Playlist()
+        self._buffer = ""
+        self._extinf: tuple[float, str] | None = None
+        self._byterange: tuple[int, int | None] | None = None
+        self._stream_inf: dict[str, str] | None = None
+        self._key: Key | None = None
+        self._discontinuity = False
+        self._next_offset: dict[str, int] = {}
+
+    def feed(self, text: str) -> list[Segment]:
+        """
+        喂入一段文本
+        :param text:
+        :return: 本次新解析出的分片
+        """
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return [s for s in map(self._line, lines) if s is not None]
+
+    def close(self) -> list[Segment]:
+        """处理缓冲区中最后一行（没有换行结尾的情况）"""
+        line, self._buffer = self._buffer, ""
+        segment = self._line(line)
+        return [segment] if segment else []
+
+    def _line(self, line: str) -> Segment | None:
+        line = line.strip()
+        if not line:
+            return None
+        playlist = self.playlist
+        if not line.startswith("#"):
+            return self._uri(line)
+        tag, _, value = line.partition(":")
+        if tag == "#EXTINF":
+            duration, _, title = value.partition(",")
+            self._extinf = (float(duration or 0), title)
+        elif tag == "#EXT-X-BYTERANGE":
+            length, _, offset = value.partition("@")
+            self._byterange = (int(length), int(offset) if offset else None)
+        elif tag == "#EXT-X-KEY":
+            attrs = parse_attributes(value)
+            method = attrs.get("METHOD", "NONE")
+            self._key = (
+                None
+                if method == "NONE"
+                else Key(
+                    method,
+                    urljoin(self.base_url, attrs["URI"]) if "URI" in attrs else None,
+                    attrs.get("IV"),
+                )
+            )
+        elif tag == "#EXT-X-STREAM-INF":
+            playlist.is_master = True
+            self._stream_inf = parse_attributes(value)
+        elif tag == "#EXT-X-MAP":
+            uri = parse_attributes(value).get("URI")
+            playlist.map_uri = urljoin(self.base_url, uri) if uri else None
+        elif tag == "#EXT-X-TARGETDURATION":
+            playlist.target_duration = float(value)
+        elif tag == "#EXT-X-MEDIA-SEQUENCE":
+            playlist.media_sequence = int(value)
+        elif tag == "#EXT-X-VERSION":
+            playlist.version = int(value)
+        elif tag == "#EXT-X-DISCONTINUITY":
+            self._discontinuity = True
+        elif tag == "#EXT-X-ENDLIST":
+            playlist.ended = True
+        return None
+
+    def _uri(self, line: str) -> Segment | None:
+        playlist = self.playlist
+        uri = urljoin(self.base_url, line)
+        if self._stream_inf is not None:
+            attrs, self._stream_inf = self._stream_inf, None
+            playlist.variants.append(
+                Variant(
+                    uri,
+                    int(attrs.get("BANDWIDTH", 0) or 0),
+                    attrs.get("RESOLUTION", ""),
+                    attrs.get("CODECS", ""),
+                )
+            )
+            return None
+        duration, title = self._extinf or (0.0, "")
+        byterange = None
+        if self._byterange is not None:
+            length, offset = self._byterange
+            if offset is None:
+                offset = self._next_offset.get(uri, 0)
+            self._next_offset[uri] = offset + length
+            byterange = (length, offset)
+        segment = Segment(
+            uri=uri,
+            duration=duration,
+            sequence=playlist.media_sequence + len(playlist.segments),
+            title=title,
+            byterange=byterange,
+            key=self._key,
+            discontinuity=self._discontinuity,
+        )
+        self._extinf = self._byterange = None
+        self._discontinuity = False
+        playlist.segments.append(segment)
+        return segment
+
+
+def parse_m3u8_text(text: str, base_url: str = "") -> Playlist:
+    """一次性解析完整的 m3u8 文本"""
+    parser = M3U8Parser(base_url)
+    parser.feed(text)
+    parser.close()
+    return parser.playlist
+
+
+async def stream_m3u8(
+    url: str, client: httpx.AsyncClient, parser: M3U8Parser | None = None
+) -> AsyncIterator[Segment]:
+    """
+    边下载边解析 m3u8，每解析出一个分片就 yield 出去，调用方可以立即开始下载分片
+    :param url:
+    :param client:
+    :param parser: 可选，传入后可在迭代结束后读取 parser.playlist
+    :return:
+    """
+    parser = parser or M3U8Parser(url)
+    async with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        parser.base_url = str(resp.url)
+        async for chunk in resp.aiter_text():
+            for segment in parser.feed(chunk):
+                yield segment
+    for segment in parser.close():
+        yield segment
+
+
+def select_variant(variants: list[Variant], max_bandwidth: int = 0) -> Variant:
+    """在 master 播放列表中选出不超过带宽上限的最高码率，都超出时取最低的"""
+    ordered = sorted(variants, key=lambda v: v.bandwidth, reverse=True)
+    if max_bandwidth:
+        for variant in ordered:
+            if variant.bandwidth <= max_bandwidth:
+                return variant
+    return ordered[0] if not max_bandwidth else ordered[-1]
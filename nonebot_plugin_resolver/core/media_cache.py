@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import asyncio
+from dataclasses import dataclass, asdict
+
+from nonebot import logger
+
+HANDLE_TTL = 6 * 3600
+""" 协议端返回的可复用句柄（通常是 CDN 链接）的有效期，过期后重新上传本地文件 """
+
+
+def new_hasher():
+    """下载时边写边算的内容哈希"""
+    return hashlib.sha256()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """对已经在磁盘上的文件（如 yt-dlp 的输出）计算内容哈希"""
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def combine_digests(*digests: str) -> str:
+    """由输入文件的哈希推导合并产物的键（ffmpeg -c copy 的输出由输入唯一确定）"""
+    return hashlib.sha256(":".join(digests).encode()).hexdigest()
+
+
+@dataclass
+class MediaEntry:
+    digest: str
+    path: str
+    size: int
+    handle: str = ""
+    """ 协议端可以直接复用的文件标识 / 链接，为空表示只能重新上传本地文件 """
+    handle_at: float = 0
+    last_used: float = 0
+
+    @property
+    def handle_valid(self) -> bool:
+        return bool(self.handle) and time.time() - self.handle_at < HANDLE_TTL
+
+
+class MediaCache:
+    """
+    发送端的媒体缓存，按内容哈希存放已经下载 / 合并好的文件，并记录来源（链接、视频 id）到哈希的映射。
+    同一个来源再次出现时不再下载、合并；协议端返回过可复用句柄时连上传也省掉。
+    超出容量时按最近使用时间淘汰。
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries: dict[str, MediaEntry] = {}
+        self.sources: dict[str, str] = {}
+        self.stats = {"hits": 0, "misses": 0, "handle_hits": 0, "bytes_saved": 0}
+        """ bytes_saved：因复用句柄或缓存文件而少上传 / 少下载的字节数 """
+        self._index = os.path.join(root, "index.json")
+        if self.enabled:
+            os.makedirs(root, exist_ok=True)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(e.size for e in self.entries.values())
+
+    def _load(self) -> None:
+        try:
+            with open(self._index, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in data.get("entries", []):
+            entry = MediaEntry(**item)
+            if os.path.exists(entry.path):
+                self.entries[entry.digest] = entry
+        self.sources = {
+            k: v for k, v in data.get("sources", {}).items() if v in self.entries
+        }
+
+    def _save(self) -> None:
+        tmp = self._index + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "entries": [asdict(e) for e in self.entries.values()],
+                    "sources": self.sources,
+                },
+                f,
+            )
+        os.replace(tmp, self._index)
+
+    def lookup(self, source: str) -> MediaEntry | None:
+        """
+        按来源查找已缓存的文件
+        :param source: 来源标识，如下载链接或 "bilibili:BV...:p0"
+        :return:
+        """
+        if not self.enabled:
+            return None
+        entry = self.entries.get(self.sources.get(source, ""))
+        if entry is None or not os.path.exists(entry.path):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        entry.last_used = time.time()
+        return entry
+
+    def get(self, digest: str) -> MediaEntry | None:
+        entry = self.entries.get(digest)
+        if entry is not None and os.path.exists(entry.path):
+            entry.last_used = time.time()
+            return entry
+        return None
+
+    def add(self, path: str, digest: str, source: str | None = None) -> MediaEntry:
+        """
+        把文件移入缓存目录（内容相同的文件只保留一份）
+        :param path: 待缓存的文件，调用后不应再使用这个路径
+        :param digest: 内容哈希
+        :param source: 可选，来源标识
+        :return:
+        """
+        entry = self.get(digest)
+        if entry is None:
+            # 缓存目录可能在运行期间被外部清理
+            os.makedirs(self.root, exist_ok=True)
+            target = os.path.join(self.root, digest + os.path.splitext(path)[1])
+            shutil.move(path, target)
+            entry = MediaEntry(digest, target, os.path.getsize(target))
+            entry.last_used = time.time()
+            self.entries[digest] = entry
+        elif os.path.abspath(path) != os.path.abspath(entry.path):
+            os.remove(path)
+        if source:
+            self.sources[source] = digest
+        self._evict(keep=digest)
+        self._save()
+        return entry
+
+    def adopt(self, path: str, digest: str, source: str | None = None) -> MediaEntry:
+        """
+        登记另一个实例产出的文件：硬链接（跨文件系统时复制）到本缓存目录，原文件保持不动
+        :param path: 另一个实例缓存中的文件
+        :param digest: 内容哈希
+        :param source: 可选，来源标识
+        :return:
+        """
+        entry = self.get(digest)
+        if entry is not None:
+            return self.add(entry.path, digest, source)
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(
+            self.root, f"{digest}.{os.getpid()}.adopt{os.path.splitext(path)[1]}"
+        )
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        return self.add(tmp, digest, source)
+
+    def remember_handle(self, digest: str, handle: str) -> None:
+        entry = self.entries.get(digest)
+        if entry is not None and handle:
+            entry.handle, entry.handle_at = handle, time.time()
+            self._save()
+
+    def forget_handle(self, digest: str) -> None:
+        entry = self.entries.get(digest)
+        if entry is not None and entry.handle:
+            entry.handle, entry.handle_at = "", 0
+            self._save()
+
+    def record_saved(self, nbytes: int, handle: bool = False) -> None:
+        self.stats["bytes_saved"] += nbytes
+        if handle:
+            self.stats["handle_hits"] += 1
+
+    def _evict(self, keep: str) -> None:
+        total = self.total_bytes
+        for entry in sorted(self.entries.values(), key=lambda e: e.last_used):
+            if total <= self.max_bytes:
+                break
+            if entry.digest == keep:
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"媒体缓存淘汰失败：{e}")
+            total -= entry.size
+            del self.entries[entry.digest]
+        self.sources = {k: v for k, v in self.sources.items() if v in self.entries}
+
+    async def add_async(
+        self, path: str, digest: str | None = None, source: str | None = None
+    ) -> MediaEntry:
+        """没有传入哈希时在线程里计算，避免阻塞事件循环"""
+        if digest is None:
+            digest = await asyncio.to_thread(hash_file, path)
+        return self.add(path, digest, source)
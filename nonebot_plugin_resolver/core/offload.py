@@ -0,0 +1,96 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Callable, TypeVar
+
+from nonebot import logger
+
+T = TypeVar("T")
+
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+""" 进程池的启动方式：不用 fork，在已有线程（事件循环、线程池）的进程里 fork 不安全，Windows 上也没有 fork """
+
+
+class Offloader:
+    """
+    把大块的解析 / 哈希从事件循环线程挪到进程池（或线程池）里执行，小负载仍然就地执行，省去调度开销。
+    进程池只适合返回小结果的函数（结果要 pickle 回来），且函数必须定义在模块顶层。
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        threshold: int = 64 * 1024,
+        mode: str = "process",
+        initializer: Callable[[], object] | None = None,
+    ):
+        """
+        :param workers:
+        :param threshold:
+        :param mode:
+        :param initializer: 进程池的子进程启动时执行，子进程是新起的解释器，
+            反序列化函数时会重新导入它所在的模块，需要的初始化（比如 nonebot.init）放在这里
+        """
+        self.workers = workers
+        """ 池大小，为 0 时不启用，全部就地执行 """
+        self.threshold = threshold
+        """ 负载（通常是待解析文本的长度）达到多少字节才交给池执行 """
+        self.mode = mode
+        """ "process" 或 "thread"；JSON 解码会一直持有 GIL，只有进程池能让事件循环不被卡住 """
+        self.initializer = initializer
+        self.stats = {"inline": 0, "offloaded": 0}
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        self.workers,
+                        mp_context=multiprocessing.get_context(START_METHOD),
+                        initializer=self.initializer,
+                    )
+                except (ImportError, NotImplementedError, OSError) as e:
+                    # 平台不支持多进程（缺少 sem_open 等）
+                    logger.warning(f"无法创建解析进程池，改用线程池：{e}")
+                    self.mode = "thread"
+            if self.mode != "process":
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="resolver-offload"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, size: int = 0) -> T:
+        """
+        执行 func(*args)，size 达到阈值时交给池执行
+        :param func: 模块顶层的同步函数
+        :param args:
+        :param size: 负载大小（字节）
+        :return:
+        """
+        if not self.workers or size < self.threshold:
+            self.stats["inline"] += 1
+            return func(*args)
+        self.stats["offloaded"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        except BrokenExecutor as e:
+            # 子进程意外退出或初始化失败，改用线程池，避免每次都重新创建一个起不来的进程池
+            logger.warning(f"解析进程池已损坏，改用线程池：{e}")
+            self.shutdown()
+            self.mode = "thread"
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,173 @@
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator
+
+from nonebot import logger
+
+from .supervisor import SUPERVISOR
+
+REPORT_INTERVAL = 5.0
+""" 两次进度日志之间至少间隔的秒数 """
+
+REPORT_STEP = 0.25
+""" 已知总大小时，进度每前进多少比例也记一次日志 """
+
+Notifier = Callable[["DownloadProgress"], Awaitable[None]]
+
+PROGRESS_NOTIFIER: contextvars.ContextVar[tuple[Notifier, float] | None] = (
+    contextvars.ContextVar("resolver_progress_notifier", default=None)
+)
+""" (在聊天里提示进度的协程函数, 预计剩余超过多少秒才提示)，由处理函数设置，下载任务继承 """
+
+ACTIVE: dict[int, "DownloadProgress"] = {}
+""" 正在进行的下载 """
+
+TOTALS = {"downloads": 0, "failed": 0, "bytes": 0, "seconds": 0.0}
+""" 已结束的下载的累计数据 """
+
+
+def _size(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+class DownloadProgress:
+    """
+    一次下载的进度：下载循环里每个分块调用 update，按时间间隔和进度步长限流写日志，
+    并计算吞吐与剩余时间；总大小未知（没有 content-length）时只报告已下载量与吞吐。
+    用作上下文管理器，结束时计入累计数据。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        total: int = 0,
+        interval: float = REPORT_INTERVAL,
+        step: float = REPORT_STEP,
+    ):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self.step = step
+        self.started = time.monotonic()
+        self._reported_at = self.started
+        self._reported_ratio = 0.0
+        self._notified = False
+        self._notice: asyncio.Task | None = None
+
+    def __enter__(self) -> "DownloadProgress":
+        ACTIVE[id(self)] = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        ACTIVE.pop(id(self), None)
+        TOTALS["downloads"] += 1
+        TOTALS["failed"] += exc_type is not None
+        TOTALS["bytes"] += self.done
+        TOTALS["seconds"] += self.elapsed
+        if exc_type is None:
+            logger.info(f"{self.name} 下载完成：{self}")
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def ratio(self) -> float | None:
+        return min(1.0, self.done / self.total) if self.total else None
+
+    @property
+    def rate(self) -> float:
+        """吞吐（字节/秒）"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """预计剩余秒数，总大小未知或还没有吞吐数据时为 None"""
+        if not self.total or not self.rate:
+            return None
+        return max(0.0, (self.total - self.done) / self.rate)
+
+    def add_total(self, n: int) -> None:
+        """分块下载（如 m3u8 分片）时逐个累加总大小"""
+        self.total += n
+
+    def discard(self, n: int) -> None:
+        """下载中途出错、要重新下载时，扣掉这次已经计入的字节"""
+        self.done -= n
+
+    def update(self, n: int) -> None:
+        self.done += n
+        now = time.monotonic()
+        ratio = self.ratio
+        if now - self._reported_at < self.interval and (
+            ratio is None or ratio - self._reported_ratio < self.step
+        ):
+            return
+        self._reported_at = now
+        if ratio is not None:
+            self._reported_ratio = ratio
+        logger.info(f"{self.name} 下载中：{self}")
+        self._maybe_notify()
+
+    def _maybe_notify(self) -> None:
+        """预计还要下载很久时，在聊天里提示一次"""
+        if self._notified or (setting := PROGRESS_NOTIFIER.get()) is None:
+            return
+        notify, min_eta = setting
+        if self.eta is not None and self.eta >= min_eta:
+            self._notified = True
+            self._notice = SUPERVISOR.spawn(self._notify(notify))
+
+    async def _notify(self, notify: Notifier) -> None:
+        try:
+            await notify(self)
+        except Exception as e:
+            logger.warning(f"发送下载进度提示失败：{e}")
+
+    def __str__(self) -> str:
+        text = _size(self.done)
+        if self.total:
+            text += f"/{_size(self.total)}（{self.ratio:.0%}）"
+        text += f"，{_size(self.rate)}/s"
+        if self.eta is not None and self.done < self.total:
+            text += f"，剩余约 {self.eta:.0f} 秒"
+        return text
+
+
+@contextmanager
+def tracked(progress: DownloadProgress | None, name: str) -> Iterator[DownloadProgress]:
+    """
+    沿用调用方传入的进度对象（几路下载合并报告），没有时新建一个
+    :param progress:
+    :param name: 新建时的下载名称
+    :return:
+    """
+    if progress is not None:
+        yield progress
+        return
+    with DownloadProgress(name) as progress:
+        yield progress
+
+
+def download_states() -> dict:
+    """正在进行的下载与累计数据，供监控使用"""
+    return {
+        "active": [
+            {
+                "name": p.name,
+                "done": p.done,
+                "total": p.total,
+                "rate": round(p.rate),
+                "eta": None if p.eta is None else round(p.eta),
+            }
+            for p in ACTIVE.values()
+        ],
+        **TOTALS,
+    }
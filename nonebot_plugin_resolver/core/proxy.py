@@ -0,0 +1,244 @@
+import time
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+from nonebot import logger
+
+from .constants import COMMON_HEADER
+from .deadline import DeadlineExceeded
+
+T = TypeVar("T")
+
+DIRECT = "direct"
+""" 配置里表示不走代理、直接连接的线路 """
+
+PROXIED_PLATFORMS = ("tiktok", "youtube", "twitter")
+""" 没有单独配置线路时，国内服务器上经 resolver_proxy 访问的平台 """
+
+PROBE_INTERVAL = 60
+""" 后台测速的间隔（秒），只测有多条线路的平台 """
+
+PROBE_TIMEOUT = 5.0
+""" 单次测速的超时（秒），连接不上的线路按这个延迟计 """
+
+PROBE_BYTES = 256 * 1024
+""" 测速时最多读取的字节数，读到 PROBE_MIN_BYTES 以上才用来估计吞吐 """
+
+PROBE_MIN_BYTES = 32 * 1024
+
+PROBE_URLS = {
+    "youtube": "https://www.youtube.com/",
+    "tiktok": "https://www.tiktok.com/",
+    "twitter": "https://x.com/",
+}
+""" 各平台的测速地址，没有列出的平台用 DEFAULT_PROBE_URL """
+
+DEFAULT_PROBE_URL = "https://www.google.com/"
+
+ROUTE_COOLDOWN = 120
+""" 下载或测速出错的线路暂停使用多少秒 """
+
+REFERENCE_BYTES = 8 * 1024 * 1024
+""" 比较线路时按下载这么大的文件估算耗时：连接延迟 + 大小 / 吞吐 """
+
+EWMA_ALPHA = 0.3
+""" 延迟与吞吐的指数加权平均系数，越大越看重最近的测量 """
+
+
+def _ewma(old: float | None, new: float) -> float:
+    return new if old is None else old + EWMA_ALPHA * (new - old)
+
+
+def route_label(proxy: str | None) -> str:
+    """线路在日志与状态里显示的名字，隐去代理地址里的账号密码"""
+    if proxy is None:
+        return DIRECT
+    parsed = urlparse(proxy)
+    return f"{parsed.scheme}://{parsed.hostname}" + (
+        f":{parsed.port}" if parsed.port else ""
+    )
+
+
+@dataclass
+class Route:
+    proxy: str | None
+    """ 代理地址，直连为 None """
+    label: str
+    latency: float | None = None
+    """ 连接延迟（到收到响应头，秒），还没测过为 None """
+    throughput: float | None = None
+    """ 吞吐（字节/秒），还没测过为 None """
+    uses: int = 0
+    failures: int = 0
+    bytes: int = 0
+    down_until: float = 0.0
+    reason: str = ""
+
+    def score(self) -> float:
+        """估计下载 REFERENCE_BYTES 要多少秒，越小越好；没测过吞吐的线路只看延迟，优先去试"""
+        latency = PROBE_TIMEOUT if self.latency is None else self.latency
+        if not self.throughput:
+            return latency
+        return latency + REFERENCE_BYTES / self.throughput
+
+    def fail(self, reason: str, cooldown: float) -> None:
+        self.failures += 1
+        self.down_until = time.monotonic() + cooldown
+        self.reason = reason
+
+
+class ProxyRouter:
+    """
+    按平台在多条线路（若干代理加直连）之间选路：后台定期测各线路的连接延迟与吞吐，
+    实际下载的吞吐也计入；每次下载选当前估计最快的健康线路，出错的线路暂停 cooldown 秒并换下一条。
+    """
+
+    def __init__(
+        self,
+        routes: dict[str, list[str | None]],
+        interval: float = PROBE_INTERVAL,
+        cooldown: float = ROUTE_COOLDOWN,
+    ):
+        """
+        :param routes: 平台名 -> 代理地址列表，None 表示直连；只有一条线路的平台不测速
+        :param interval:
+        :param cooldown:
+        """
+        self.routes = {
+            name: [Route(proxy, route_label(proxy)) for proxy in proxies]
+            for name, proxies in routes.items()
+            if proxies
+        }
+        self.interval = interval
+        self.cooldown = cooldown
+        self._task: asyncio.Task | None = None
+
+    def ranked(self, platform: str) -> list[Route]:
+        """
+        平台的线路，健康的在前，各自按估计耗时排序；都不健康时仍然全部返回，总比不尝试好
+        :param platform:
+        :return: 平台没有配置线路时为一条直连
+        """
+        routes = self.routes.get(platform)
+        if not routes:
+            return [Route(None, DIRECT)]
+        now = time.monotonic()
+        return sorted(routes, key=lambda r: (r.down_until > now, r.score()))
+
+    async def attempt(
+        self,
+        platform: str,
+        request: Callable[[str | None], Awaitable[T | None]],
+        measure: Callable[[T], int] | None = None,
+    ) -> T | None:
+        """
+        按当前排序逐条线路执行 request，直到成功
+        :param platform:
+        :param request: 接收代理地址（直连为 None）的协程函数，抛出异常或返回 None 视为这条线路失败
+        :param measure: 可选，从结果算出传输的字节数（如本地文件大小），用来更新线路的吞吐
+        :return: 第一次成功的结果，全部线路都失败时为 None
+        """
+        # 平台模块在第一次解析时才导入，测速也在第一次用到时才开始
+        self.start()
+        for route in self.ranked(platform):
+            route.uses += 1
+            logger.info(f"{platform} 经 {route.label} 请求")
+            start = time.monotonic()
+            try:
+                result = await request(route.proxy)
+            except DeadlineExceeded:
+                # 时间预算用完，换线路也来不及了
+                raise
+            except Exception as e:
+                result, reason = None, f"{type(e).__name__}: {e}"
+            else:
+                reason = "请求失败"
+            if result is None:
+                route.fail(reason, self.cooldown)
+                logger.warning(
+                    f"{platform} 的线路 {route.label} 出错，暂停 {self.cooldown:.0f} 秒：{reason}"
+                )
+                continue
+            if measure is not None:
+                size = measure(result)
+                route.bytes += size
+                if size >= PROBE_MIN_BYTES:
+                    route.throughput = _ewma(
+                        route.throughput, size / max(time.monotonic() - start, 1e-3)
+                    )
+            return result
+        return None
+
+    async def probe(self, platform: str, route: Route) -> None:
+        """测一条线路：到响应头的时间计为连接延迟，之后读到的正文用来估计吞吐"""
+        url = PROBE_URLS.get(platform, DEFAULT_PROBE_URL)
+        kwargs = {"proxy": route.proxy} if route.proxy else {}
+        try:
+            async with httpx.AsyncClient(
+                headers=COMMON_HEADER, timeout=PROBE_TIMEOUT, **kwargs
+            ) as client:
+                start = time.monotonic()
+                async with client.stream("GET", url) as resp:
+                    route.latency = _ewma(route.latency, time.monotonic() - start)
+                    body_start, read = time.monotonic(), 0
+                    async for chunk in resp.aiter_bytes():
+                        read += len(chunk)
+                        if read >= PROBE_BYTES:
+                            break
+            if read >= PROBE_MIN_BYTES:
+                route.throughput = _ewma(
+                    route.throughput, read / max(time.monotonic() - body_start, 1e-3)
+                )
+        except Exception as e:
+            # 连接失败、代理地址写错或缺少 socks 支持都算这条线路不可用
+            route.latency = _ewma(route.latency, PROBE_TIMEOUT)
+            route.fail(f"测速失败：{type(e).__name__}", self.cooldown)
+            return
+        # 测速通过，之前出错的线路提前恢复
+        route.down_until = 0.0
+
+    async def _loop(self) -> None:
+        probed = [
+            (name, route)
+            for name, routes in self.routes.items()
+            if len(routes) > 1
+            for route in routes
+        ]
+        while True:
+            await asyncio.gather(*(self.probe(name, route) for name, route in probed))
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and any(len(r) > 1 for r in self.routes.values()):
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def health(self) -> dict[str, list[dict]]:
+        """各平台线路的测速结果与使用情况，供监控使用"""
+        now = time.monotonic()
+        return {
+            name: [
+                {
+                    "label": r.label,
+                    "healthy": r.down_until <= now,
+                    "retry_after": max(0, round(r.down_until - now)),
+                    "latency_ms": (
+                        None if r.latency is None else round(r.latency * 1000)
+                    ),
+                    "throughput": None if r.throughput is None else round(r.throughput),
+                    "uses": r.uses,
+                    "failures": r.failures,
+                    "bytes": r.bytes,
+                    "reason": r.reason,
+                }
+                for r in self.ranked(name)
+            ]
+            for name in self.routes
+        }
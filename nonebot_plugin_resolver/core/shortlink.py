@@ -0,0 +1,52 @@
+from urllib.parse import urljoin
+
+import httpx
+
+from .cache import TTLCache
+from .constants import COMMON_HEADER
+
+SHORT_LINK_CACHE = TTLCache(maxsize=2048, ttl=24 * 3600)
+""" 短链 -> 展开后的链接，短链基本不会变更，缓存一天 """
+
+
+async def _expand(
+    url: str, headers: dict | None, proxy: str | None, max_hops: int
+) -> str:
+    kwargs = {"proxy": proxy} if proxy else {}
+    async with httpx.AsyncClient(
+        headers=headers or COMMON_HEADER,
+        timeout=httpx.Timeout(10, connect=5.0),
+        follow_redirects=False,
+        **kwargs,
+    ) as client:
+        for _ in range(max_hops):
+            resp = await client.head(url)
+            if resp.status_code >= 400:
+                # 部分短链服务不支持 HEAD，改用 GET 但只读响应头，不读取正文
+                async with client.stream("GET", url) as resp:
+                    pass
+            location = resp.headers.get("location")
+            if not resp.is_redirect or not location:
+                break
+            url = urljoin(url, location)
+    return url
+
+
+async def expand_short_url(
+    url: str,
+    headers: dict | None = None,
+    proxy: str | None = None,
+    max_hops: int = 5,
+) -> str:
+    """
+    展开短链接（b23.tv、v.douyin.com、vt/vm.tiktok、xhslink、163cn.tv 等）
+    逐跳读取 Location 而不下载页面，结果缓存，同一短链的并发展开只请求一次
+    :param url: 短链接
+    :param headers: 可选，请求头，默认使用 COMMON_HEADER
+    :param proxy: 可选，代理地址
+    :param max_hops: 最多跟随的跳转次数
+    :return: 展开后的链接
+    """
+    return await SHORT_LINK_CACHE.get_or_load(
+        (url, max_hops), lambda: _expand(url, headers, proxy, max_hops)
+    )
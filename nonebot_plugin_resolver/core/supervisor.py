@@ -0,0 +1,166 @@
+import os
+import glob
+import shutil
+import signal
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Coroutine, Iterator, TypeVar
+
+from nonebot import logger
+
+T = TypeVar("T")
+
+CANCEL_TIMEOUT = 5.0
+""" 取消任务后最多再等多少秒让它们清理，之后直接结束子进程、删除半成品 """
+
+
+def remove_path(path: str) -> None:
+    """删除文件或目录，路径可以带通配符；不存在时忽略"""
+    for match in glob.glob(path) if glob.has_magic(path) else [path]:
+        if os.path.isdir(match):
+            shutil.rmtree(match, ignore_errors=True)
+        elif os.path.exists(match):
+            os.remove(match)
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """结束子进程所在的整个进程组（ffmpeg / yt-dlp 还会再起子进程）"""
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except AttributeError:
+        # Windows 没有进程组
+        process.kill()
+
+
+class Supervisor:
+    """
+    跟踪插件启动的解析处理函数、后台任务、子进程与正在写的输出文件。
+    取消沿着任务传递：被取消的任务结束自己的子进程组并删掉写了一半的文件；
+    驱动关闭时先等正在进行的任务在 timeout 秒内收尾，超时的取消，仍然残留的强制清理。
+    """
+
+    def __init__(self):
+        self.tasks: set[asyncio.Task] = set()
+        self.processes: set[asyncio.subprocess.Process] = set()
+        self.partials: dict[str, int] = {}
+        """ 写了一半的输出路径 -> 正在写它的任务数 """
+        self.closing = False
+        self.stats = {"spawned": 0, "processes": 0, "cancelled": 0, "cleaned": 0}
+
+    def _add(self, task: asyncio.Task) -> None:
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """把当前任务（如一次解析）登记为在运行，关闭时会被等待或取消"""
+        task = asyncio.current_task()
+        if task is not None:
+            self.tasks.add(task)
+        try:
+            yield
+        finally:
+            self.tasks.discard(task)
+
+    def spawn(self, coro: Coroutine[None, None, T], name: str | None = None):
+        """
+        创建受管理的后台任务，用来代替 asyncio.create_task
+        :param coro:
+        :param name:
+        :return: asyncio.Task
+        """
+        task = asyncio.create_task(coro, name=name)
+        self.stats["spawned"] += 1
+        self._add(task)
+        return task
+
+    @asynccontextmanager
+    async def process(
+        self, *command: str, **kwargs
+    ) -> AsyncIterator[asyncio.subprocess.Process]:
+        """
+        启动子进程（独立的进程组），离开时如果它还在运行（出错或被取消）就结束整个进程组
+        :param command: 可执行文件与参数
+        :param kwargs: 传给 asyncio.create_subprocess_exec
+        :return:
+        """
+        if self.closing:
+            raise RuntimeError("插件正在关闭，不再启动新的子进程")
+        process = await asyncio.create_subprocess_exec(
+            *command, start_new_session=os.name == "posix", **kwargs
+        )
+        self.stats["processes"] += 1
+        self.processes.add(process)
+        try:
+            yield process
+        finally:
+            if process.returncode is None:
+                kill_process_group(process)
+                await asyncio.shield(process.wait())
+            self.processes.discard(process)
+
+    async def run(self, *command: str, **kwargs) -> tuple[int, bytes, bytes]:
+        """
+        运行子进程直到结束
+        :return: (返回码, stdout, stderr)，没有重定向的输出为 b""
+        """
+        async with self.process(*command, **kwargs) as process:
+            stdout, stderr = await process.communicate()
+        return process.returncode, stdout or b"", stderr or b""
+
+    @contextmanager
+    def partial(self, *paths: str) -> Iterator[None]:
+        """
+        登记正在写入的输出，块内出错或被取消时删除（路径可以带通配符）
+        :param paths: 文件或目录
+        :return:
+        """
+        for path in paths:
+            self.partials[path] = self.partials.get(path, 0) + 1
+        try:
+            yield
+        except BaseException:
+            for path in paths:
+                remove_path(path)
+                self.stats["cleaned"] += 1
+            raise
+        finally:
+            for path in paths:
+                self.partials[path] -= 1
+                if not self.partials[path]:
+                    del self.partials[path]
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """
+        驱动关闭时调用：等待正在进行的任务 timeout 秒，超时的取消，再清理残留的子进程与半成品
+        :param timeout:
+        :return:
+        """
+        self.closing = True
+        current = asyncio.current_task()
+        pending = {task for task in self.tasks if task is not current}
+        if pending:
+            logger.info(f"等待 {len(pending)} 个解析任务结束（最多 {timeout:.0f} 秒）")
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        if pending:
+            logger.warning(f"取消 {len(pending)} 个未完成的解析任务")
+            self.stats["cancelled"] += len(pending)
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=CANCEL_TIMEOUT)
+        # 取消后仍没有退出的任务，由这里兜底
+        for process in list(self.processes):
+            kill_process_group(process)
+        for path in list(self.partials):
+            remove_path(path)
+            self.stats["cleaned"] += 1
+        self.partials.clear()
+        if pending:
+            logger.warning(f"{len(pending)} 个任务在取消后仍未退出")
+
+
+SUPERVISOR = Supervisor()
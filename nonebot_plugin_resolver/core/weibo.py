@@ -1,3 +1,4 @@
+import re
 import math
 
 # 定义 base62 编码字符表
@@ -34,3 +35,89 @@ def mid2id(mid):
 
     result.reverse()  # 反转结果数组
     return "".join(result)  # 将结果数组连接成字符串
+
+
+PIC_VARIANTS = (
+    ("large", 0),
+    ("mw2000", 2000),
+    ("mw1024", 1024),
+    ("mw690", 690),
+    ("orj360", 360),
+)
+""" 新浪图床的尺寸：(路径里的尺寸名, 最大宽度)，0 为原图，从大到小排列 """
+
+SINAIMG_SIZE = re.compile(r"(sinaimg\.cn/)[^/]+/")
+""" 新浪图床链接里的尺寸段 """
+
+BYTES_PER_PIXEL = 0.35
+""" 估算 JPEG 体积用的每像素字节数 """
+
+PIC_BYTE_CAP = 4 * 1024 * 1024
+""" 单张图片估算体积的上限 """
+
+PICS_BYTE_BUDGET = 24 * 1024 * 1024
+""" 一条微博的图片合计的估算体积上限，图片多时每张改用较小的尺寸 """
+
+
+def _geo(info: dict) -> tuple[int, int]:
+    geo = info.get("geo") or info
+    try:
+        return int(geo.get("width") or 0), int(geo.get("height") or 0)
+    except (TypeError, ValueError):
+        return 0, 0
+
+
+def extract_pics(data: dict) -> list[dict]:
+    """
+    取出微博的全部图片
+    :param data: 手机版接口的 data（"pics"），或网页版接口的结果（"pic_ids" + "pic_infos"）
+    :return: [{"url": 原图链接, "width", "height"}]，尺寸未知时为 0
+    """
+    pics = []
+    if data.get("pic_infos"):
+        for pid in data.get("pic_ids") or data["pic_infos"]:
+            info = data["pic_infos"].get(pid) or {}
+            largest = info.get("largest") or info.get("original") or info.get("large")
+            if largest and largest.get("url"):
+                width, height = _geo(largest)
+                pics.append({"url": largest["url"], "width": width, "height": height})
+        return pics
+    for pic in data.get("pics") or []:
+        large = pic.get("large") or {}
+        width, height = _geo(large)
+        pics.append(
+            {"url": large.get("url") or pic["url"], "width": width, "height": height}
+        )
+    return pics
+
+
+def pic_variant(pic: dict, budget: float) -> str:
+    """
+    选取估算体积不超过 budget 字节的最大尺寸，都超过时用最小的
+    :param pic: extract_pics 的一项
+    :param budget: 这张图片能用的字节数
+    :return: 图片链接，不是新浪图床的链接原样返回
+    """
+    if not SINAIMG_SIZE.search(pic["url"]):
+        return pic["url"]
+    width, height = pic["width"], pic["height"]
+    # 尺寸未知时用中等尺寸，既不会太糊也不会太大
+    size = "mw1024"
+    if width and height:
+        for size, max_width in PIC_VARIANTS:
+            scale = min(1.0, max_width / width) if max_width else 1.0
+            if width * height * scale * scale * BYTES_PER_PIXEL <= budget:
+                break
+    return SINAIMG_SIZE.sub(rf"\g<1>{size}/", pic["url"], count=1)
+
+
+def pic_urls(pics: list[dict]) -> list[str]:
+    """按 PICS_BYTE_BUDGET 平分到每张图片，给每张图片选尺寸"""
+    budget = min(PIC_BYTE_CAP, PICS_BYTE_BUDGET / max(1, len(pics)))
+    return [pic_variant(pic, budget) for pic in pics]
+
+
+def html_to_text(html: str) -> str:
+    """去掉微博正文里的标签，换行标签换成换行"""
+    text = re.sub(r"<br\s*/?>", "\n", html or "")
+    return re.sub(r"<[^>]+>", "", text)
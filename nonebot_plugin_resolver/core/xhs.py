@@ -0,0 +1,149 @@
+import re
+import json
+
+import httpx
+
+STATE_MARKER = "window.__INITIAL_STATE__="
+SCRIPT_END = "</script>"
+
+# 字符串整体作为一个 token 跳过，其余只关心括号、冒号与裸的 undefined
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]:]')
+_UNDEFINED = re.compile(r'"(?:[^"\\]|\\.)*"|\bundefined\b')
+
+
+def find_initial_state(html: str) -> tuple[int, int] | None:
+    """
+    定位 __INITIAL_STATE__ 的 JSON 在页面中的起止位置（只做一次顺序的 index 扫描）
+    :param html: 页面内容
+    :return: (起始下标, 结束下标)，找不到时返回 None
+    """
+    start = html.find(STATE_MARKER)
+    if start < 0:
+        return None
+    start += len(STATE_MARKER)
+    end = html.find(SCRIPT_END, start)
+    if end < 0:
+        return None
+    return start, end
+
+
+def value_end(text: str, start: int, end: int | None = None) -> int:
+    """
+    返回从 start 开始的 JSON 对象/数组的结束位置（不解码，跳过字符串内容）
+    :param text:
+    :param start: 必须指向 `{` 或 `[`
+    :param end:
+    :return: 闭合括号之后的下标
+    """
+    depth = 0
+    for m in _TOKEN.finditer(text, start, len(text) if end is None else end):
+        c = m.group()
+        if c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError("unterminated JSON value")
+
+
+def object_member(text: str, start: int, key: str, end: int | None = None) -> int:
+    """
+    在从 start 开始的 JSON 对象中查找顶层成员 key，返回其值的起始下标
+    :param text:
+    :param start: 必须指向 `{`
+    :param key:
+    :param end:
+    :return: 值的起始下标，找不到时返回 -1
+    """
+    quoted = json.dumps(key)
+    depth = 0
+    pending = None
+    for m in _TOKEN.finditer(text, start, len(text) if end is None else end):
+        c = m.group()
+        if c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                return -1
+        elif c == ":":
+            if depth == 1 and pending == quoted:
+                pos = m.end()
+                while text[pos] in " \t\r\n":
+                    pos += 1
+                return pos
+        elif depth == 1:
+            pending = c
+            continue
+        pending = None
+    return -1
+
+
+def fix_undefined(fragment: str) -> str:
+    """只把 JS 的裸 undefined 替换为 null，字符串里的 'undefined' 保持原样"""
+    if "undefined" not in fragment:
+        return fragment
+    return _UNDEFINED.sub(
+        lambda m: "null" if m.group() == "undefined" else m.group(), fragment
+    )
+
+
+def decode_value(text: str, start: int):
+    """解码从 start 开始的单个 JSON 值（对象/数组/标量），只处理这一段子树"""
+    if text[start] in "{[":
+        return json.loads(fix_undefined(text[start : value_end(text, start)]))
+    if text.startswith("undefined", start):
+        return None
+    return json.JSONDecoder().raw_decode(text, start)[0]
+
+
+def extract_note(html: str, note_id: str) -> dict | None:
+    """
+    从小红书页面中只解码 note.noteDetailMap[note_id].note
+    :param html: 页面内容（可以只包含到 __INITIAL_STATE__ 脚本结束为止）
+    :param note_id:
+    :return: 笔记数据，页面中没有状态脚本时返回 None
+    """
+    bounds = find_initial_state(html)
+    if bounds is None:
+        return None
+    start, end = bounds
+    # 快路径：noteDetailMap 在页面里是唯一的键，直接定位后只扫描这张表
+    pos = html.find('"noteDetailMap":', start, end)
+    if pos >= 0:
+        pos = object_member(html, html.index("{", pos), note_id, end)
+        if pos >= 0 and html[pos] == "{":
+            pos = object_member(html, pos, "note", end)
+            if pos >= 0:
+                return decode_value(html, pos)
+    # 兜底：完整解码
+    state = json.loads(fix_undefined(html[start:end]))
+    return state["note"]["noteDetailMap"][note_id]["note"]
+
+
+async def fetch_initial_state_html(url: str, headers: dict, **kwargs) -> str:
+    """
+    流式读取小红书页面，读到 __INITIAL_STATE__ 脚本结束就停止下载
+    :param url:
+    :param headers:
+    :return: 截止到状态脚本结束的页面内容（找不到时为已读到的全部内容）
+    """
+    html = ""
+    # 只在新到达的部分（加上可能被切开的标记长度）里查找，避免重复扫描
+    marker_from = end_from = 0
+    state_at = -1
+    async with httpx.AsyncClient(headers=headers, **kwargs) as client:
+        async with client.stream("GET", url) as resp:
+            async for chunk in resp.aiter_text():
+                html += chunk
+                if state_at < 0:
+                    state_at = html.find(STATE_MARKER, marker_from)
+                    marker_from = max(len(html) - len(STATE_MARKER), 0)
+                    if state_at < 0:
+                        continue
+                    end_from = state_at
+                if html.find(SCRIPT_END, end_from) >= 0:
+                    return html
+                end_from = max(len(html) - len(SCRIPT_END), state_at)
+    return html
@@ -1,59 +1,76 @@
-import subprocess
+import os
+import shutil
+import asyncio
+import tempfile
+
 from nonebot import logger
 
+from .deadline import stage
+from .supervisor import SUPERVISOR
 
-def get_video_title(url: str, is_oversea: bool, my_proxy=None) -> str:
-    # 构建命令
+
+async def get_video_title(url: str, my_proxy=None) -> str | None:
+    # 构建命令，是否走代理由调用方按线路决定
     command = ["yt-dlp", "--get-title", url]
-    if not is_oversea and my_proxy:
+    if my_proxy:
         command += ["--proxy", my_proxy]
 
     # 执行命令并捕获输出
-    result = subprocess.run(
-        command, capture_output=True, text=True
-    )  # , encoding='utf-8'
+    async with stage("resolve"):
+        returncode, stdout, stderr = await SUPERVISOR.run(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
 
     # 检查是否有错误
-    if result.returncode != 0:
-        logger.error("Error:", result.stderr)
-        return "-"
+    if returncode != 0:
+        logger.error(f"Error: {stderr.decode(errors='ignore')}")
+        return None
 
     # 返回输出结果（视频标题）
-    if result.stdout is None:
-        return "-"
-    return result.stdout.strip()
+    return stdout.decode(errors="ignore").strip() or None
 
 
-async def download_ytb_video(
-    url, is_oversea, path, my_proxy=None, video_type="youtube"
-):
+async def download_ytb_video(url, path, my_proxy=None, video_type="youtube"):
+    # 每个任务一个独立目录，并行的下载互不覆盖，出错时也只清理自己的文件
+    workdir = tempfile.mkdtemp(prefix="ytdlp-", dir=path)
+    name = os.path.basename(workdir)
     # 构建命令
     command = []
     if video_type == "youtube":
         command = [
             "yt-dlp",
             "-P",
-            path,
+            workdir,
             "-o",
-            "temp.%(ext)s",
+            f"{name}.%(ext)s",
             "--merge-output-format",
             "mp4",
             url,
         ]
     elif video_type == "tiktok":
-        command = ["yt-dlp", "-P", path, "-o", "temp.%(ext)s", url]
+        command = ["yt-dlp", "-P", workdir, "-o", f"{name}.%(ext)s", url]
 
-    if not is_oversea and my_proxy:
+    if my_proxy:
         command.insert(1, "--proxy")
         command.insert(2, my_proxy)
 
-    # 执行命令
-    result = subprocess.run(command, capture_output=True, text=True)
-
-    # 检查是否有错误
-    if result.returncode != 0:
-        print("Error:", result.stderr)
+    # 执行命令，出错或被取消时删掉 yt-dlp 留下的分片与半成品
+    try:
+        with SUPERVISOR.partial(workdir):
+            async with stage("download", url):
+                returncode, _, stderr = await SUPERVISOR.run(
+                    *command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            if returncode != 0:
+                raise RuntimeError(stderr.decode(errors="ignore"))
+            # 成功下载，成品移出任务目录
+            output = os.path.join(path, f"{name}.mp4")
+            os.replace(os.path.join(workdir, f"{name}.mp4"), output)
+    except (RuntimeError, OSError) as e:
+        logger.error(f"Error: {e}")
         return None
-
-    # 成功下载
-    return path + "/" + "temp.mp4"
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return output
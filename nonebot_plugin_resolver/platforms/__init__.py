@@ -0,0 +1,97 @@
+"""
+平台注册表：启动时只注册各平台的匹配规则，某个平台第一次收到链接时才导入它的解析模块
+（以及 bilibili_api、execjs 等重量级依赖）。
+"""
+
+import asyncio
+import importlib
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import Bot, Event
+from nonebot.matcher import Matcher
+
+Handler = Callable[[Bot, Event, Matcher], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Platform:
+    name: str
+    pattern: str
+    """ on_regex 的匹配规则 """
+    target: str
+    """ 解析模块:处理函数，模块相对于本包 """
+
+
+PLATFORMS: dict[str, Platform] = {
+    p.name: p
+    for p in [
+        Platform(
+            "bilibili",
+            r"(.*)(bilibili.com|b23.tv|BV[0-9a-zA-Z]{10}|(aA)(vV)\d+)",
+            "bilibili:bilibili",
+        ),
+        Platform("douyin", r"(.*)(v.douyin.com)", "douyin:dy"),
+        Platform(
+            "tiktok",
+            r"(.*)(www.tiktok.com)|(vt.tiktok.com)|(vm.tiktok.com)",
+            "tiktok:tiktok",
+        ),
+        Platform("acfun", r"(.*)(acfun.cn)", "acfun:ac"),
+        Platform("twitter", r"(.*)(x.com)", "twitter:twitter"),
+        Platform(
+            "xiaohongshu",
+            r"(.*)(xhslink.com|xiaohongshu.com)",
+            "xiaohongshu:xiaohongshu",
+        ),
+        Platform("youtube", r"(.*)(youtube.com|youtu.be)", "youtube:youtube"),
+        Platform("netease", r"(.*)(music.163.com|163cn.tv)", "netease:netease"),
+        Platform("weibo", r"(.*)(weibo.com|m.weibo.cn)", "weibo:wb"),
+        Platform("kugou", r"(.*)(kugou.com)", "kugou:kugou"),
+    ]
+}
+
+_handlers: dict[str, Handler] = {}
+_locks: dict[str, asyncio.Lock] = {}
+
+
+def enabled_platforms(enabled: list[str], disabled: list[str]) -> list[Platform]:
+    """
+    按配置筛选要注册的平台
+    :param enabled: 启用的平台，为空表示全部
+    :param disabled: 禁用的平台
+    :return:
+    """
+    for name in set(enabled) | set(disabled):
+        if name not in PLATFORMS:
+            logger.warning(f"未知的解析平台：{name}，可选：{', '.join(PLATFORMS)}")
+    return [
+        p
+        for p in PLATFORMS.values()
+        if (not enabled or p.name in enabled) and p.name not in disabled
+    ]
+
+
+def import_handler(name: str) -> Handler:
+    """同步导入平台模块并返回处理函数"""
+    module_name, _, attr = PLATFORMS[name].target.partition(":")
+    module = importlib.import_module(f".{module_name}", __name__)
+    return getattr(module, attr)
+
+
+async def load_handler(name: str) -> Handler:
+    """
+    取得平台的处理函数，第一次调用时才导入模块
+    :param name: 平台名
+    :return:
+    """
+    handler = _handlers.get(name)
+    if handler is not None:
+        return handler
+    async with _locks.setdefault(name, asyncio.Lock()):
+        if name not in _handlers:
+            # 首次导入可能要数百毫秒（如 bilibili_api），放到线程里避免卡住事件循环
+            _handlers[name] = await asyncio.to_thread(import_handler, name)
+            logger.debug(f"已加载解析平台：{name}")
+    return _handlers[name]
@@ -0,0 +1,47 @@
+import re
+
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import Message, Event, Bot
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core.constants import VIDEO_MAX_MB
+from ..core.acfun import parse_ac_url, download_m3u8_video
+from ..core.supervisor import SUPERVISOR
+from ..utils import OFFLOADER, MEDIA_CACHE, auto_video_send, send_video_entry
+
+
+async def ac(bot: Bot, event: Event, matcher: Matcher) -> None:
+    """acfun解析
+    :param event:
+    :param matcher:
+    :return:
+    """
+    message: str = str(event.get_message()).strip()
+    if "m.acfun.cn" in message:
+        message = f"https://www.acfun.cn/v/ac{re.search(r'ac=([^&?]*)', message)[1]}"
+
+    url_m3u8, video_name, video_info = await parse_ac_url(
+        message, max_bytes=VIDEO_MAX_MB * 1024 * 1024, offloader=OFFLOADER
+    )
+    source = f"acfun:{message}"
+    cached = MEDIA_CACHE.lookup(source) if GLOBAL_CONFIG.download_video else None
+    # 选好清晰度后立即开始边解析边下载分片，与发送标题并行
+    download = (
+        SUPERVISOR.spawn(download_m3u8_video(url_m3u8))
+        if GLOBAL_CONFIG.download_video and cached is None
+        else None
+    )
+    try:
+        await matcher.send(Message(f"{GLOBAL_NICKNAME}识别：猴山，{video_name}"))
+    except BaseException:
+        if download is not None:
+            download.cancel()
+        raise
+    logger.opt(colors=True).info(video_info)
+
+    if cached is not None:
+        MEDIA_CACHE.record_saved(cached.size)
+        await send_video_entry(bot, event, cached)
+    elif download:
+        await auto_video_send(bot, event, await download, source)
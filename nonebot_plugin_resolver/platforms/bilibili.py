@@ -0,0 +1,520 @@
+import os
+import re
+import asyncio
+from contextlib import aclosing, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+from bilibili_api import video, Credential, live, article, dynamic, opus
+from bilibili_api.exceptions import ArgsException, ResponseCodeException
+from bilibili_api.favorite_list import get_video_favorite_list_content
+from bilibili_api.video import VideoDownloadURLDataDetecter
+from nonebot import logger, get_driver
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core import remove_files
+from ..core.constants import BILIBILI_HEADER
+from ..core.article import ArticleRenderer
+from ..core.bili_session import BiliSession
+from ..core.bili23 import (
+    download_b_file,
+    merge_file_to_mp4,
+    stream_merge_supported,
+    stream_merge_to_mp4,
+    extra_bili_info,
+    extra_opus_content,
+    extra_dynamic_content,
+    bili_thumbnail,
+)
+from ..core.cache import TTLCache
+from ..core.gallery import download_gallery, prune_directories
+from ..core.shortlink import expand_short_url
+from ..core.media_cache import new_hasher, combine_digests
+from ..core.progress import DownloadProgress
+from ..core.supervisor import SUPERVISOR
+from ..utils import (
+    GOVERNOR,
+    MEDIA_CACHE,
+    make_node_segment,
+    send_forward_both,
+    send_shared_video,
+)
+
+STREAM_MERGE = GLOBAL_CONFIG.resolver_stream_merge and stream_merge_supported()
+""" 是否边下载边合并音视频 """
+
+BILI_NOT_LOGGED_IN = -101
+""" SESSDATA 失效时接口返回的错误码 """
+BILI_CREDENTIALS: dict[str, Credential] = {}
+""" SESSDATA -> 凭据，池里的每个 SESSDATA 只创建一次 """
+
+
+def credential_of(sessdata: str) -> Credential:
+    """SESSDATA 对应的凭据，每个 SESSDATA 只创建一次"""
+    if sessdata not in BILI_CREDENTIALS:
+        BILI_CREDENTIALS[sessdata] = Credential(sessdata=sessdata)
+    return BILI_CREDENTIALS[sessdata]
+
+
+async def bili_credential() -> Credential | None:
+    """限速后从 cookie 池取一个 SESSDATA 对应的凭据，未配置时为 None"""
+    sessdata = await GOVERNOR.cookie("bilibili")
+    return None if sessdata is None else credential_of(sessdata)
+
+
+BILI_SESSION = BiliSession(GOVERNOR.pools.get("bilibili"), credential_of)
+""" 由插件启动时的钩子启动（resolver_bili_prewarm），未启动时各请求照旧各自建立连接 """
+get_driver().on_shutdown(BILI_SESSION.stop)
+
+
+ARTICLE_RENDERER = ArticleRenderer(
+    os.path.join(MEDIA_CACHE.root, "articles"),
+    GLOBAL_CONFIG.resolver_render_concurrency,
+)
+
+OPUS_CACHE = TTLCache(maxsize=256, ttl=24 * 3600)
+""" 动态 id -> 解析结果，(动态 id, "paths") -> 下载好的图片路径，同一条动态再次分享时不再请求接口、不再下载图片 """
+OPUS_DIR = os.path.join(MEDIA_CACHE.root, "opus")
+OPUS_KEEP = 64
+""" 本地最多保留多少条动态的图片 """
+
+
+async def fetch_dynamic(dynamic_id: str, credential: Credential | None) -> dict:
+    """
+    获取动态内容，图文动态走 opus 接口（正文完整），其余类型的动态走动态详情接口
+    :param dynamic_id:
+    :param credential:
+    :return: {"author", "text", "images", "bvid", "cv_id"}
+    """
+    try:
+        info = await opus.Opus(int(dynamic_id), credential).get_info()
+    except ArgsException:
+        # 视频投稿、转发等不是图文的动态，opus 接口会返回 fallback
+        info = await dynamic.Dynamic(int(dynamic_id), credential).get_info()
+        return extra_dynamic_content(info)
+    return {"bvid": "", **extra_opus_content(info)}
+
+
+async def download_dynamic_images(
+    dynamic_id: str, images: list[str]
+) -> tuple[str, ...]:
+    """
+    把动态的图片下载到本地，已经下载过的不再下载
+    :param dynamic_id:
+    :param images: 图片链接
+    :return: 下载成功的本地路径
+    """
+    paths = await download_gallery(
+        images, os.path.join(OPUS_DIR, dynamic_id), headers=BILIBILI_HEADER
+    )
+    prune_directories(OPUS_DIR, OPUS_KEEP)
+    return tuple(path for path in paths if path)
+
+
+async def get_dynamic(dynamic_id: str, credential: Credential | None) -> dict:
+    """
+    取得动态内容并把图片下载到本地（"paths"），结果按动态 id 缓存，
+    并发的相同请求只查询、下载一次；返回的是新的字典，不会改动缓存里的内容
+    :param dynamic_id:
+    :param credential:
+    :return:
+    """
+    content = await OPUS_CACHE.get_or_load(
+        dynamic_id, lambda: fetch_dynamic(dynamic_id, credential)
+    )
+    if content["bvid"] or content["cv_id"]:
+        return content
+    key = (dynamic_id, "paths")
+    paths = OPUS_CACHE.get(key)
+    if (
+        paths is None
+        or len(paths) < len(content["images"])
+        or not all(map(os.path.exists, paths))
+    ):
+        # 第一次解析、上次有图片下载失败或本地图片已被清理，只补下缺少的
+        OPUS_CACHE.pop(key)
+        paths = await OPUS_CACHE.get_or_load(
+            key, lambda: download_dynamic_images(dynamic_id, content["images"])
+        )
+    return {**content, "paths": list(paths)}
+
+
+LIVE_CACHE = TTLCache(maxsize=256, ttl=60)
+""" 直播间号 -> 直播间信息与封面、关键帧的本地路径，热门直播间会被反复分享，短暂缓存 """
+LIVE_DIR = os.path.join(MEDIA_CACHE.root, "live")
+LIVE_KEEP = 64
+""" 本地最多保留多少个直播间的图片 """
+LIVE_SENDING: dict[str, int] = {}
+""" 正在发送的直播间图片路径 -> 正在发送它的消息数，旧关键帧等发送完再删除 """
+
+
+@contextmanager
+def sending_live_images(paths: list[str | None]) -> Iterator[None]:
+    """登记正在发送的直播间图片，块内不会被刷新直播间时的清理删除"""
+    paths = [path for path in paths if path]
+    for path in paths:
+        LIVE_SENDING[path] = LIVE_SENDING.get(path, 0) + 1
+    try:
+        yield
+    finally:
+        for path in paths:
+            LIVE_SENDING[path] -= 1
+            if not LIVE_SENDING[path]:
+                del LIVE_SENDING[path]
+
+
+async def fetch_live_room(room_id: int, credential: Credential | None) -> dict:
+    """
+    获取直播间信息并下载封面与关键帧，同一直播间只保留最新的一组图片
+    :param room_id: 直播间号（短号也可以）
+    :param credential:
+    :return: {"title", "images", "paths"}，paths 与 images 一一对应，下载失败的为 None
+    """
+    room = live.LiveRoom(room_display_id=room_id, credential=credential)
+    room_info = (await room.get_room_info())["room_info"]
+    images = [url for url in (room_info["cover"], room_info["keyframe"]) if url]
+    directory = os.path.join(LIVE_DIR, str(room_id))
+    paths = await download_gallery(images, directory, headers=BILIBILI_HEADER)
+    # 关键帧会随直播更新，清掉上一个缓存窗口留下的旧图；还在发送的留到下次刷新时再删
+    for entry in os.scandir(directory):
+        if entry.path not in paths and entry.path not in LIVE_SENDING:
+            os.remove(entry.path)
+    prune_directories(LIVE_DIR, LIVE_KEEP)
+    return {"title": room_info["title"], "images": images, "paths": paths}
+
+
+async def get_live_room(room_id: int, credential: Credential | None) -> dict:
+    """取得直播间信息与本地图片，结果按直播间号缓存，并发的相同请求只查询一次"""
+    room = await LIVE_CACHE.get_or_load(
+        room_id, lambda: fetch_live_room(room_id, credential)
+    )
+    if all(map(os.path.exists, filter(None, room["paths"]))):
+        return room
+    # 本地图片已被清理
+    LIVE_CACHE.pop(room_id)
+    return await LIVE_CACHE.get_or_load(
+        room_id, lambda: fetch_live_room(room_id, credential)
+    )
+
+
+FAVLIST_CACHE = TTLCache(maxsize=256, ttl=300)
+""" (收藏夹 id, 页码) -> 该页内容，收藏夹会变动，只短暂缓存 """
+FAVLIST_DIR = os.path.join(MEDIA_CACHE.root, "favlist")
+FAVLIST_PAGE_SIZE = 20
+""" 收藏夹接口每页固定 20 条 """
+FAVLIST_CONCURRENCY = 4
+""" 同时请求的分页数 """
+FAVLIST_KEEP = 32
+""" 本地最多保留多少个收藏夹的封面 """
+
+
+async def fetch_favlist_page(
+    fav_id: int, page: int, credential: Credential | None
+) -> dict:
+    return await FAVLIST_CACHE.get_or_load(
+        (fav_id, page),
+        lambda: get_video_favorite_list_content(fav_id, page, credential=credential),
+    )
+
+
+async def favlist_pages(
+    fav_id: int, limit: int, credential: Credential | None
+) -> AsyncIterator[list[dict]]:
+    """
+    按页码顺序逐页产出收藏夹里的视频，第一页之后的分页并发获取，每页的封面缩略图并行下载到本地
+    :param fav_id: 收藏夹 id
+    :param limit: 最多产出的视频数
+    :param credential:
+    :return: 每页的视频列表，视频的 "cover_path" 为本地封面（下载失败时为 None）
+    """
+    first = await fetch_favlist_page(fav_id, 1, credential)
+    limit = min(limit, first["info"]["media_count"])
+    semaphore = asyncio.Semaphore(FAVLIST_CONCURRENCY)
+    directory = os.path.join(FAVLIST_DIR, str(fav_id))
+
+    async def load(page: int) -> list[dict]:
+        if page == 1:
+            content = first
+        else:
+            async with semaphore:
+                content = await fetch_favlist_page(fav_id, page, credential)
+        medias = (content["medias"] or [])[: limit - (page - 1) * FAVLIST_PAGE_SIZE]
+        covers = await download_gallery(
+            [bili_thumbnail(media["cover"], 320, 200) for media in medias],
+            directory,
+            headers=BILIBILI_HEADER,
+        )
+        return [{**media, "cover_path": cover} for media, cover in zip(medias, covers)]
+
+    tasks = [
+        SUPERVISOR.spawn(load(page))
+        for page in range(1, -(-limit // FAVLIST_PAGE_SIZE) + 1)
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        prune_directories(FAVLIST_DIR, FAVLIST_KEEP)
+
+
+async def bilibili(bot: Bot, event: Event, matcher: Matcher) -> None:
+    """哔哩哔哩解析
+    :param bot:
+    :param event:
+    :param matcher:
+    :return:
+    """
+    url: str = str(event.get_message()).strip()
+
+    url_reg = (
+        r"(http:|https:)\/\/(space|www|live|t|m).bilibili.com\/[A-Za-z\d._?%&+\-=\/#]*"
+    )
+    b_short_rex = r"(http:|https:)\/\/b23.tv\/[A-Za-z\d._?%&+\-=\/#]*"
+
+    # BV处理
+    if re.match(r"(^BV[1-9a-zA-Z]{10}$)|(^(aA)(vV)\d+$)", url):
+        url = "https://www.bilibili.com/video/" + url
+
+    if "b23.tv" in url or ("b23.tv" and "QQ小程序" in url):
+        b_short_url = re.search(b_short_rex, url.replace("\\", ""))[0]
+        url: str = await expand_short_url(b_short_url, BILIBILI_HEADER)
+    else:
+        url: str = re.search(url_reg, url).group(0)
+
+    credential = await bili_credential()
+
+    # 动态 / 图文，视频投稿和专栏发布的动态交给下面的视频、专栏解析
+    if dynamic_id := re.search(r"(?:t\.bilibili\.com|/opus)/(\d+)", url):
+        content = await get_dynamic(dynamic_id[1], credential)
+        if content["bvid"]:
+            url = f"https://www.bilibili.com/video/{content['bvid']}"
+        elif content["cv_id"]:
+            url = f"https://www.bilibili.com/read/cv{content['cv_id']}"
+        else:
+            await matcher.send(
+                f"{GLOBAL_NICKNAME}识别：哔哩哔哩动态，{content['author']}"
+            )
+            nodes = [content["text"]] if content["text"] else []
+            nodes += [MessageSegment.image(Path(path)) for path in content["paths"]]
+            if nodes:
+                await send_forward_both(
+                    bot, event, make_node_segment(bot.self_id, nodes)
+                )
+            await matcher.finish()
+
+    # 直播间
+    if "live" in url:
+        room_id = int(re.search(r"\/(\d+)$", url).group(1))
+        room = await get_live_room(room_id, credential)
+        with sending_live_images(room["paths"]):
+            await matcher.finish(
+                Message(
+                    [
+                        *(
+                            MessageSegment.image(Path(path) if path else image)
+                            for image, path in zip(room["images"], room["paths"])
+                        ),
+                        MessageSegment.text(
+                            f"{GLOBAL_NICKNAME}识别：哔哩哔哩直播，{room['title']}"
+                        ),
+                    ]
+                )
+            )
+
+    # 专栏识别
+    if "read" in url:
+        cv_id = re.search(r"read\/cv(\d+)", url).group(1)
+        ar = article.Article(cv_id)
+        if ar.is_note():
+            ar = ar.turn_to_note()
+
+        await ar.fetch_content()
+        async with aclosing(ARTICLE_RENDERER.render(cv_id, ar.markdown())) as pages:
+            # 第一页渲染好就先发出去，其余页合并成一条转发消息
+            await matcher.send(
+                Message(
+                    [
+                        f"{GLOBAL_NICKNAME}识别：哔哩哔哩专栏",
+                        MessageSegment.image(await anext(pages)),
+                    ]
+                )
+            )
+            rest = [MessageSegment.image(page) async for page in pages]
+        if rest:
+            await send_forward_both(bot, event, make_node_segment(bot.self_id, rest))
+        await matcher.finish()
+
+    # 收藏夹识别
+    if "favlist" in url:
+        # https://space.bilibili.com/22990202/favlist?fid=2344812202
+        fav_id = int(re.search(r"favlist\?fid=(\d+)", url).group(1))
+        await matcher.send(
+            f"{GLOBAL_NICKNAME}识别：哔哩哔哩收藏夹，正在为你找出相关链接请稍等..."
+        )
+        # 每取到一页就发一条转发消息，不必等整个收藏夹拉取完
+        async with aclosing(
+            favlist_pages(fav_id, GLOBAL_CONFIG.resolver_favlist_max, credential)
+        ) as pages:
+            async for medias in pages:
+                await send_forward_both(
+                    bot,
+                    event,
+                    make_node_segment(
+                        bot.self_id,
+                        [
+                            (
+                                [MessageSegment.image(Path(media["cover_path"]))]
+                                if media["cover_path"]
+                                else []
+                            )
+                            + [
+                                MessageSegment.text(
+                                    f"🧉 标题：{media['title']}\n📝 简介：{media['intro']}\n"
+                                    f"🔗 链接：https://www.bilibili.com/video/{media['bvid']}"
+                                )
+                            ]
+                            for media in medias
+                        ],
+                    ),
+                )
+        await matcher.finish()
+
+    video_id = re.search(r"video\/[^\?\/ ]+", url)[0].split("/")[1]
+    if video_id[:2].lower() == "bv":
+        v = video.Video(video_id, credential=credential)
+    else:
+        v = video.Video(aid=int(video_id[2:]), credential=credential)
+
+    video_info = await v.get_info()
+    if not video_info:
+        return await matcher.send(f"{GLOBAL_NICKNAME}识别：B站，出错，无法获取数据！")
+
+    video_title, video_cover, video_desc, video_duration = (
+        video_info["title"],
+        video_info["pic"],
+        video_info["desc"],
+        video_info["duration"],
+    )
+
+    page_num = 0
+    if "pages" in video_info:
+        parsed_url = urlparse(url)
+        page_num = (
+            (int(parse_qs(parsed_url.query).get("p", [1])[0]) - 1)
+            if parsed_url.query
+            else 0
+        )
+        video_duration = (
+            video_info["pages"][page_num].get("duration", video_info.get("duration"))
+            if "duration" in video_info["pages"][page_num]
+            else video_info.get("duration", 0)
+        )
+
+    summary = ""
+    if credential:
+        try:
+            ai_conclusion = await v.get_ai_conclusion(await v.get_cid(0))
+        except ResponseCodeException as e:
+            if e.code != BILI_NOT_LOGGED_IN:
+                raise
+            # SESSDATA 失效，隔离后这次跳过总结
+            GOVERNOR.quarantine("bilibili", credential.sessdata, f"{e.code} {e.msg}")
+            ai_conclusion = {"model_result": {"summary": ""}}
+        if ai_conclusion["model_result"]["summary"] != "":
+            summary = make_node_segment(
+                bot.self_id,
+                ["bilibili ", ai_conclusion["model_result"]["summary"]],
+            )
+
+    online = await v.get_online()
+    online_str = (
+        f"🏄‍♂️ 总共 {online['total']} 人在观看，{online['count']} 人在网页端观看"
+        + (
+            f"\n🔗 链接：https://www.bilibili.com/video/av{video_info['aid']}"
+            if "aid" in video_info
+            else ""
+        )
+    )
+
+    await matcher.send(
+        Message(
+            [
+                MessageSegment.image(video_cover),
+                MessageSegment.text(
+                    f"\n{GLOBAL_NICKNAME}识别：B站，{video_title}\n{extra_bili_info(video_info)}\n📝 简介：{video_desc}\n{online_str}"
+                    + (("\n🤖 AI总结：" + summary) if summary else "")
+                ),
+            ]
+        )
+    )
+    if (
+        video_duration > GLOBAL_CONFIG.video_duration_maximum
+        or not GLOBAL_CONFIG.download_video
+    ):
+        return
+
+    logger.info(page_num)
+    source = f"bilibili:{video_id}:p{page_num}"
+
+    async def produce() -> tuple[str, str]:
+        download_url_data = await v.get_download_url(page_index=page_num)
+        detecter = VideoDownloadURLDataDetecter(download_url_data)
+        streams = detecter.detect_best_streams()
+        video_url, audio_url = streams[0].url, streams[1].url
+        path = os.getcwd() + "/" + video_id
+        if STREAM_MERGE:
+            video_hasher, audio_hasher = new_hasher(), new_hasher()
+            try:
+                with DownloadProgress(f"B站视频 {video_id}") as progress:
+                    await stream_merge_to_mp4(
+                        video_url,
+                        audio_url,
+                        f"{path}-res.mp4",
+                        video_hasher,
+                        audio_hasher,
+                        progress,
+                        BILI_SESSION.client,
+                    )
+                return f"{path}-res.mp4", combine_digests(
+                    video_hasher.hexdigest(), audio_hasher.hexdigest()
+                )
+            except (httpx.HTTPError, OSError, RuntimeError) as e:
+                logger.warning(f"边下载边合并失败，改为先下载再合并：{e}")
+        video_hasher, audio_hasher = new_hasher(), new_hasher()
+        try:
+            with DownloadProgress(f"B站视频 {video_id}") as progress:
+                await asyncio.gather(
+                    download_b_file(
+                        video_url,
+                        f"{path}-video.m4s",
+                        progress,
+                        video_hasher,
+                        BILI_SESSION.client,
+                    ),
+                    download_b_file(
+                        audio_url,
+                        f"{path}-audio.m4s",
+                        progress,
+                        audio_hasher,
+                        BILI_SESSION.client,
+                    ),
+                )
+            await merge_file_to_mp4(
+                f"{video_id}-video.m4s", f"{video_id}-audio.m4s", f"{path}-res.mp4"
+            )
+        finally:
+            remove_res = remove_files(
+                [f"{video_id}-video.m4s", f"{video_id}-audio.m4s"]
+            )
+            logger.info(remove_res)
+        return f"{path}-res.mp4", combine_digests(
+            video_hasher.hexdigest(), audio_hasher.hexdigest()
+        )
+
+    await send_shared_video(bot, event, source, produce)
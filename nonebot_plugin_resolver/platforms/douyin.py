@@ -0,0 +1,163 @@
+import os
+import re
+from pathlib import Path
+
+import aiohttp
+
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core.constants import (
+    COMMON_HEADER,
+    DY_URL_TYPE_CODE_DICT,
+    DOUYIN_VIDEO,
+    DY_TOUTIAO_INFO,
+)
+from ..core import download_video
+from ..core.breaker import get_breaker
+from ..core.cache import TTLCache
+from ..core.douyin import extract_aweme
+from ..core.gallery import download_gallery, prune_directories
+from ..core.media_cache import new_hasher
+from ..core.tiktok import generate_x_bogus_url
+from ..core.shortlink import expand_short_url
+from ..core.supervisor import SUPERVISOR
+from ..utils import (
+    GOVERNOR,
+    OFFLOADER,
+    MEDIA_CACHE,
+    make_node_segment,
+    send_forward_both,
+    fetch_shared_video,
+    send_fetched_video,
+)
+
+IMAGE_HEADERS = {"referer": "https://www.douyin.com/"} | COMMON_HEADER
+""" 图片 CDN 会校验 referer """
+IMAGE_CACHE = TTLCache(maxsize=256, ttl=24 * 3600)
+""" 作品 id -> 本地图片路径，图片链接带签名、每次请求都不同，只能按作品 id 缓存 """
+IMAGE_DIR = os.path.join(MEDIA_CACHE.root, "douyin")
+IMAGE_KEEP = 64
+""" 本地最多保留多少个作品的图片 """
+
+
+async def fetch_images(aweme_id: str, urls: list[str]) -> list[str | None]:
+    """
+    并发下载图文作品的图片，全部下载成功时按作品 id 缓存
+    :param aweme_id:
+    :param urls:
+    :return: 与 urls 一一对应的本地路径，下载失败的为 None
+    """
+    paths = IMAGE_CACHE.get(aweme_id)
+    if paths and len(paths) == len(urls) and all(map(os.path.exists, paths)):
+        return paths
+    paths = await download_gallery(
+        urls, os.path.join(IMAGE_DIR, aweme_id), headers=IMAGE_HEADERS
+    )
+    prune_directories(IMAGE_DIR, IMAGE_KEEP)
+    if all(paths):
+        IMAGE_CACHE.set(aweme_id, paths)
+    return paths
+
+
+async def prefetch_video(url: str) -> tuple[str | None, str]:
+    """下载视频，返回 (本地路径，下载失败时为 None, 内容哈希)"""
+    hasher = new_hasher()
+    return await download_video(url, hasher=hasher), hasher.hexdigest()
+
+
+async def fetch_aweme(dou_id: str, douyin_ck: str) -> dict | None:
+    """
+    请求作品详情
+    :param dou_id: 作品 id
+    :param douyin_ck:
+    :return: extract_aweme 的结果，响应为空时为 None
+    """
+    # API、一些后续要用到的参数
+    headers = {
+        "Accept-Language": "zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2",
+        "referer": f"https://www.douyin.com/video/{dou_id}",
+        "cookie": douyin_ck,
+    } | COMMON_HEADER
+    api_url = DOUYIN_VIDEO.format(dou_id)
+    api_url = generate_x_bogus_url(api_url, headers)  # 如果请求失败直接返回
+    async with get_breaker("douyin").guard():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(api_url, headers=headers, timeout=10) as response:
+                payload = await response.read()
+        return await OFFLOADER.run(extract_aweme, payload, size=len(payload))
+
+
+async def dy(bot: Bot, event: Event, matcher: Matcher) -> None:
+    """抖音解析
+    :param bot:
+    :param event:
+    :param matcher:
+    :return:
+    """
+    # 消息
+    msg: str = str(event.get_message()).strip()
+    logger.info(msg)
+    # 正则匹配
+    reg = r"(http:|https:)\/\/v.douyin.com\/[A-Za-z\d._?%&+\-=#]*"
+    dou_url = re.search(reg, msg, re.I)[0]
+    dou_url_2 = await expand_short_url(dou_url, max_hops=1)
+    # logger.error(dou_url_2)
+    reg2 = r".*(video|note)\/(\d+)\/(.*?)"
+    # 获取到ID
+    dou_id = re.search(reg2, dou_url_2, re.I)[2]
+    # logger.info(dou_id)
+    # 从 cookie 池取 ck，遇到失效的 ck 隔离后换下一个重试
+    detail = None
+    for _ in range(GOVERNOR.attempts("douyin")):
+        douyin_ck = await GOVERNOR.cookie("douyin")
+        # 如果没有设置dy的ck就结束，因为获取不到
+        if douyin_ck is None:
+            logger.error(GLOBAL_CONFIG)
+            await matcher.send(
+                Message(f"{GLOBAL_NICKNAME}识别：抖音，无法获取到管理员设置的抖音ck！")
+            )
+            return
+        detail = await fetch_aweme(dou_id, douyin_ck)
+        if detail is not None:
+            break
+        # ck 失效时接口返回空响应
+        GOVERNOR.quarantine("douyin", douyin_ck, "作品详情接口返回空响应")
+    if detail is None:
+        await matcher.send(Message(f"{GLOBAL_NICKNAME}识别：抖音，解析失败！"))
+        return
+    # 判断是图片还是视频
+    url_type_code = detail["aweme_type"]
+    url_type = DY_URL_TYPE_CODE_DICT.get(url_type_code, "video")
+    # 拿到作品详情后立即开始下载视频 / 图片，与发送文字并行；
+    # 视频经共享任务下载，缓存命中与多个实例之间的去重都由 fetch_shared_video 处理
+    source = f"douyin:{dou_id}"
+    prefetch = None
+    if url_type == "video":
+        # 识别播放地址
+        player_real_addr = DY_TOUTIAO_INFO.format(detail["play_uri"])
+        prefetch = SUPERVISOR.spawn(
+            fetch_shared_video(source, lambda: prefetch_video(player_real_addr))
+        )
+    elif url_type == "image":
+        prefetch = SUPERVISOR.spawn(fetch_images(dou_id, detail["images"]))
+    try:
+        await matcher.send(
+            Message(f"{GLOBAL_NICKNAME}识别：抖音，{detail.get('desc')}")
+        )
+    except BaseException:
+        if prefetch is not None:
+            prefetch.cancel()
+        raise
+    # 根据类型进行发送
+    if url_type == "video":
+        await send_fetched_video(bot, event, source, await prefetch)
+    elif url_type == "image":
+        # 无水印图片列表，下载失败的图片退回原链接让协议端自己拉取
+        images = [
+            MessageSegment.image(Path(path) if path else url)
+            for path, url in zip(await prefetch, detail["images"])
+        ]
+        await send_forward_both(bot, event, make_node_segment(bot.self_id, images))
@@ -0,0 +1,99 @@
+import re
+import json
+import httpx
+
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core import download_as_wav
+from ..core.constants import COMMON_HEADER, KUGOU_TEMP_API
+from ..core.hedge import hedged_request
+from ..core.supervisor import SUPERVISOR
+
+
+async def kugou(bot: Bot, event: Event, matcher: Matcher):
+    message = str(event.get_message())
+    # logger.info(message)
+    reg1 = r"https?://.*?kugou\.com.*?(?=\s|$|\n)"
+    reg2 = r'jumpUrl":\s*"(https?:\\/\\/[^"]+)"'
+    reg3 = r'jumpUrl":\s*"(https?://[^"]+)"'
+    # 处理卡片问题
+    if "com.tencent.structmsg" in message:
+        match = re.search(reg2, message)
+        if match:
+            get_url = match.group(1)
+        else:
+            match = re.search(reg3, message)
+            if match:
+                get_url = match.group(1)
+            else:
+                await matcher.send(
+                    Message(f"{GLOBAL_NICKNAME}\n来源：【酷狗音乐】\n获取链接失败")
+                )
+                get_url = None
+                return
+        if get_url:
+            url = json.loads('"' + get_url + '"')
+    else:
+        match = re.search(reg1, message)
+        url = match.group()
+
+    # 分享页只有这一个地址，直接请求；对冲只用于可互换的解析接口
+    async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
+        response = await client.get(url)
+    if response.status_code == 200:
+        title = response.text
+        get_name = r"<title>(.*?)_高音质在线试听"
+        name = re.search(get_name, title)
+        if name:
+            kugou_title = name.group(1)  # 只输出歌曲名和歌手名的部分
+
+            async def vip_data(api: str) -> dict:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    resp = await client.get(
+                        api.replace("{}", kugou_title), headers=COMMON_HEADER
+                    )
+                    resp.raise_for_status()
+                    data = resp.json()
+                if not data.get("music_url"):
+                    raise ValueError(f"接口没有返回音频链接：{data}")
+                return data
+
+            kugou_vip_data = await hedged_request(
+                "kugou_temp",
+                GLOBAL_CONFIG.resolver_kugou_temp_apis or [KUGOU_TEMP_API],
+                vip_data,
+            )
+
+            kugou_url = kugou_vip_data.get("music_url")
+            kugou_cover = kugou_vip_data.get("cover")
+            kugou_name = kugou_vip_data.get("title")
+            kugou_singer = kugou_vip_data.get("singer")
+            # 下载、转码音频与发送封面互不依赖，同时进行
+            record = SUPERVISOR.spawn(download_as_wav(kugou_url))
+            try:
+                await matcher.send(
+                    Message(
+                        [
+                            MessageSegment.image(kugou_cover),
+                            MessageSegment.text(
+                                f"{GLOBAL_NICKNAME}\n来源：【酷狗音乐】\n歌曲：{kugou_name}-{kugou_singer}"
+                            ),
+                        ]
+                    )
+                )
+            except BaseException:
+                record.cancel()
+                raise
+            await matcher.send(Message(MessageSegment.record(await record)))
+        else:
+            await matcher.send(
+                Message(
+                    f"{GLOBAL_NICKNAME}\n来源：【酷狗音乐】\n不支持当前外链，请重新分享再试"
+                )
+            )
+    else:
+        await matcher.send(
+            Message(f"{GLOBAL_NICKNAME}\n来源：【酷狗音乐】\n获取链接失败")
+        )
@@ -0,0 +1,78 @@
+import re
+import httpx
+
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core import download_as_wav
+from ..core.constants import COMMON_HEADER, NETEASE_API_CN, NETEASE_TEMP_API
+from ..core.hedge import hedged_request
+from ..core.shortlink import expand_short_url
+from ..core.supervisor import SUPERVISOR
+
+
+async def netease(bot: Bot, event: Event, matcher: Matcher):
+    message = str(event.get_message())
+
+    # 识别短链接
+    if "163cn.tv" in message:
+        message = re.search(
+            r"(http:|https:)\/\/163cn\.tv\/([a-zA-Z0-9]+)", message
+        ).group(0)
+        message = await expand_short_url(message)
+
+    ncm_id = re.search(r"id=(\d+)", message).group(1)
+    if ncm_id is None:
+        await matcher.finish(Message(f"❌ {GLOBAL_NICKNAME}识别：网易云，获取链接失败"))
+
+    async def song_detail(api: str) -> dict:
+        async with httpx.AsyncClient(timeout=10) as client:
+            resp = await client.get(
+                f"{api}/song/detail?ids={ncm_id}", headers=COMMON_HEADER
+            )
+            resp.raise_for_status()
+            return resp.json()["songs"][0]
+
+    ncm_song = await hedged_request(
+        "netease_api",
+        GLOBAL_CONFIG.resolver_netease_apis or [NETEASE_API_CN],
+        song_detail,
+    )
+    ncm_title = f"{ncm_song['name']}-{ncm_song['ar'][0]['name']}".replace(
+        r'[\/\?<>\\:\*\|".… ]', ""
+    )
+
+    async def vip_data(api: str) -> dict:
+        async with httpx.AsyncClient(timeout=10) as client:
+            resp = await client.get(api.format(ncm_title), headers=COMMON_HEADER)
+            resp.raise_for_status()
+            data = resp.json()
+        if not data.get("mp3"):
+            raise ValueError(f"接口没有返回音频链接：{data}")
+        return data
+
+    ncm_vip_data = await hedged_request(
+        "netease_temp",
+        GLOBAL_CONFIG.resolver_netease_temp_apis or [NETEASE_TEMP_API],
+        vip_data,
+    )
+    ncm_url = ncm_vip_data["mp3"]
+    ncm_cover = ncm_vip_data["img"]
+    # 下载、转码音频与发送封面互不依赖，同时进行
+    record = SUPERVISOR.spawn(download_as_wav(ncm_url))
+    try:
+        await matcher.send(
+            Message(
+                [
+                    MessageSegment.image(ncm_cover),
+                    MessageSegment.text(
+                        f"{GLOBAL_NICKNAME}识别：网易云音乐，{ncm_title}"
+                    ),
+                ]
+            )
+        )
+    except BaseException:
+        record.cancel()
+        raise
+    await matcher.send(Message(MessageSegment.record(await record)))
@@ -0,0 +1,63 @@
+import os
+import re
+from functools import partial
+
+from nonebot.adapters.onebot.v11 import Message, Event, Bot
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_NICKNAME
+from ..core.ytdlp import get_video_title, download_ytb_video
+from ..core.shortlink import expand_short_url
+from ..utils import ROUTER, send_shared_video
+
+
+async def tiktok(bot: Bot, event: Event, matcher: Matcher) -> None:
+    """tiktok解析
+    :param event:
+    :param matcher:
+    :return:
+    """
+    # 消息
+    url: str = str(event.get_message()).strip()
+
+    url_reg = r"(http:|https:)\/\/www.tiktok.com\/[A-Za-z\d._?%&+\-=\/#@]*"
+    url_short_reg = r"(http:|https:)\/\/vt.tiktok.com\/[A-Za-z\d._?%&+\-=\/#]*"
+    url_short_reg2 = r"(http:|https:)\/\/vm.tiktok.com\/[A-Za-z\d._?%&+\-=\/#]*"
+
+    # 线路（代理或直连）由 ROUTER 按测速结果选择，出错时换下一条；短链展开失败时交给 yt-dlp 跟随跳转
+    if "vt.tiktok" in url:
+        temp_url = re.search(url_short_reg, url)[0]
+        url = (
+            await ROUTER.attempt(
+                "tiktok", lambda proxy: expand_short_url(temp_url, proxy=proxy)
+            )
+            or temp_url
+        )
+    elif "vm.tiktok" in url:
+        temp_url = re.search(url_short_reg2, url)[0]
+        url = (
+            await ROUTER.attempt(
+                "tiktok",
+                partial(
+                    expand_short_url,
+                    temp_url,
+                    {"User-Agent": "facebookexternalhit/1.1"},
+                ),
+            )
+            or temp_url
+        )
+    else:
+        url = re.search(url_reg, url)[0]
+    title = await ROUTER.attempt("tiktok", partial(get_video_title, url)) or "-"
+
+    await matcher.send(Message(f"{GLOBAL_NICKNAME}识别：TikTok，{title}\n"))
+
+    async def produce() -> tuple[str, None]:
+        path = await ROUTER.attempt(
+            "tiktok",
+            lambda proxy: download_ytb_video(url, os.getcwd(), proxy, "tiktok"),
+            os.path.getsize,
+        )
+        return path, None
+
+    await send_shared_video(bot, event, url, produce)
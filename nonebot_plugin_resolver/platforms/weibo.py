@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import asyncio
+from pathlib import Path
+
+import httpx
+
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core import download_video
+from ..core.cache import TTLCache
+from ..core.constants import (
+    COMMON_HEADER,
+    WEIBO_AJAX_INFO,
+    WEIBO_EXTEND_INFO,
+    WEIBO_SINGLE_INFO,
+)
+from ..core.gallery import download_gallery, prune_directories
+from ..core.media_cache import new_hasher
+from ..core.supervisor import SUPERVISOR
+from ..core.weibo import extract_pics, html_to_text, mid2id, pic_urls
+from ..utils import (
+    GOVERNOR,
+    MEDIA_CACHE,
+    make_node_segment,
+    send_forward_both,
+    send_shared_video,
+    send_video_entry,
+    auto_video_send,
+)
+
+API_HEADERS = {
+    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+} | COMMON_HEADER
+IMAGE_HEADERS = {"Referer": "http://blog.sina.com.cn/"} | COMMON_HEADER
+VIDEO_HEADERS = {
+    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9",
+    "referer": "https://weibo.com/",
+}
+
+WEIBO_CACHE = TTLCache(maxsize=512, ttl=3600)
+""" 微博 id -> 正文、图片与视频链接，同一条微博再次分享时不再请求接口 """
+WEIBO_DIR = os.path.join(MEDIA_CACHE.root, "weibo")
+WEIBO_KEEP = 64
+""" 本地最多保留多少条微博的图片 """
+
+
+async def request_api(url: str, weibo_id: str, cookie: str) -> dict:
+    async with httpx.AsyncClient(timeout=10) as client:
+        resp = await client.get(
+            url,
+            headers={
+                "cookie": cookie,
+                "Referer": f"https://m.weibo.cn/detail/{weibo_id}",
+            }
+            | API_HEADERS,
+        )
+    return resp.json()
+
+
+async def fetch_extended(weibo_id: str, cookie: str, data: dict) -> None:
+    """
+    补全长微博的全文与超过 9 张的图片，两个接口同时请求，失败时保留手机版接口的内容
+    :param weibo_id:
+    :param cookie:
+    :param data: 手机版接口的 data，就地更新 "text" 与 "pics"
+    :return:
+    """
+    long_text = data.get("isLongText")
+    more_pics = (data.get("pic_num") or 0) > len(data.get("pics") or [])
+    requests = {}
+    if long_text:
+        requests["extend"] = request_api(
+            WEIBO_EXTEND_INFO.format(weibo_id), weibo_id, cookie
+        )
+    if more_pics:
+        requests["ajax"] = request_api(
+            WEIBO_AJAX_INFO.format(weibo_id), weibo_id, cookie
+        )
+    results = dict(
+        zip(requests, await asyncio.gather(*requests.values(), return_exceptions=True))
+    )
+    extend, ajax = results.get("extend"), results.get("ajax")
+    if isinstance(extend, dict) and (extend.get("data") or {}).get("longTextContent"):
+        data["text"] = extend["data"]["longTextContent"]
+    elif long_text:
+        logger.warning(f"微博 {weibo_id} 全文获取失败，只发送摘要：{extend}")
+    if isinstance(ajax, dict) and ajax.get("pic_infos"):
+        data["pics"] = extract_pics(ajax)
+    elif more_pics:
+        logger.warning(f"微博 {weibo_id} 的全部图片获取失败，只发送前 9 张：{ajax}")
+
+
+async def fetch_weibo(weibo_id: str) -> dict:
+    """
+    请求微博内容，从 cookie 池取 cookie，遇到失效的 cookie 隔离后换下一个重试
+    :param weibo_id:
+    :return: {"text", "pics": [图片链接], "video_url"}
+    """
+    resp = {}
+    for _ in range(GOVERNOR.attempts("weibo")):
+        weibo_ck = await GOVERNOR.cookie("weibo")
+        resp = await request_api(WEIBO_SINGLE_INFO.format(weibo_id), weibo_id, weibo_ck)
+        if resp.get("ok") == 1:
+            break
+        # cookie 失效时返回 ok != 1 且没有 data
+        GOVERNOR.quarantine("weibo", weibo_ck, f"接口返回 ok={resp.get('ok')}")
+    if "data" not in resp:
+        raise LookupError(f"微博 {weibo_id} 没有返回内容")
+    data = resp["data"]
+    logger.info(data)
+    data["pics"] = extract_pics(data)
+    await fetch_extended(weibo_id, weibo_ck, data)
+    region_name = data.get("region_name")
+    urls = (data.get("page_info") or {}).get("urls") or {}
+    return {
+        "text": f"{html_to_text(data.get('text'))}\n{data.get('status_title')}\n"
+        f"{data.get('source')}\t{region_name if region_name else ''}",
+        "pics": pic_urls(data["pics"]),
+        "video_url": urls.get("mp4_720p_mp4", "") or urls.get("mp4_hd_mp4", ""),
+    }
+
+
+async def fetch_pictures(weibo_id: str, urls: list[str]) -> list[str | None]:
+    """下载到这条微博自己的目录，图片按链接的哈希命名，不同微博的同名图片不会互相覆盖"""
+    paths = await download_gallery(
+        urls, os.path.join(WEIBO_DIR, weibo_id), headers=IMAGE_HEADERS
+    )
+    prune_directories(WEIBO_DIR, WEIBO_KEEP)
+    return paths
+
+
+async def download_weibo_video(url: str) -> tuple[str | None, str]:
+    """下载视频，返回 (本地路径，下载失败时为 None, 内容哈希)"""
+    hasher = new_hasher()
+    path = await download_video(url, ext_headers=VIDEO_HEADERS, hasher=hasher)
+    return path, hasher.hexdigest()
+
+
+async def wb(bot: Bot, event: Event, matcher: Matcher):
+    message = str(event.get_message())
+    weibo_id = None
+    reg = r'(jumpUrl|qqdocurl)": ?"(.*?)"'
+
+    if any(k in message for k in ("com.tencent.structmsg", "com.tencent.miniapp")):
+        match = re.search(reg, message)
+        if match:
+            get_url = match.group(2)
+            logger.debug(f"微博卡片链接：{get_url}")
+            if get_url:
+                message = json.loads('"' + get_url + '"')
+
+    if "m.weibo.cn" in message:
+        # https://m.weibo.cn/detail/4976424138313924
+        match = re.search(r"(?<=detail/)[A-Za-z\d]+", message) or re.search(
+            r"(?<=m.weibo.cn/)[A-Za-z\d]+/[A-Za-z\d]+", message
+        )
+        weibo_id = match.group(0) if match else None
+    elif "weibo.com/tv/show" in message and "mid=" in message:
+        # https://weibo.com/tv/show/1034:5007449447661594?mid=5007452630158934
+        match = re.search(r"(?<=mid=)[A-Za-z\d]+", message)
+        if match:
+            weibo_id = mid2id(match.group(0))
+    elif "weibo.com" in message:
+        # https://weibo.com/1707895270/5006106478773472
+        match = re.search(r"(?<=weibo.com/)[A-Za-z\d]+/[A-Za-z\d]+", message)
+        weibo_id = match.group(0) if match else None
+
+    # 无法获取到id则返回失败信息
+    if not weibo_id:
+        await matcher.finish(Message("解析失败：无法获取到wb的id"))
+    # 最终获取到的 id
+    weibo_id = weibo_id.split("/")[1] if "/" in weibo_id else weibo_id
+    logger.info(weibo_id)
+    try:
+        post = await WEIBO_CACHE.get_or_load(weibo_id, lambda: fetch_weibo(weibo_id))
+    except LookupError:
+        await matcher.finish(Message(f"{GLOBAL_NICKNAME}识别：微博，解析失败！"))
+    # 拿到内容后图片与视频同时开始下载，与发送文字并行
+    source = f"weibo:{weibo_id}"
+    video_url = post["video_url"] if GLOBAL_CONFIG.download_video else ""
+    cached = MEDIA_CACHE.lookup(source) if video_url else None
+    tasks = {}
+    if post["pics"]:
+        tasks["pics"] = SUPERVISOR.spawn(fetch_pictures(weibo_id, post["pics"]))
+    if video_url and cached is None:
+        tasks["video"] = SUPERVISOR.spawn(download_weibo_video(video_url))
+    try:
+        await matcher.send(Message(f"{GLOBAL_NICKNAME}识别：微博，{post['text']}"))
+        if "pics" in tasks:
+            # 下载失败的图片退回原链接让协议端自己拉取
+            images = [
+                MessageSegment.image(Path(path) if path else url)
+                for path, url in zip(await tasks["pics"], post["pics"])
+            ]
+            await send_forward_both(bot, event, make_node_segment(bot.self_id, images))
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    if cached is not None:
+        MEDIA_CACHE.record_saved(cached.size)
+        await send_video_entry(bot, event, cached)
+    elif "video" in tasks:
+        path, digest = await tasks["video"]
+        if path is None:
+            # 预下载失败，按共享任务重新下载一次
+            await send_shared_video(
+                bot, event, source, lambda: download_weibo_video(video_url)
+            )
+        else:
+            await auto_video_send(bot, event, path, source, digest)
@@ -0,0 +1,111 @@
+import os
+import re
+from urllib.parse import urlparse, parse_qs
+
+from nonebot import logger
+from nonebot.adapters.onebot.v11 import Message, Event, Bot, MessageSegment
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core.constants import COMMON_HEADER, XHS_REQ_LINK
+from ..core.gallery import download_gallery, prune_directories
+from ..core.xhs import fetch_initial_state_html, extract_note
+from ..core.shortlink import expand_short_url
+from ..utils import (
+    GOVERNOR,
+    MEDIA_CACHE,
+    OFFLOADER,
+    make_node_segment,
+    send_forward_both,
+    auto_video_send,
+)
+
+XHS_DIR = os.path.join(MEDIA_CACHE.root, "xiaohongshu")
+XHS_KEEP = 64
+""" 本地最多保留多少篇笔记的图片 """
+
+
+async def xiaohongshu(bot: Bot, event: Event, matcher: Matcher):
+    """
+        小红书解析
+    :param event:
+    :param matcher:
+    :return:
+    """
+    msg_url = re.search(
+        r"(http:|https:)\/\/(xhslink|(www\.)xiaohongshu).com\/[A-Za-z\d._?%&+\-=\/#@]*",
+        str(event.get_message()).strip(),
+    )[0]
+    headers = {
+        "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,"
+        "application/signed-exchange;v=b3;q=0.9",
+    } | COMMON_HEADER
+    if "xhslink" in msg_url:
+        msg_url = await expand_short_url(msg_url, headers)
+    xhs_id = re.search(r"/explore/(\w+)", msg_url)
+    if not xhs_id:
+        xhs_id = re.search(r"/discovery/item/(\w+)", msg_url)
+    if not xhs_id:
+        xhs_id = re.search(r"source=note&noteId=(\w+)", msg_url)
+    xhs_id = xhs_id[1]
+
+    parsed_url = urlparse(msg_url)
+    params = parse_qs(parsed_url.query)
+    # 提取 xsec_source 和 xsec_token
+    xsec_source = params.get("xsec_source", [None])[0] or "pc_feed"
+    xsec_token = params.get("xsec_token", [None])[0]
+
+    # 从 cookie 池取 ck，遇到失效的 ck 隔离后换下一个重试
+    note_data = None
+    for _ in range(GOVERNOR.attempts("xiaohongshu")):
+        xhs_ck = await GOVERNOR.cookie("xiaohongshu")
+        # 如果没有设置xhs的ck就结束，因为获取不到
+        if xhs_ck is None:
+            logger.error(GLOBAL_CONFIG)
+            await matcher.send(
+                Message(
+                    f"{GLOBAL_NICKNAME}识别内容来自：【小红书】\n无法获取到管理员设置的小红书ck！"
+                )
+            )
+            return
+        html = await fetch_initial_state_html(
+            f"{XHS_REQ_LINK}{xhs_id}?xsec_source={xsec_source}&xsec_token={xsec_token}",
+            headers=headers | {"cookie": xhs_ck},
+        )
+        note_data = await OFFLOADER.run(extract_note, html, xhs_id, size=len(html))
+        if note_data is not None:
+            break
+        # ck 失效时页面里没有 __INITIAL_STATE__
+        GOVERNOR.quarantine("xiaohongshu", xhs_ck, "页面中没有笔记数据")
+    if note_data is None:
+        await matcher.send(
+            Message(
+                f"{GLOBAL_NICKNAME}识别内容来自：【小红书】\n当前ck已失效，请联系管理员重新设置的小红书ck！"
+            )
+        )
+        return
+    type = note_data["type"]
+    note_title = note_data["title"]
+    note_desc = note_data["desc"]
+    await matcher.send(
+        Message(f"{GLOBAL_NICKNAME}识别：小红书，{note_title}\n{note_desc}")
+    )
+
+    if type == "video":
+        video_url = note_data["video"]["media"]["stream"]["h264"][0]["masterUrl"]
+        return await auto_video_send(bot, event, video_url)
+    if type != "normal":
+        return
+    # 批量下载到这篇笔记自己的目录，同时解析的笔记互不覆盖
+    links_path = await download_gallery(
+        [item["urlDefault"] for item in note_data["imageList"]],
+        os.path.join(XHS_DIR, xhs_id),
+    )
+    prune_directories(XHS_DIR, XHS_KEEP)
+    # 发送图片
+    links = make_node_segment(
+        bot.self_id,
+        [MessageSegment.image(f"file://{link}") for link in links_path if link],
+    )
+    # 发送异步后的数据
+    await send_forward_both(bot, event, links)
@@ -0,0 +1,33 @@
+import os
+import re
+from functools import partial
+
+from nonebot.adapters.onebot.v11 import Message, Event, Bot
+from nonebot.matcher import Matcher
+
+from ..config import GLOBAL_CONFIG, GLOBAL_NICKNAME
+from ..core.ytdlp import get_video_title, download_ytb_video
+from ..utils import ROUTER, send_shared_video
+
+
+async def youtube(bot: Bot, event: Event, matcher: Matcher):
+    msg_url = re.search(
+        r"(?:https?:\/\/)?(www\.)?youtube\.com\/[A-Za-z\d._?%&+\-=\/#]*|(?:https?:\/\/)?youtu\.be\/[A-Za-z\d._?%&+\-=\/#]*",
+        str(event.get_message()).strip(),
+    )[0]
+
+    # 线路（代理或直连）由 ROUTER 按测速结果选择，出错时换下一条
+    title = await ROUTER.attempt("youtube", partial(get_video_title, msg_url)) or "-"
+    await matcher.send(Message(f"{GLOBAL_NICKNAME}识别：油管，{title}\n"))
+
+    if GLOBAL_CONFIG.download_video:
+
+        async def produce() -> tuple[str, None]:
+            path = await ROUTER.attempt(
+                "youtube",
+                lambda proxy: download_ytb_video(msg_url, os.getcwd(), proxy),
+                os.path.getsize,
+            )
+            return path, None
+
+        await send_shared_video(bot, event, msg_url, produce)
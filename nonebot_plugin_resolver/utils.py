@@ -0,0 +1,341 @@
+import os
+import pathlib
+import functools
+from typing import Awaitable, Callable, Iterable
+
+import nonebot
+from nonebot import logger, get_driver
+from nonebot.compat import model_dump
+from nonebot.adapters.onebot.v11 import (
+    Message,
+    Event,
+    Bot,
+    MessageSegment,
+    ActionFailed,
+)
+from nonebot.adapters.onebot.v11.event import GroupMessageEvent, PrivateMessageEvent
+
+from .config import GLOBAL_CONFIG, GLOBAL_NICKNAME, RESOLVER_PROXY, IS_OVERSEA
+from .core import download_video, get_file_size_mb
+from .core.constants import VIDEO_MAX_MB, RATE_LIMITS, WEIBO_VISITOR_COOKIE
+from .core.governor import CookiePool, RequestGovernor, TokenBucket
+from .core.jobs import create_job_queue
+from .core.media_cache import MediaCache, MediaEntry, new_hasher
+from .core.offload import Offloader
+from .core.proxy import DIRECT, PROXIED_PLATFORMS, ProxyRouter
+
+MEDIA_CACHE = MediaCache(
+    GLOBAL_CONFIG.resolver_cache_dir or os.path.join(os.getcwd(), "resolver_cache"),
+    GLOBAL_CONFIG.resolver_cache_mb * 1024 * 1024,
+)
+JOB_QUEUE = create_job_queue(GLOBAL_CONFIG.resolver_queue)
+OFFLOADER = Offloader(
+    GLOBAL_CONFIG.resolver_offload_workers,
+    GLOBAL_CONFIG.resolver_offload_threshold_kb * 1024,
+    GLOBAL_CONFIG.resolver_offload_mode,
+    # 子进程导入插件时要读取配置，用同样的配置初始化 NoneBot
+    functools.partial(nonebot.init, **model_dump(GLOBAL_CONFIG)),
+)
+get_driver().on_shutdown(OFFLOADER.shutdown)
+
+
+def _cookie_pool(name: str, values: list[str]) -> CookiePool:
+    """去掉空值与重复项后组成 cookie 池"""
+    return CookiePool(
+        name,
+        list(dict.fromkeys(v for v in values if v)),
+        GLOBAL_CONFIG.resolver_cookie_strategy,
+        GLOBAL_CONFIG.resolver_cookie_quarantine,
+    )
+
+
+GOVERNOR = RequestGovernor(
+    {
+        name: TokenBucket(rate, burst)
+        for name, (rate, burst) in (
+            RATE_LIMITS | GLOBAL_CONFIG.resolver_rate_limits
+        ).items()
+        if rate > 0
+    },
+    {
+        "xiaohongshu": _cookie_pool(
+            "xiaohongshu", [GLOBAL_CONFIG.xhs_ck, *GLOBAL_CONFIG.xhs_cks]
+        ),
+        "douyin": _cookie_pool(
+            "douyin", [GLOBAL_CONFIG.douyin_ck, *GLOBAL_CONFIG.douyin_cks]
+        ),
+        "weibo": _cookie_pool(
+            "weibo", GLOBAL_CONFIG.weibo_cks or [WEIBO_VISITOR_COOKIE]
+        ),
+        "bilibili": _cookie_pool(
+            "bilibili", [GLOBAL_CONFIG.bili_sessdata, *GLOBAL_CONFIG.bili_sessdatas]
+        ),
+    },
+)
+
+ROUTER = ProxyRouter(
+    {name: [None if IS_OVERSEA else RESOLVER_PROXY] for name in PROXIED_PLATFORMS}
+    | {
+        name: [None if proxy == DIRECT else proxy for proxy in dict.fromkeys(proxies)]
+        for name, proxies in GLOBAL_CONFIG.resolver_proxies.items()
+    }
+)
+get_driver().on_shutdown(ROUTER.stop)
+
+VideoProducer = Callable[[], Awaitable[tuple[str, str | None]]]
+""" 下载 / 合并视频的协程函数，返回 (本地路径, 内容哈希或 None)，下载失败时路径为 None """
+
+
+class VideoUnavailable(Exception):
+    """执行者没有拿到视频（下载失败或各条线路都不可用），不缓存、不发布，等待者各自回复失败"""
+
+
+def make_node_segment(
+    user_id, segments: MessageSegment | list
+) -> MessageSegment | Iterable[MessageSegment]:
+    """将消息封装成 Segment 的 Node 类型，可以传入单个也可以传入多个，返回一个封装好的转发类型
+    :param user_id: 可以通过event获取
+    :param segments: 一般为 MessageSegment.image / MessageSegment.video / MessageSegment.text
+    :return:
+    """
+    if isinstance(segments, list):
+        return [
+            MessageSegment.node_custom(
+                user_id=user_id, nickname=GLOBAL_NICKNAME, content=Message(segment)
+            )
+            for segment in segments
+        ]
+    return MessageSegment.node_custom(
+        user_id=user_id, nickname=GLOBAL_NICKNAME, content=Message(segments)
+    )
+
+
+async def send_forward_both(
+    bot: Bot, event: Event, segments: MessageSegment | list
+) -> None:
+    """自动判断message是 List 还是单个，然后发送{转发}，允许发送群和个人
+    :param bot:
+    :param event:
+    :param segments:
+    :return:
+    """
+    if isinstance(event, GroupMessageEvent):
+        await bot.send_group_forward_msg(group_id=event.group_id, messages=segments)
+    else:
+        await bot.send_private_forward_msg(user_id=event.user_id, messages=segments)
+
+
+async def fetch_video_handle(bot: Bot, send_result) -> str:
+    """
+    发送成功后回查这条消息，取出协议端给视频分配的可复用链接（没有时返回空字符串）
+    :param bot:
+    :param send_result: send 的返回值，通常包含 message_id
+    :return:
+    """
+    message_id = (
+        send_result.get("message_id") if isinstance(send_result, dict) else None
+    )
+    if message_id is None:
+        return ""
+    try:
+        msg = await bot.get_msg(message_id=message_id)
+    except Exception as e:
+        logger.debug(f"获取已发送视频的句柄失败：{e}")
+        return ""
+    segments = msg.get("message") if isinstance(msg, dict) else None
+    for segment in segments if isinstance(segments, list) else []:
+        if isinstance(segment, dict) and segment.get("type") == "video":
+            data = segment.get("data") or {}
+            for key in ("url", "file"):
+                value = str(data.get(key) or "")
+                if value.startswith(("http://", "https://")):
+                    return value
+    return ""
+
+
+async def send_video_entry(bot: Bot, event: Event, entry: MediaEntry) -> None:
+    """
+    发送缓存中的视频：有未过期的句柄时直接复用，否则上传本地文件并记下协议端返回的句柄
+    :param bot:
+    :param event:
+    :param entry:
+    :return:
+    """
+    if entry.handle_valid:
+        try:
+            await bot.send(event, MessageSegment.video(entry.handle))
+            MEDIA_CACHE.record_saved(entry.size, handle=True)
+            return
+        except ActionFailed as e:
+            logger.info(f"缓存的视频句柄已失效，改为重新上传：{e}")
+            MEDIA_CACHE.forget_handle(entry.digest)
+    result = await bot.send(event, MessageSegment.video(f"file://{entry.path}"))
+    MEDIA_CACHE.remember_handle(entry.digest, await fetch_video_handle(bot, result))
+
+
+async def send_cached_video(bot: Bot, event: Event, source: str) -> bool:
+    """
+    来源命中媒体缓存时直接发送，省去下载与合并
+    :param bot:
+    :param event:
+    :param source: 来源标识，如下载链接或 "bilibili:BV...:p0"
+    :return: 是否已经发送
+    """
+    entry = MEDIA_CACHE.lookup(source)
+    if entry is None or get_file_size_mb(entry.path) > VIDEO_MAX_MB:
+        return False
+    MEDIA_CACHE.record_saved(entry.size)
+    try:
+        await send_video_entry(bot, event, entry)
+    except Exception as e:
+        logger.error(f"解析发送出现错误，具体为\n{e}")
+    return True
+
+
+async def upload_file_both(bot: Bot, event: Event, file_path: str, name: str) -> None:
+    """上传文件，不限于群和个人"""
+    if isinstance(event, GroupMessageEvent):
+        await bot.upload_group_file(group_id=event.group_id, file=file_path, name=name)
+    elif isinstance(event, PrivateMessageEvent):
+        await bot.upload_private_file(user_id=event.user_id, file=file_path, name=name)
+
+
+async def report_video_failure(bot: Bot, event: Event, source: str) -> None:
+    """视频没有下载下来：记日志并告诉用户"""
+    logger.warning(f"视频下载失败：{source}")
+    await bot.send(event, Message(f"{GLOBAL_NICKNAME}识别：视频下载失败"))
+
+
+async def fetch_shared_video(
+    source: str, produce: VideoProducer
+) -> MediaEntry | tuple[str, str | None] | None:
+    """
+    取得来源为 source 的视频但不发送：命中缓存直接返回；否则经任务队列只让一个执行者（可能是另一个实例）
+    调用 produce 下载 / 合并，其余调用方等待同一份结果。可以在发送文字的同时执行
+    :param source: 来源标识，同时作为任务的内容 id
+    :param produce:
+    :return: 缓存中的视频，未启用缓存或共享结果已失效时为 (本地路径, 内容哈希)，下载失败时为 None
+    """
+    entry = MEDIA_CACHE.lookup(source)
+    if entry is not None and get_file_size_mb(entry.path) <= VIDEO_MAX_MB:
+        MEDIA_CACHE.record_saved(entry.size)
+        return entry
+    if not MEDIA_CACHE.enabled:
+        path, digest = await produce()
+        return None if path is None else (path, digest)
+
+    async def work() -> dict:
+        path, digest = await produce()
+        if path is None:
+            raise VideoUnavailable(source)
+        entry = await MEDIA_CACHE.add_async(path, digest, source)
+        return {"path": entry.path, "digest": entry.digest}
+
+    try:
+        result = await JOB_QUEUE.run(source, work)
+    except VideoUnavailable:
+        return None
+    if not os.path.exists(result["path"]):
+        # 执行者那边的文件已经被淘汰，只能自己再做一遍
+        logger.info(f"共享结果已失效，重新下载：{source}")
+        path, digest = await produce()
+        return None if path is None else (path, digest)
+    return MEDIA_CACHE.adopt(result["path"], result["digest"], source)
+
+
+async def send_fetched_video(
+    bot: Bot,
+    event: Event,
+    source: str,
+    video: MediaEntry | tuple[str, str | None] | None,
+) -> None:
+    """
+    发送 fetch_shared_video 的结果，下载失败时回复失败信息
+    :param bot:
+    :param event:
+    :param source:
+    :param video:
+    :return:
+    """
+    if video is None:
+        return await report_video_failure(bot, event, source)
+    if isinstance(video, tuple):
+        path, digest = video
+        return await auto_video_send(bot, event, path, source, digest)
+    try:
+        if get_file_size_mb(video.path) > VIDEO_MAX_MB:
+            await upload_file_both(bot, event, video.path, os.path.basename(video.path))
+        else:
+            await send_video_entry(bot, event, video)
+    except Exception as e:
+        logger.error(f"解析发送出现错误，具体为\n{e}")
+
+
+async def send_shared_video(
+    bot: Bot, event: Event, source: str, produce: VideoProducer
+) -> None:
+    """
+    发送来源为 source 的视频，取得视频的方式见 fetch_shared_video
+    :param bot:
+    :param event:
+    :param source: 来源标识，同时作为任务的内容 id
+    :param produce:
+    :return:
+    """
+    video = await fetch_shared_video(source, produce)
+    await send_fetched_video(bot, event, source, video)
+
+
+async def auto_video_send(
+    bot: Bot,
+    event: Event,
+    data_path: str,
+    source: str | None = None,
+    digest: str | None = None,
+):
+    """
+    拉格朗日自动转换成CQ码发送
+    :param event:
+    :param data_path: 本地路径或下载链接
+    :param source: 可选，来源标识，用于下次直接命中缓存，默认为下载链接
+    :param digest: 可选，下载时算好的内容哈希，没有时会在发送前计算
+    :return:
+    """
+    if data_path is not None and data_path.startswith("http"):
+        url = data_path
+
+        async def produce() -> tuple[str, str]:
+            hasher = new_hasher()
+            return await download_video(url, hasher=hasher), hasher.hexdigest()
+
+        return await send_shared_video(bot, event, source or url, produce)
+
+    original_path = data_path
+    entry = None
+    try:
+        file_size_in_mb = get_file_size_mb(data_path)
+        if file_size_in_mb > VIDEO_MAX_MB:
+            await bot.send(
+                event,
+                Message(
+                    f"当前解析文件 {file_size_in_mb} MB 大于 {VIDEO_MAX_MB} MB，尝试改用文件方式发送，请稍等..."
+                ),
+            )
+            return await upload_file_both(
+                bot, event, data_path, data_path.split("/")[-1]
+            )
+        if MEDIA_CACHE.enabled:
+            entry = await MEDIA_CACHE.add_async(data_path, digest, source)
+            await send_video_entry(bot, event, entry)
+        else:
+            await bot.send(event, MessageSegment.video(f"file://{data_path}"))
+    except Exception as e:
+        logger.error(f"解析发送出现错误，具体为\n{e}")
+    finally:
+        if original_path is not None:
+            paths = [original_path + ".jpg"]
+            if entry is None:
+                paths.append(original_path)
+            for p in map(pathlib.Path, paths):
+                if p.exists():
+                    p.unlink()
@@ -0,0 +1,6 @@
+import tempfile
+
+import nonebot
+
+# 插件在导入时读取配置、注册匹配器，测试前先初始化 NoneBot；媒体缓存放到临时目录
+nonebot.init(resolver_cache_dir=tempfile.mkdtemp(prefix="resolver-test-cache-"))
@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from nonebot_plugin_resolver.core import acfun
+from nonebot_plugin_resolver.core.acfun import (
+    FETCH_STREAM_SEPARATOR,
+    extract_video_info,
+    parse_video_page,
+    select_representation,
+)
+from nonebot_plugin_resolver.core.adaptive import AdaptiveLimiter
+from nonebot_plugin_resolver.core.progress import DownloadProgress
+
+REPRESENTATIONS = [
+    {"url": "360p.m3u8", "avgBitrate": 500},
+    {"url": "1080p.m3u8", "avgBitrate": 4000},
+    {"url": "720p.m3u8", "maxBitrate": 2000},
+]
+
+VIDEO_INFO = {
+    "dougaId": "123",
+    "title": "标题 含空格",
+    "description": '引号"与</script>',
+    "createTime": "2024-03-01",
+    "user": {"name": "作者"},
+    "currentVideoInfo": {
+        "durationMillis": 60000,
+        "ksPlayJson": json.dumps(
+            {"adaptationSet": [{"representation": REPRESENTATIONS}]}
+        ),
+    },
+}
+
+
+def page(info: dict) -> str:
+    return (
+        "<script>window.pageInfo = window.videoInfo = "
+        + json.dumps(info, ensure_ascii=False)
+        + ";</script>"
+    )
+
+
+def ajaxpipe(info: dict) -> str:
+    """ajaxpipe 返回的分块，html 是 JSON 字符串"""
+    return FETCH_STREAM_SEPARATOR.join(
+        [
+            "",
+            json.dumps({"html": "<div></div>", "id": "header"}),
+            json.dumps({"html": page(info), "id": "videoInfo_new"}),
+        ]
+    )
+
+
+@pytest.mark.parametrize("wrap", [page, ajaxpipe])
+def test_extract_video_info(wrap):
+    assert extract_video_info(wrap(VIDEO_INFO)) == VIDEO_INFO
+
+
+def test_extract_video_info_missing():
+    with pytest.raises(ValueError):
+        extract_video_info("<html></html>")
+
+
+def test_select_representation():
+    assert select_representation(REPRESENTATIONS)["url"] == "1080p.m3u8"
+    assert select_representation(REPRESENTATIONS, max_bitrate=2500)["url"] == (
+        "720p.m3u8"
+    )
+    # 60 秒：2000kbps 约 15MB，500kbps 约 3.75MB
+    assert (
+        select_representation(REPRESENTATIONS, 60000, max_bytes=10 * 1024 * 1024)["url"]
+        == "360p.m3u8"
+    )
+    # 都超出预算时取最低码率
+    assert select_representation(REPRESENTATIONS, 60000, max_bytes=1)["url"] == (
+        "360p.m3u8"
+    )
+
+
+def test_parse_video_page_drops_ks_play_json():
+    url, name, info = parse_video_page(ajaxpipe(VIDEO_INFO), max_bitrate=3000)
+    assert url == "720p.m3u8"
+    assert name.startswith("ac123_标题-含空格_作者_2024-03-01_")
+    assert "ksPlayJson" not in info["currentVideoInfo"]
+
+
+def test_retried_segment_counts_progress_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(acfun, "SEGMENT_RETRY_DELAY", 0)
+    attempts = []
+
+    class Body(httpx.AsyncByteStream):
+        def __init__(self, fail: bool):
+            self.fail = fail
+
+        async def __aiter__(self):
+            yield b"12345"
+            if self.fail:
+                # 收到一部分后连接断开
+                raise httpx.ReadError("reset")
+            yield b"67890"
+
+    def handler(request):
+        attempts.append(request)
+        return httpx.Response(
+            200, headers={"content-length": "10"}, stream=Body(len(attempts) == 1)
+        )
+
+    progress = DownloadProgress("test")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await acfun.download_resource(
+                client,
+                "https://example.com/0.ts",
+                str(tmp_path / "0.ts"),
+                AdaptiveLimiter(1),
+                progress=progress,
+            )
+
+    asyncio.run(main())
+    assert len(attempts) == 2
+    assert (progress.total, progress.done, progress.ratio) == (10, 10, 1.0)
+    assert (tmp_path / "0.ts").read_bytes() == b"1234567890"
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from nonebot.adapters.onebot.v11 import Message
+from nonebot.exception import FinishedException
+
+from nonebot_plugin_resolver.platforms import acfun
+
+
+class Event:
+    def get_message(self):
+        return Message("https://www.acfun.cn/v/ac123")
+
+
+class Matcher:
+    async def send(self, message):
+        raise FinishedException
+
+
+def test_failed_caption_send_cancels_download(monkeypatch):
+    spawned = []
+
+    async def parse_ac_url(url, **kwargs):
+        return "https://example.com/index.m3u8", "ac123", {}
+
+    async def download_m3u8_video(url):
+        await asyncio.sleep(60)
+
+    def spawn(coro, name=None):
+        spawned.append(asyncio.create_task(coro))
+        return spawned[-1]
+
+    monkeypatch.setattr(acfun, "parse_ac_url", parse_ac_url)
+    monkeypatch.setattr(acfun, "download_m3u8_video", download_m3u8_video)
+    monkeypatch.setattr(acfun.MEDIA_CACHE, "lookup", lambda source: None)
+    monkeypatch.setattr(acfun.SUPERVISOR, "spawn", spawn)
+
+    async def main():
+        with pytest.raises(FinishedException):
+            await acfun.ac(None, Event(), Matcher())
+        # 发送标题失败时，已经开始的下载随之取消
+        await asyncio.wait(spawned, timeout=0.1)
+        return spawned[0].cancelled()
+
+    assert asyncio.run(main())
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver.core import adaptive as adaptive_module
+from nonebot_plugin_resolver.core.adaptive import AdaptiveLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(adaptive_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def run_window(limiter: AdaptiveLimiter, clock, rate: float) -> None:
+    """并发用满地完成一个窗口，每个请求 1 秒内收到 rate 字节"""
+
+    async def main():
+        n = limiter.concurrency
+        entered = asyncio.Event()
+        release = asyncio.Event()
+        tickets = []
+
+        async def request():
+            async with limiter.slot() as ticket:
+                tickets.append(ticket)
+                if len(tickets) == n:
+                    entered.set()
+                await release.wait()
+                limiter.done(ticket, int(rate))
+
+        tasks = [asyncio.create_task(request()) for _ in range(n)]
+        await entered.wait()
+        clock[0] += 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+def test_slow_start_doubles_until_throughput_stops_growing(clock):
+    limiter = AdaptiveLimiter(2, maximum=32)
+    run_window(limiter, clock, 100)
+    assert limiter.concurrency == 4
+    run_window(limiter, clock, 100)
+    assert limiter.concurrency == 8
+    # 并发翻倍后单个请求的速度减半，总吞吐持平：记为上限
+    run_window(limiter, clock, 50)
+    assert limiter.concurrency == 8
+    assert limiter.stats["peak"] == 8
+
+
+def test_congestion_decreases_once_per_window(clock):
+    limiter = AdaptiveLimiter(10, maximum=10)
+    first = clock[0]
+    clock[0] += 1
+    limiter.congested(clock[0])
+    assert limiter.concurrency == 7
+    # 减少之前发出的请求再失败不重复减
+    limiter.congested(first)
+    assert limiter.concurrency == 7
+    clock[0] += 1
+    limiter.congested(clock[0])
+    assert limiter.concurrency == 4
+    assert limiter.stats["congested"] == 3
+
+
+def test_fixed_concurrency(clock):
+    limiter = AdaptiveLimiter(3, minimum=3, maximum=3)
+    run_window(limiter, clock, 100)
+    clock[0] += 1
+    limiter.congested(clock[0])
+    assert limiter.concurrency == 3
+
+
+def test_cancelled_waiter_returns_its_slot():
+    limiter = AdaptiveLimiter(1, maximum=1)
+
+    async def main():
+        async with limiter.slot():
+            waiter = asyncio.create_task(limiter.slot().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        assert limiter.active == 0
+        async with limiter.slot():
+            assert limiter.active == 1
+
+    asyncio.run(main())
+
+
+def test_waiter_cancelled_after_grant_hands_slot_back():
+    limiter = AdaptiveLimiter(1, maximum=1)
+
+    async def main():
+        holder = limiter.slot()
+        await holder.__aenter__()
+        waiter = asyncio.create_task(limiter.slot().__aenter__())
+        await asyncio.sleep(0)
+        # 名额已经分给了等待的请求，它还没来得及运行就被取消
+        await holder.__aexit__(None, None, None)
+        assert limiter.active == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.active == 0
+
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+import asyncio
+
+from nonebot_plugin_resolver.core import article
+from nonebot_plugin_resolver.core.article import ArticleRenderer, split_markdown
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    async def set_viewport_size(self, size):
+        pass
+
+    async def set_content(self, html, wait_until=None):
+        pass
+
+    async def screenshot(self, **kwargs):
+        return b"png"
+
+    async def close(self):
+        self.closed = True
+
+
+def test_close_closes_idle_pages(tmp_path):
+    renderer = ArticleRenderer(str(tmp_path))
+    pages = []
+
+    async def new_page():
+        pages.append(FakePage())
+        return pages[-1]
+
+    renderer._new_page = new_page
+
+    async def main():
+        await renderer._screenshot("<p>a</p>")
+        await article.close_renderers()
+        # 关闭之后用完的页面不再放回
+        await renderer._screenshot("<p>b</p>")
+
+    asyncio.run(main())
+    assert renderer in article.RENDERERS
+    assert [page.closed for page in pages] == [True, True]
+    assert renderer._idle == []
+
+
+def test_split_markdown_keeps_code_fences():
+    md = "a" * 10 + "\n\n```\ncode\n\nmore\n```\n\nb"
+    assert split_markdown(md, max_weight=5) == ["a" * 10, "```\ncode\n\nmore\n```", "b"]
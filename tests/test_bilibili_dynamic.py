@@ -0,0 +1,48 @@
+import asyncio
+import os
+
+from nonebot_plugin_resolver.core.cache import TTLCache
+from nonebot_plugin_resolver.core.gallery import gallery_path
+from nonebot_plugin_resolver.platforms import bilibili
+
+IMAGES = [f"https://i0.hdslb.com/bfs/new_dyn/{i}.jpg" for i in range(3)]
+
+
+def test_concurrent_resolves_download_once(tmp_path, monkeypatch):
+    downloads = []
+
+    async def fetch_dynamic(dynamic_id, credential):
+        return {"bvid": "", "cv_id": "", "text": "", "images": IMAGES}
+
+    async def download_gallery(urls, directory, headers=None):
+        downloads.append(directory)
+        await asyncio.sleep(0.01)
+        os.makedirs(directory, exist_ok=True)
+        paths = [gallery_path(directory, url) for url in urls]
+        for path in paths:
+            open(path, "wb").close()
+        return paths
+
+    monkeypatch.setattr(bilibili, "OPUS_CACHE", TTLCache())
+    monkeypatch.setattr(bilibili, "OPUS_DIR", str(tmp_path))
+    monkeypatch.setattr(bilibili, "fetch_dynamic", fetch_dynamic)
+    monkeypatch.setattr(bilibili, "download_gallery", download_gallery)
+
+    async def main():
+        return await asyncio.gather(
+            *(bilibili.get_dynamic("1", None) for _ in range(3))
+        )
+
+    results = asyncio.run(main())
+    assert len(downloads) == 1
+    assert all(len(r["paths"]) == 3 for r in results)
+    # 每次返回新的字典，缓存里的解析结果不被改动
+    results[0]["paths"].clear()
+    assert "paths" not in bilibili.OPUS_CACHE.get("1")
+    assert len(asyncio.run(bilibili.get_dynamic("1", None))["paths"]) == 3
+    assert len(downloads) == 1
+
+    # 本地图片被清理后重新下载
+    os.remove(results[1]["paths"][0])
+    assert len(asyncio.run(bilibili.get_dynamic("1", None))["paths"]) == 3
+    assert len(downloads) == 2
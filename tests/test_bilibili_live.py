@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+from nonebot_plugin_resolver.core.gallery import gallery_path
+from nonebot_plugin_resolver.platforms import bilibili
+
+
+class FakeRoom:
+    keyframe = "https://i0.hdslb.com/bfs/live-key-frame/a.jpg"
+
+    def __init__(self, room_display_id, credential):
+        pass
+
+    async def get_room_info(self):
+        return {
+            "room_info": {
+                "title": "直播",
+                "cover": "https://i0.hdslb.com/bfs/live/cover.jpg",
+                "keyframe": FakeRoom.keyframe,
+            }
+        }
+
+
+@pytest.fixture
+def live_dir(tmp_path, monkeypatch):
+    async def download_gallery(urls, directory, headers=None):
+        os.makedirs(directory, exist_ok=True)
+        paths = [gallery_path(directory, url) for url in urls]
+        for path in paths:
+            open(path, "wb").close()
+        return paths
+
+    monkeypatch.setattr(bilibili.live, "LiveRoom", FakeRoom)
+    monkeypatch.setattr(bilibili, "download_gallery", download_gallery)
+    monkeypatch.setattr(bilibili, "LIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_keyframe_in_flight_is_not_deleted(live_dir):
+    FakeRoom.keyframe = "https://i0.hdslb.com/bfs/live-key-frame/a.jpg"
+    old = asyncio.run(bilibili.fetch_live_room(1, None))
+    old_keyframe = old["paths"][1]
+
+    FakeRoom.keyframe = "https://i0.hdslb.com/bfs/live-key-frame/b.jpg"
+    with bilibili.sending_live_images(old["paths"]):
+        # 刷新直播间时旧关键帧还在发送
+        new = asyncio.run(bilibili.fetch_live_room(1, None))
+        assert os.path.exists(old_keyframe)
+    assert bilibili.LIVE_SENDING == {}
+
+    # 发送完成后，下次刷新时删除
+    asyncio.run(bilibili.fetch_live_room(1, None))
+    assert not os.path.exists(old_keyframe)
+    assert all(map(os.path.exists, new["paths"]))
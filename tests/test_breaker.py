@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver.core import breaker as breaker_module
+from nonebot_plugin_resolver.core.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+)
+from nonebot_plugin_resolver.core.deadline import DeadlineExceeded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker_module.time, "monotonic", clock)
+    return clock
+
+
+async def call(breaker: CircuitBreaker, error: BaseException | None = None):
+    async with breaker.guard():
+        if error is not None:
+            raise error
+
+
+def fail(breaker: CircuitBreaker, error: BaseException) -> None:
+    with pytest.raises(type(error)):
+        asyncio.run(call(breaker, error))
+
+
+def test_opens_after_error_rate_and_recovers(clock):
+    breaker = CircuitBreaker("test", min_calls=4, error_rate=0.5, cooldown=30)
+    asyncio.run(call(breaker))
+    asyncio.run(call(breaker))
+    fail(breaker, ValueError())
+    assert breaker.state == CLOSED
+    fail(breaker, ValueError())
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call(breaker))
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    asyncio.run(call(breaker))
+    assert breaker.state == CLOSED
+    assert breaker.totals == {"calls": 5, "failures": 2, "rejected": 1, "opened": 1}
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = CircuitBreaker("test", min_calls=1, slow_call=10)
+
+    async def slow():
+        async with breaker.guard():
+            clock.now += 11
+
+    asyncio.run(slow())
+    assert breaker.state == OPEN
+
+
+@pytest.mark.parametrize(
+    "error", [DeadlineExceeded("download"), asyncio.CancelledError()]
+)
+def test_deadline_and_cancel_are_not_failures(clock, error):
+    breaker = CircuitBreaker("test", min_calls=1)
+    fail(breaker, error)
+    assert breaker.state == CLOSED
+    assert breaker.totals["calls"] == 0
+
+    # half_open 时被取消的探测请求归还名额，下一个请求还能探测
+    fail(breaker, ValueError())
+    clock.now += breaker.cooldown
+    fail(breaker, error)
+    assert breaker.state == HALF_OPEN
+    asyncio.run(call(breaker))
+    assert breaker.state == CLOSED
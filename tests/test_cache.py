@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver.core.cache import TTLCache
+
+
+def test_get_set_and_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=100)
+    assert cache.get("a") == 1 and "b" in cache
+    now[0] += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert len(cache) == 2
+
+
+def test_get_or_load_single_flight():
+    cache = TTLCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(4)))
+
+    assert asyncio.run(main()) == [1, 1, 1, 1]
+    assert calls == 1
+    assert cache.get("k") == 1
+
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache()
+
+    async def loader():
+        raise LookupError("missing")
+
+    with pytest.raises(LookupError):
+        asyncio.run(cache.get_or_load("k", loader))
+    assert "k" not in cache
+
+
+def test_cancelled_loader_hands_over_to_waiter():
+    cache = TTLCache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "value"
+    assert calls == 2
+    assert cache.get("k") == "value"
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import pytest
+
+from nonebot_plugin_resolver.core.douyin import extract_aweme
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+def test_extract_video():
+    payload = (FIXTURES / "douyin_aweme_detail_video.json").read_bytes()
+    assert extract_aweme(payload) == {
+        "desc": "bench fixture #抖音",
+        "aweme_type": 0,
+        "play_uri": "v0200fg10000cpa1bench",
+        "images": [],
+    }
+
+
+def test_extract_images_keeps_first_url_in_order():
+    payload = (FIXTURES / "douyin_aweme_detail_image.json").read_bytes()
+    aweme = extract_aweme(payload)
+    assert aweme["aweme_type"] == 68
+    assert aweme["images"] == [
+        f"https://p3-sign.douyinpic.com/tos-cn-i/img{i}.jpeg" for i in range(4)
+    ]
+
+
+@pytest.mark.parametrize(
+    "payload", [b"", b"null", b'{"status_code": 0}', b'{"aweme_detail": null}']
+)
+def test_empty_response_returns_none(payload):
+    # ck 失效时接口返回空响应或没有 aweme_detail
+    assert extract_aweme(payload) is None
+
+
+def test_missing_video_and_images():
+    assert extract_aweme(b'{"aweme_detail": {"desc": "x", "video": null}}') == {
+        "desc": "x",
+        "aweme_type": None,
+        "play_uri": None,
+        "images": [],
+    }
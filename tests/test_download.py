@@ -0,0 +1,15 @@
+import asyncio
+import os
+
+import nonebot_plugin_resolver.core as core
+
+
+def test_failed_download_logs_url_and_returns_none(monkeypatch, tmp_path):
+    warnings = []
+    monkeypatch.setattr(core.logger, "warning", warnings.append)
+    monkeypatch.chdir(tmp_path)
+    url = "http://127.0.0.1:1/video.mp4"
+    assert asyncio.run(core.download_video(url)) is None
+    assert len(warnings) == 1 and url in warnings[0]
+    # 写了一半的文件已被删除
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver.core import governor as governor_module
+from nonebot_plugin_resolver.core.governor import (
+    LRU,
+    CookiePool,
+    PoolExhaustedError,
+    RequestGovernor,
+    TokenBucket,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(governor_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_round_robin_skips_quarantined(clock):
+    pool = CookiePool("test", ["a", "b", "c"], quarantine=60)
+    assert [pool.pick() for _ in range(4)] == ["a", "b", "c", "a"]
+    pool.quarantine("c", "登录失效")
+    assert [pool.pick() for _ in range(3)] == ["b", "a", "b"]
+    clock[0] += 60
+    assert [pool.pick() for _ in range(3)] == ["c", "a", "b"]
+    assert [e["failures"] for e in pool.health()] == [0, 0, 1]
+
+
+def test_lru_picks_least_recently_used(clock):
+    pool = CookiePool("test", ["a", "b"], strategy=LRU)
+    assert pool.pick() == "a"
+    clock[0] += 1
+    assert pool.pick() == "b"
+    clock[0] += 1
+    assert pool.pick() == "a"
+
+
+def test_exhausted_pool_reports_retry_after(clock):
+    pool = CookiePool("test", ["a", "b"], quarantine=60)
+    pool.quarantine("a")
+    clock[0] += 10
+    pool.quarantine("b")
+    with pytest.raises(PoolExhaustedError) as info:
+        pool.pick()
+    assert info.value.retry_after == 50
+    assert pool.health()[0] == {
+        "label": "****",
+        "healthy": False,
+        "retry_after": 50,
+        "uses": 0,
+        "failures": 1,
+        "reason": "",
+    }
+
+
+def test_empty_pool_and_governor():
+    governor = RequestGovernor({}, {"douyin": CookiePool("douyin", [])})
+    assert asyncio.run(governor.cookie("douyin")) is None
+    assert asyncio.run(governor.cookie("weibo")) is None
+    assert governor.attempts("douyin") == 1
+    governor.quarantine("weibo", "x")
+
+
+def test_token_bucket_waits_after_burst(clock, monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(governor_module.asyncio, "sleep", sleep)
+    bucket = TokenBucket(rate=2, burst=2)
+
+    async def main():
+        for _ in range(3):
+            await bucket.acquire()
+
+    asyncio.run(main())
+    assert slept == [0.5]
+    assert bucket.stats == {"acquired": 3, "waited": 1, "wait_seconds": 0.5}
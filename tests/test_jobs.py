@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver.core.jobs import SQLiteJobQueue, JobQueue
+
+
+def test_concurrent_callers_share_one_execution():
+    queue = JobQueue()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    async def main():
+        return await asyncio.gather(*(queue.run("k", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"n": 1}] * 5
+    assert calls == 1
+    assert queue.stats == {"executed": 1, "shared": 4}
+
+
+def test_exception_is_shared_with_waiters():
+    queue = JobQueue()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(queue.run("k", work) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_executor_hands_job_to_waiter():
+    queue = JobQueue()
+    started = []
+
+    async def work():
+        started.append(asyncio.current_task())
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def main():
+        owner = asyncio.create_task(queue.run("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(queue.run("k", work))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(main()) == {"ok": True}
+    # 执行者取消后由等待者重新执行了一次
+    assert len(started) == 2
+
+
+def test_cancelled_waiter_does_not_affect_executor():
+    queue = JobQueue()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return {"ok": True}
+
+    async def main():
+        owner = asyncio.create_task(queue.run("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(queue.run("k", work))
+        await asyncio.sleep(0.005)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await owner
+
+    assert asyncio.run(main()) == {"ok": True}
+
+
+def test_sqlite_queue_publishes_result(tmp_path):
+    async def work():
+        return {"path": "/tmp/x.mp4"}
+
+    async def main():
+        first = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+        second = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+        await first.run("k", work)
+        return await second.run("k", work), second.stats
+
+    result, stats = asyncio.run(main())
+    assert result == {"path": "/tmp/x.mp4"}
+    assert stats["executed"] == 0
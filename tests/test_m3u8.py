@@ -0,0 +1,85 @@
+from nonebot_plugin_resolver.core.m3u8 import (
+    M3U8Parser,
+    Variant,
+    parse_m3u8_text,
+    select_variant,
+)
+
+MEDIA = """#EXTM3U
+#EXT-X-VERSION:4
+#EXT-X-TARGETDURATION:3
+#EXT-X-MEDIA-SEQUENCE:7
+#EXT-X-MAP:URI="init.mp4"
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x01
+#EXTINF:2.5,first
+#EXT-X-BYTERANGE:100@0
+all.ts
+#EXTINF:2,
+#EXT-X-BYTERANGE:50
+all.ts
+#EXT-X-KEY:METHOD=NONE
+#EXT-X-DISCONTINUITY
+#EXTINF:1.5
+https://cdn.example.com/other.ts
+#EXT-X-ENDLIST"""
+
+BASE = "https://example.com/hls/index.m3u8?pkey=x"
+
+
+def test_media_playlist():
+    playlist = parse_m3u8_text(MEDIA, BASE)
+    assert not playlist.is_master
+    assert (playlist.version, playlist.target_duration, playlist.ended) == (4, 3, True)
+    assert playlist.map_uri == "https://example.com/hls/init.mp4"
+    assert playlist.duration == 6.0
+    first, second, third = playlist.segments
+    assert (first.uri, first.sequence, first.title) == (
+        "https://example.com/hls/all.ts",
+        7,
+        "first",
+    )
+    assert first.key.method == "AES-128"
+    assert first.key.uri == "https://example.com/hls/key.bin"
+    # 没有偏移的 BYTERANGE 接在同一文件的上一段之后
+    assert (first.byterange, second.byterange) == ((100, 0), (50, 100))
+    assert second.key is first.key
+    assert third.key is None and third.discontinuity and third.byterange is None
+    assert third.uri == "https://cdn.example.com/other.ts"
+
+
+def test_incremental_feed_yields_segments_as_they_complete():
+    parser = M3U8Parser(BASE)
+    produced = []
+    # 按任意位置切块喂入，分片一完成就返回
+    for i in range(0, len(MEDIA), 7):
+        produced.append(len(parser.feed(MEDIA[i : i + 7])))
+    produced.append(len(parser.close()))
+    assert sum(produced) == 3
+    assert [s.sequence for s in parser.playlist.segments] == [7, 8, 9]
+    assert parser.playlist.segments == parse_m3u8_text(MEDIA, BASE).segments
+
+
+def test_close_handles_last_line_without_newline():
+    parser = M3U8Parser()
+    assert parser.feed("#EXTINF:1,\nlast.ts") == []
+    assert [s.uri for s in parser.close()] == ["last.ts"]
+
+
+def test_master_playlist_and_select_variant():
+    playlist = parse_m3u8_text(
+        "#EXTM3U\n"
+        '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1,mp4a"\n'
+        "360p.m3u8\n"
+        "#EXT-X-STREAM-INF:BANDWIDTH=4000000,RESOLUTION=1920x1080\n"
+        "1080p.m3u8\n",
+        BASE,
+    )
+    assert playlist.is_master and not playlist.segments
+    low, high = playlist.variants
+    assert low == Variant(
+        "https://example.com/hls/360p.m3u8", 800000, "640x360", "avc1,mp4a"
+    )
+    assert select_variant(playlist.variants) is high
+    assert select_variant(playlist.variants, 1000000) is low
+    # 都超出上限时取最低的
+    assert select_variant(playlist.variants, 1) is low
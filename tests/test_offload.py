@@ -0,0 +1,45 @@
+import asyncio
+import functools
+import os
+import threading
+
+import nonebot
+
+from nonebot_plugin_resolver.core.offload import START_METHOD, Offloader
+from nonebot_plugin_resolver.core.weibo import html_to_text
+
+
+def test_process_pool_does_not_fork(tmp_path):
+    assert START_METHOD != "fork"
+    offloader = Offloader(
+        1,
+        threshold=0,
+        initializer=functools.partial(nonebot.init, resolver_cache_dir=str(tmp_path)),
+    )
+    try:
+        # 子进程重新导入插件模块，要先用 initializer 初始化 NoneBot
+        assert asyncio.run(offloader.run(html_to_text, "a<br>b")) == "a\nb"
+        assert asyncio.run(offloader.run(os.getpid)) != os.getpid()
+    finally:
+        offloader.shutdown()
+    assert offloader.mode == "process"
+    assert offloader.stats == {"inline": 0, "offloaded": 2}
+
+
+def test_broken_process_pool_falls_back_to_threads():
+    # initializer 在子进程里抛出异常，进程池无法使用
+    offloader = Offloader(1, threshold=0, initializer=functools.partial(int, "x"))
+    try:
+        # 进程池坏掉的这次也交给线程池，不在事件循环线程里执行
+        assert asyncio.run(offloader.run(threading.get_ident)) != threading.get_ident()
+        assert offloader.mode == "thread"
+        assert asyncio.run(offloader.run(html_to_text, "a<p>b</p>")) == "ab"
+        assert asyncio.run(offloader.run(os.getpid)) == os.getpid()
+    finally:
+        offloader.shutdown()
+
+
+def test_small_payload_runs_inline():
+    offloader = Offloader(1, threshold=10)
+    assert asyncio.run(offloader.run(html_to_text, "x", size=1)) == "x"
+    assert offloader._executor is None
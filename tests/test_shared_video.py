@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from nonebot_plugin_resolver import utils
+from nonebot_plugin_resolver.utils import (
+    MEDIA_CACHE,
+    fetch_shared_video,
+    send_shared_video,
+)
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, event, message):
+        self.sent.append(str(message))
+
+
+async def failed_produce():
+    await asyncio.sleep(0.01)
+    return None, None
+
+
+def test_failed_download_is_reported_to_every_waiter():
+    bot = RecordingBot()
+
+    async def main():
+        await asyncio.gather(
+            *(
+                send_shared_video(bot, None, "test:failed", failed_produce)
+                for _ in range(3)
+            )
+        )
+
+    asyncio.run(main())
+    assert len(bot.sent) == 3
+    assert all("视频下载失败" in message for message in bot.sent)
+
+
+def test_failed_download_without_cache(monkeypatch):
+    monkeypatch.setattr(MEDIA_CACHE, "max_bytes", 0)
+    bot = RecordingBot()
+    asyncio.run(send_shared_video(bot, None, "test:failed-nocache", failed_produce))
+    assert len(bot.sent) == 1 and "视频下载失败" in bot.sent[0]
+
+
+def test_expired_shared_result_redownload_fails(monkeypatch):
+    bot = RecordingBot()
+
+    async def run(key, work, **kwargs):
+        return {"path": "/nonexistent/video.mp4", "digest": "0"}
+
+    monkeypatch.setattr(utils.JOB_QUEUE, "run", run)
+    asyncio.run(send_shared_video(bot, None, "test:expired", failed_produce))
+    assert len(bot.sent) == 1 and "视频下载失败" in bot.sent[0]
+
+
+def test_fetch_shared_video_downloads_once(tmp_path):
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"video")
+        return str(path), None
+
+    async def main():
+        return await asyncio.gather(
+            *(fetch_shared_video("test:fetch-once", produce) for _ in range(3))
+        )
+
+    entries = asyncio.run(main())
+    assert len(calls) == 1
+    assert len({entry.digest for entry in entries}) == 1
+
+
+def test_fetch_shared_video_failure_returns_none():
+    assert asyncio.run(fetch_shared_video("test:fetch-failed", failed_produce)) is None
+
+
+@pytest.fixture(autouse=True)
+def _no_cached_hits(monkeypatch):
+    monkeypatch.setattr(MEDIA_CACHE, "lookup", lambda source: None)
@@ -0,0 +1,17 @@
+import asyncio
+
+from nonebot_plugin_resolver.core.hedge import hedged_request
+from nonebot_plugin_resolver.core.supervisor import SUPERVISOR
+
+
+def test_hedged_attempts_are_supervised():
+    tracked = []
+
+    async def request(endpoint: str) -> str:
+        # 关闭插件时由 SUPERVISOR 等待或取消
+        tracked.append(asyncio.current_task() in SUPERVISOR.tasks)
+        return endpoint
+
+    result = asyncio.run(hedged_request("test", ["https://a.example"], request))
+    assert result == "https://a.example"
+    assert tracked == [True]
@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+import pytest
+from nonebot.adapters.onebot.v11 import Message
+from nonebot.exception import FinishedException
+
+from nonebot_plugin_resolver.platforms import twitter
+
+
+class Event:
+    def get_message(self):
+        return Message("https://x.com/someone/status/123")
+
+
+class Matcher:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(str(message))
+
+    async def finish(self, message=None):
+        if message is not None:
+            self.sent.append(str(message))
+        raise FinishedException
+
+
+class Bot:
+    self_id = "1"
+
+
+@pytest.fixture
+def media_url(monkeypatch):
+    url = ["https://video.twimg.com/a.mp4"]
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"data": {"url": url[0]}}
+
+    class Client:
+        def __init__(self, **kwargs):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            pass
+
+        async def get(self, url, headers=None):
+            return Response()
+
+    monkeypatch.setattr(twitter.httpx, "AsyncClient", Client)
+    return url
+
+
+def run(matcher: Matcher) -> None:
+    with pytest.raises(FinishedException):
+        asyncio.run(twitter.twitter(Bot(), Event(), matcher))
+
+
+def test_all_routes_failed_replies(media_url, monkeypatch):
+    async def attempt(platform, request, measure=None):
+        return None
+
+    monkeypatch.setattr(twitter.ROUTER, "attempt", attempt)
+    matcher = Matcher()
+    run(matcher)
+    assert "下载失败" in matcher.sent[-1]
+
+
+def test_unsupported_media_is_not_forwarded(media_url, monkeypatch, tmp_path):
+    path = tmp_path / "a.gif"
+    path.write_bytes(b"gif")
+    media_url[0] = "https://pbs.twimg.com/a.gif"
+
+    async def attempt(platform, request, measure=None):
+        return str(path)
+
+    async def send_forward_both(bot, event, node):
+        raise AssertionError("不应发送转发消息")
+
+    monkeypatch.setattr(twitter.ROUTER, "attempt", attempt)
+    monkeypatch.setattr(twitter, "send_forward_both", send_forward_both)
+    matcher = Matcher()
+    run(matcher)
+    assert "不支持" in matcher.sent[-1]
+    assert not os.path.exists(path)
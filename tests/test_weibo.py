@@ -0,0 +1,90 @@
+import json
+from pathlib import Path
+
+from nonebot_plugin_resolver.core.weibo import (
+    ALPHABET,
+    PIC_BYTE_CAP,
+    extract_pics,
+    html_to_text,
+    mid2id,
+    pic_urls,
+    pic_variant,
+)
+
+FIXTURES = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+
+def _id2mid(weibo_id: str) -> str:
+    """mid2id 的逆运算：从右往左每 4 位 base62 还原为 7 位十进制"""
+    chunks = []
+    while weibo_id:
+        weibo_id, chunk = weibo_id[:-4], weibo_id[-4:]
+        number = 0
+        for c in chunk:
+            number = number * 62 + ALPHABET.index(c)
+        chunks.append(str(number).zfill(7) if weibo_id else str(number))
+    return "".join(reversed(chunks))
+
+
+def test_mid2id_round_trip():
+    for mid in ("5007452630158934", "4976424138313924", "1000000000000001"):
+        assert _id2mid(mid2id(mid)) == mid
+
+
+def test_extract_pics_from_mobile_api():
+    data = json.loads((FIXTURES / "weibo_show.json").read_text("utf-8"))["data"]
+    pics = extract_pics(data)
+    assert [p["url"] for p in pics] == [
+        f"https://wx1.sinaimg.cn/large/bench{i}.jpg" for i in range(3)
+    ]
+    assert all(p["width"] == p["height"] == 0 for p in pics)
+
+
+def test_extract_pics_from_ajax_api_keeps_order():
+    data = {
+        "pic_ids": ["b", "a"],
+        "pic_infos": {
+            "a": {
+                "largest": {
+                    "url": "https://wx1.sinaimg.cn/large/a.jpg",
+                    "width": 10,
+                    "height": "20",
+                }
+            },
+            "b": {
+                "original": {
+                    "url": "https://wx1.sinaimg.cn/large/b.jpg",
+                    "width": "bad",
+                }
+            },
+        },
+    }
+    assert extract_pics(data) == [
+        {"url": "https://wx1.sinaimg.cn/large/b.jpg", "width": 0, "height": 0},
+        {"url": "https://wx1.sinaimg.cn/large/a.jpg", "width": 10, "height": 20},
+    ]
+
+
+def test_pic_variant_fits_budget():
+    pic = {"url": "https://wx1.sinaimg.cn/large/x.jpg", "width": 4000, "height": 6000}
+    assert pic_variant(pic, 100 * 1024 * 1024) == "https://wx1.sinaimg.cn/large/x.jpg"
+    assert "/mw690/" in pic_variant(pic, 300 * 1024) or "/orj360/" in pic_variant(
+        pic, 300 * 1024
+    )
+    # 尺寸未知用中等尺寸，不是新浪图床的链接原样返回
+    assert "/mw1024/" in pic_variant({**pic, "width": 0}, 1)
+    other = {"url": "https://example.com/x.jpg", "width": 1, "height": 1}
+    assert pic_variant(other, 1) == other["url"]
+
+
+def test_pic_urls_shares_budget():
+    small = {"url": "https://wx1.sinaimg.cn/large/s.jpg", "width": 1000, "height": 1000}
+    assert pic_urls([small]) == [small["url"]]
+    big = {"url": "https://wx1.sinaimg.cn/large/b.jpg", "width": 5000, "height": 5000}
+    assert 5000 * 5000 * 0.35 > PIC_BYTE_CAP
+    assert "/large/" not in pic_urls([big] * 18)[0]
+
+
+def test_html_to_text():
+    assert html_to_text('a<br />b<a href="x">#话题#</a>') == "a\nb#话题#"
+    assert html_to_text(None) == ""
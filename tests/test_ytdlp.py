@@ -0,0 +1,61 @@
+import os
+import sys
+import asyncio
+import textwrap
+
+import pytest
+
+from nonebot_plugin_resolver.core.ytdlp import download_ytb_video
+
+FAKE_YTDLP = """\
+#!{python}
+import os, sys
+args = sys.argv[1:]
+directory = args[args.index("-P") + 1]
+name = args[args.index("-o") + 1].replace("%(ext)s", "mp4")
+with open(os.path.join(directory, name + ".part"), "wb") as f:
+    f.write(b"partial")
+if os.environ.get("FAKE_YTDLP_FAIL"):
+    sys.exit(1)
+os.replace(os.path.join(directory, name + ".part"), os.path.join(directory, name))
+"""
+
+
+@pytest.fixture
+def fake_ytdlp(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "yt-dlp"
+    script.write_text(textwrap.dedent(FAKE_YTDLP.format(python=sys.executable)))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    out = tmp_path / "out"
+    out.mkdir()
+    return out
+
+
+def test_parallel_downloads_do_not_collide(fake_ytdlp):
+    async def main():
+        return await asyncio.gather(
+            download_ytb_video("https://youtu.be/a", str(fake_ytdlp)),
+            download_ytb_video("https://youtu.be/b", str(fake_ytdlp)),
+        )
+
+    first, second = asyncio.run(main())
+    assert first != second
+    assert os.path.exists(first) and os.path.exists(second)
+    # 任务目录用完即删，只留下成品
+    assert sorted(os.listdir(fake_ytdlp)) == sorted(
+        [os.path.basename(first), os.path.basename(second)]
+    )
+
+
+def test_failure_only_cleans_own_directory(fake_ytdlp, monkeypatch):
+    monkeypatch.setenv("FAKE_YTDLP_FAIL", "1")
+    unrelated = fake_ytdlp / "temp.mp4"
+    unrelated.write_bytes(b"someone else's file")
+
+    assert (
+        asyncio.run(download_ytb_video("https://youtu.be/a", str(fake_ytdlp))) is None
+    )
+    assert os.listdir(fake_ytdlp) == ["temp.mp4"]